@@ -1,20 +1,34 @@
-from math import floor
+from math import floor, isqrt
+from itertools import count
 from PIL import Image, ImageOps
-from math import floor
 from xml.etree.ElementTree import ElementTree, fromstring
-from ._utils import clamp, get_color_rgb
-from ._renderers import Pixoo64Renderer, Renderer, ImageRenderer, WindowRenderer
+from ._utils import clamp, get_color_rgb, get_color_bytes
+from ._constants import ALPHA_MASK_TABLE, PICO_PALETTE
+from ._cache import LRUCache
+from ._fonts import BitmapFont
+from ._layers import Layer, LayerStack, BLEND_MODES, blend
+from ._worker import RenderWorker
+from ._renderers import CommandBatchError, Pixoo64Renderer, AsyncPixoo64Renderer, Renderer, ImageRenderer, WindowRenderer
+from os import stat
+from concurrent.futures import ThreadPoolExecutor
+from threading import local
+from collections import deque
+from contextlib import nullcontext
+from hashlib import blake2b
+from asyncio import gather, to_thread
+from inspect import isawaitable, iscoroutinefunction
 from os.path import dirname, realpath, join
 
 class Pizzoo:
-	__buffer = []
-	__current_frame = -1
 	__max_frames = 60
 	__debug = False
-	__fonts = {}
+	# Caches are shared by every instance, as they only hold read-only data
+	__image_cache = LRUCache(maxsize=64)
+	__text_cache = LRUCache(maxsize=256)
+	__font_cache = LRUCache(maxsize=16)
 	__current_dir = dirname(realpath(__file__))
 
-	def __init__(self, address, renderer=Pixoo64Renderer, renderer_params={}, debug=False):
+	def __init__(self, address, renderer=Pixoo64Renderer, renderer_params={}, debug=False, skip_unchanged=False, palette=None, background_render=False):
 		'''Initialize the Pizzoo object with the given renderer. Additional parameters can be passed to the renderer.
 
 		Args:
@@ -22,26 +36,69 @@ class Pizzoo:
 			renderer (Renderer): The renderer to use. Default is Pixoo64Renderer.
 			renderer_params (dict): Additional parameters to pass to the renderer.
 			debug (bool): Whether to enable debug mode or not. Default is False.
+			skip_unchanged (bool): Whether to skip rendering a buffer that is identical (With the same frame speed) to the last one rendered. Default is False.
+			palette (list | str | None): A list of up to 256 colors to store frames as palette indexes, using one byte per pixel instead of three, or 'pico8' for the PICO-8 palette. Default is None (RGB frames).
+			background_render (bool): Whether render hands the buffer to a background thread and returns without waiting for the devices. If they are still busy with a previous buffer, only the latest one is kept. Default is False.
+
+		Raises:
+			ValueError: If background_render is enabled with a renderer that is not thread safe (Like WindowRenderer).
 
 		Returns:
 			None
 		'''
+		if background_render and not renderer._thread_safe:
+			raise ValueError(f'{renderer.__name__} is not thread safe, so it can not be used with background_render')
+		# Buffers are kept per instance, so several devices can be driven from the same process
+		self.__buffer = []
+		self.__dirty_rects = []
+		self.__current_frame = -1
+		# Identical frames share the same bytearray until one of them is modified, tracked by content hash
+		self.__interned_frames = {}
+		self.__frame_digests = {}
+		self.__frame_refs = {}
+		# Storage of the frames of previous buffers, reused by the next ones once the renderers are done with them
+		self.__spare_frames = deque()
+		self.__fill_patterns = {}
+		self.__fonts = {}
+		self.__renderers = []
+		self.__render_pool = None
+		self.__layer = None
+		self.__clip_stack = []
+		self.__origin = (0, 0)
 		self.renderer = renderer(address=address, pizzoo=self, debug=debug, **renderer_params)
 		self.__compute_device_specs()
+		self.__layers = LayerStack(self.size)
 		self.__debug = debug
+		self.__skip_unchanged = skip_unchanged
+		# Pixel bytes of the colors recently drawn with draw_pixel
+		self.__pixel_cache = {}
+		self.__palette = None
+		self.__frame_depth = 3
+		if palette is not None:
+			self.__frame_depth = 1
+			self.__set_palette(PICO_PALETTE if palette == 'pico8' else palette)
+		# Dirty rectangles and duplicated frames of the buffer being rendered on each thread, which renderers query while rendering it
+		self.__render_state = local()
+		self.__render_worker = RenderWorker(self.__render_buffer, self.__recycle_frames, self.__coalesce_render_states) if background_render else None
 		# Initialize buffer
 		self.add_frame()
-		# get current dir of this file:
-		self.load_font('default', join(self.__current_dir, 'default.bdf'), False)
+		# The default font is only loaded once text is drawn
+		self.load_font('default', join(self.__current_dir, 'default.bdf'))
 
 	def __compute_device_specs(self):
 		self.size = self.renderer.get_size()
 		self.pixel_count = self.size * self.size
 		self.__max_frames = self.renderer.get_max_frames()
+		# Nothing is known about what the device is showing yet
+		self.__clear_rect = (0, 0, self.size, self.size)
+		# Drawing is clipped to this region, as (x0, y0, x1, y1) with exclusive ends
+		self.__clip = (0, 0, self.size, self.size)
 		
 	def load_font(self, font_name, path, soft=True):
 		'''Loads a new font on bdf format to be used on the draw_text method.
 
+		Bdf fonts are compiled to a packed binary format the first time they are loaded and kept on an on-disk cache, so next loads only need a single file read. Already compiled fonts (With the .pzf extension) can be loaded too.
+
 		Args:
 			font_name (str): The name to identify the font.
 			path (str): The path to the font file.
@@ -53,8 +110,7 @@ class Pizzoo:
 		if soft:
 			self.__fonts[font_name] = path
 		else:
-			from bdfparser import Font
-			self.__fonts[font_name] = Font(path)
+			self.__fonts[font_name] = self.__load_bitmap_font(path)
 
 	def load_fonts(self, fonts):
 		'''Loads multiple fonts at once.
@@ -69,7 +125,7 @@ class Pizzoo:
 			self.load_font(font_name, path)
 		
 	def cls(self, rgb=(0, 0, 0)):
-		'''Clears the current frame with the given color.
+		'''Clears the current frame (Or the selected layer) with the given color.
 
 		Args:
 			rgb (tuple(int, int, int) | int | string): The color to clear the frame with. Default is black.
@@ -77,8 +133,13 @@ class Pizzoo:
 		Returns:
 			None
 		'''
-		rgb = get_color_rgb(rgb)
-		self.__buffer[self.__current_frame] = [rgb[0], rgb[1], rgb[2]] * self.pixel_count
+		surface, _ = self.__surface()
+		pixel = self.__pixel(rgb)
+		surface[:] = self.__fill_pattern(pixel)
+		if self.__layer is not None:
+			self.__layer.version += 1
+		else:
+			self.__dirty_rects[self.__current_frame] = self.__cleared_rect(pixel)
 
 	def add_frame(self, rgb=(0, 0, 0)):
 		'''Adds a new frame to the animation buffer.
@@ -90,11 +151,33 @@ class Pizzoo:
 			None
 		'''
 		assert self.__current_frame <= self.__max_frames, f'Frame limit reached, push before reaching {self.__max_frames} frames'
-		frame = []
-		for _ in range(self.pixel_count):
-			frame.extend(rgb)
+		# Frames are stored as flat RGB bytearrays so renderers can consume them without copies
+		pixel = self.__frame_pixel(rgb)
+		if self.__current_frame >= 0:
+			self.__intern_frame(self.__current_frame)
+		frame = self.__spare_frames.pop() if self.__spare_frames else bytearray(self.pixel_count * self.__frame_depth)
+		frame[:] = self.__fill_pattern(pixel)
 		self.__buffer.append(frame)
 		self.__current_frame = len(self.__buffer) - 1
+		self.__dirty_rects.append(self.__cleared_rect(pixel))
+
+	def __cleared_rect(self, pixel):
+		'''Returns the dirty rectangle of the current frame once it is filled with the given pixel.'''
+		# A black first frame only differs from the last rendered one where that one was not black
+		if self.__palette is not None:
+			pixel = self.__palette_bytes[pixel[0] * 3:pixel[0] * 3 + 3]
+		if pixel == b'\x00\x00\x00' and self.__current_frame == 0:
+			return self.__clear_rect
+		return (0, 0, self.size, self.size)
+
+	def __fill_pattern(self, pixel):
+		'''Returns the given pixel repeated for a whole frame, keeping the last ones used so clearing does not allocate.'''
+		pattern = self.__fill_patterns.get(pixel)
+		if pattern is None:
+			if len(self.__fill_patterns) >= 8:
+				self.__fill_patterns.clear()
+			pattern = self.__fill_patterns[pixel] = pixel * self.pixel_count
+		return pattern
 
 	def reset_buffer(self):
 		'''Resets the animation buffer, removing all frames and adding a new one.
@@ -103,55 +186,720 @@ class Pizzoo:
 			And int with the number of items removed from the buffer.
 		'''
 		removed_items = len(self.__buffer)
+		self.__recycle_frames(self.__buffer)
+		self.__swap_buffers()
+		return removed_items
+
+	def __swap_buffers(self):
+		'''Starts a new (Back) animation buffer with a single frame, leaving the previous one untouched, as it may still be rendered.'''
 		self.__buffer = []
+		self.__dirty_rects = []
 		self.__current_frame = -1
+		self.__reset_interned_frames()
 		self.add_frame()
-		return removed_items
+
+	def __recycle_frames(self, frames):
+		'''Keeps the storage of the given frames to reuse it for new ones. Called once they are no longer rendered, maybe from the background renderer thread.'''
+		if any(renderer._keeps_frames for renderer in self.get_renderers()):
+			# Renderers may still use frames they kept, so their storage is never reused
+			return
+		recycled = set()
+		for frame in frames:
+			if id(frame) not in recycled and len(frame) == self.pixel_count * self.__frame_depth and len(self.__spare_frames) < self.__max_frames:
+				recycled.add(id(frame))
+				self.__spare_frames.append(frame)
 	
 	def get_current_frame(self):
 		'''Returns the current animation frame.
 
+		The frame is a flat bytearray with the RGB values of every pixel (Or their palette indexes, if a palette is used), so it can be indexed, sliced and modified as a list of ints. Changes made to it are applied directly to the buffer, so the whole frame is marked as dirty. Its storage is reused for new frames after rendering, so it should not be kept once the buffer is rendered.
+
 		Returns:
-			The current animation buffer.
+			The current animation frame as a bytearray.
 		'''
-		return self.__buffer[self.__current_frame]
+		self.__mark_frame_dirty(self.__current_frame, 0, 0, self.size, self.size)
+		return self.__frame_for_write(self.__current_frame)
 	
 	def set_current_frame(self, frame):
 		'''Sets the current animation frame.
 
 		Args:
-			frame (list(int)): The frame to set as the current frame.
+			frame (list(int) | bytes | bytearray): The frame to set as the current frame, with the RGB values of every pixel (Or their palette indexes, if a palette is used).
+
+		Raises:
+			ValueError: If the frame size does not match the device size.
+
+		Returns:
+			None
+		'''
+		if len(frame) != self.pixel_count * self.__frame_depth:
+			raise ValueError(f'Invalid frame size: {len(frame)} (expected {self.pixel_count * self.__frame_depth})')
+		self.__release_frame(self.__current_frame)
+		self.__buffer[self.__current_frame] = bytearray(frame)
+		self.__mark_frame_dirty(self.__current_frame, 0, 0, self.size, self.size)
+
+	def copy_frame(self, src_index, dst_index=None):
+		'''Copies a whole frame of the animation buffer over another one, useful to animate a frame as the previous one plus some changes.
+
+		Args:
+			src_index (int): The index of the frame to copy. Negative indexes count from the end of the buffer.
+			dst_index (int | None): The index of the frame to overwrite. If None, the copy is added as a new frame at the end of the buffer, that becomes the current frame.
+
+		Raises:
+			ValueError: If any of the indexes is out of the animation buffer.
+
+		Returns:
+			None
+		'''
+		src_index = self.__frame_index(src_index)
+		# The copy shares the storage of the source frame until any of them is modified
+		frame = self.__intern_frame(src_index)
+		if dst_index is None:
+			assert self.__current_frame <= self.__max_frames, f'Frame limit reached, push before reaching {self.__max_frames} frames'
+			self.__buffer.append(frame)
+			self.__dirty_rects.append(None)
+			dst_index = self.__current_frame = len(self.__buffer) - 1
+		else:
+			dst_index = self.__frame_index(dst_index)
+			if self.__buffer[dst_index] is frame:
+				return
+			self.__release_frame(dst_index)
+			self.__buffer[dst_index] = frame
+			# The dirty rectangle of the next frame is relative to this one, so it may differ anywhere now
+			if dst_index + 1 < len(self.__buffer):
+				self.__mark_frame_dirty(dst_index + 1, 0, 0, self.size, self.size)
+		self.__frame_refs[id(frame)] += 1
+		# A copy of the previous frame has nothing new to show
+		self.__dirty_rects[dst_index] = None if dst_index > 0 and src_index == dst_index - 1 else (0, 0, self.size, self.size)
+
+	def __intern_frame(self, index):
+		'''Shares the storage of a frame with an identical frame of the buffer, if any, and returns the frame.'''
+		frame = self.__buffer[index]
+		if id(frame) in self.__frame_digests:
+			return frame
+		digest = blake2b(frame, digest_size=16).digest()
+		shared = self.__interned_frames.get(digest)
+		if shared is None:
+			self.__interned_frames[digest] = frame
+			self.__frame_digests[id(frame)] = digest
+			self.__frame_refs[id(frame)] = 1
+			return frame
+		self.__buffer[index] = shared
+		self.__frame_refs[id(shared)] += 1
+		return shared
+
+	def __release_frame(self, index):
+		'''Stops tracking the frame on the given index, as it is about to be replaced or modified.'''
+		key = id(self.__buffer[index])
+		if key not in self.__frame_digests:
+			return
+		self.__frame_refs[key] -= 1
+		if self.__frame_refs[key] == 0:
+			del self.__interned_frames[self.__frame_digests.pop(key)]
+			del self.__frame_refs[key]
+
+	def __frame_for_write(self, index):
+		'''Returns the frame on the given index to modify it, copying it first if its storage is shared with other frames.'''
+		frame = self.__buffer[index]
+		if id(frame) in self.__frame_digests:
+			shared = self.__frame_refs[id(frame)] > 1
+			self.__release_frame(index)
+			if shared:
+				frame = self.__buffer[index] = bytearray(frame)
+		return frame
+
+	def __reset_interned_frames(self):
+		self.__interned_frames = {}
+		self.__frame_digests = {}
+		self.__frame_refs = {}
+
+	def get_duplicate_frames(self):
+		'''Finds the frames of the animation buffer that are identical to a previous one.
+
+		Identical frames share the same bytearray, so renderers can also check it with "frame is other_frame" and reuse any work (Like encoding or uploading a frame) already done for it.
+
+		Returns:
+			A list with, for every frame, the index of the first frame with the same content (Its own index if it is the first one).
+		'''
+		duplicates = self.__current_render_state()[1]
+		if duplicates is not None:
+			return list(duplicates)
+		first_indexes = {}
+		for index in range(len(self.__buffer)):
+			first_indexes.setdefault(id(self.__intern_frame(index)), index)
+		return [first_indexes[id(frame)] for frame in self.__buffer]
+
+	def __frame_index(self, index):
+		if index < -len(self.__buffer) or index >= len(self.__buffer):
+			raise ValueError(f'Invalid frame index: {index} (buffer has {len(self.__buffer)} frames)')
+		return index % len(self.__buffer)
+
+	def blit(self, src_frame, src_rect=None, dst_xy=(0, 0)):
+		'''Copies a rectangular region of a frame or a layer into the current frame (Or the selected layer) at the given coordinates.
+
+		The region is clipped once and copied row by row with slice assignments, so scrolling a frame or stamping sprites is much cheaper than drawing them again. Hidden layers can be used as offscreen surfaces, drawing on them once and copying from them when needed. Transparent pixels of a layer are skipped when copied on a frame.
+
+		Args:
+			src_frame (int | str): The index of a frame of the animation buffer, or the name of a layer.
+			src_rect (tuple(int, int, int, int) | None): The region to copy as (x, y, width, height). If None, the whole frame is copied.
+			dst_xy (tuple(int, int)): The coordinates to copy the top-left corner of the region to.
+
+		Raises:
+			ValueError: If the frame index is out of the animation buffer or the layer does not exist.
+
+		Returns:
+			None
+		'''
+		if isinstance(src_frame, str):
+			source, src_depth = self.__layers.get(src_frame).data, 4
+		else:
+			source, src_depth = self.__buffer[self.__frame_index(src_frame)], self.__frame_depth
+		x, y, width, height = (0, 0, self.size, self.size) if src_rect is None else src_rect
+		# Clip the region to the source first, and then its position on the destination
+		src_x0, src_y0 = max(x, 0), max(y, 0)
+		src_x1, src_y1 = min(x + width, self.size), min(y + height, self.size)
+		dst_x, dst_y = dst_xy[0] + self.__origin[0] + src_x0 - x, dst_xy[1] + self.__origin[1] + src_y0 - y
+		clip = self.__clip
+		x0, y0 = max(dst_x, clip[0]), max(dst_y, clip[1])
+		x1, y1 = min(dst_x + src_x1 - src_x0, clip[2]), min(dst_y + src_y1 - src_y0, clip[3])
+		if x0 >= x1 or y0 >= y1:
+			return
+		src_x0, src_y0 = src_x0 + x0 - dst_x, src_y0 + y0 - dst_y
+		target, depth = self.__surface()
+		if src_depth != depth:
+			# Frames and layers have different pixel formats, so the region is converted by Pillow
+			image = self.__decode_pixels(bytes(source), (self.size, self.size), src_depth)
+			image = image.crop((src_x0, src_y0, src_x0 + x1 - x0, src_y0 + y1 - y0)).convert('RGBA')
+			self.__blit_image(image, (x0 - self.__origin[0], y0 - self.__origin[1]))
+			return
+		if source is target:
+			# Overlapping rows of the same surface must be read before being overwritten
+			source = bytes(source)
+		self.__mark_dirty(x0, y0, x1, y1)
+		stride = self.size * depth
+		row_size = (x1 - x0) * depth
+		src_start = (src_y0 * self.size + src_x0) * depth
+		start = (y0 * self.size + x0) * depth
+		with memoryview(source) as view:
+			if row_size == stride:
+				target[start:start + row_size * (y1 - y0)] = view[src_start:src_start + row_size * (y1 - y0)]
+				return
+			for offset in range(0, (y1 - y0) * stride, stride):
+				target[start + offset:start + offset + row_size] = view[src_start + offset:src_start + offset + row_size]
+
+	def get_dirty_rect(self, frame_index=None):
+		'''Returns the region of a frame that may have changed since the last render (Or since the previous frame, for any frame after the first one).
+
+		Every drawing method marks the region it draws on, so renderers can use it to process only the changed pixels.
+
+		Args:
+			frame_index (int | None): The index of the frame on the animation buffer. Default is the current frame.
+
+		Returns:
+			A tuple (x, y, width, height) with the changed region, or None if nothing changed.
+		'''
+		dirty_rects, _, current_frame = self.__current_render_state()
+		rect = dirty_rects[current_frame if frame_index is None else frame_index]
+		if rect is None:
+			return None
+		return (rect[0], rect[1], rect[2] - rect[0], rect[3] - rect[1])
+
+	def is_dirty(self):
+		'''Returns whether any frame of the animation buffer may have changed since the last render.
+
+		Returns:
+			A bool, False if rendering the buffer again would not change what is shown on the device.
+		'''
+		return any(rect is not None for rect in self.__current_render_state()[0])
+
+	def __current_render_state(self):
+		'''Returns the dirty rectangles, duplicated frames (None if not computed yet) and current frame of the buffer being rendered on this thread, or of the animation buffer if none is.'''
+		state = getattr(self.__render_state, 'state', None)
+		if state is None:
+			return self.__dirty_rects, None, self.__current_frame
+		return state
+
+	def __capture_render_state(self):
+		'''Returns the render state of the animation buffer, so renderers get it while rendering the buffer even if drawing on a new one already started.'''
+		return (list(self.__dirty_rects), self.get_duplicate_frames(), self.__current_frame)
+
+	def __coalesce_render_states(self, dropped, state):
+		'''Returns the render state of a buffer replacing a dropped one. The devices still show the buffer before the dropped one, so the changes of the first frame of both are combined.'''
+		dirty_rects = list(state[0])
+		first, dropped_first = dirty_rects[0], dropped[0][0]
+		if first is None or dropped_first is None:
+			dirty_rects[0] = first if dropped_first is None else dropped_first
+		else:
+			dirty_rects[0] = (min(first[0], dropped_first[0]), min(first[1], dropped_first[1]), max(first[2], dropped_first[2]), max(first[3], dropped_first[3]))
+		return (dirty_rects, state[1], state[2])
+
+	def __mark_dirty(self, x0, y0, x1, y1):
+		'''Adds the region between (x0, y0) and (x1, y1), exclusive, to the dirty rectangle of the current frame, or flags the selected layer as changed.'''
+		if self.__layer is not None:
+			self.__layer.version += 1
+			return
+		self.__mark_frame_dirty(self.__current_frame, x0, y0, x1, y1)
+
+	def __mark_frame_dirty(self, frame_index, x0, y0, x1, y1):
+		rect = self.__dirty_rects[frame_index]
+		if rect is not None:
+			x0, y0, x1, y1 = min(x0, rect[0]), min(y0, rect[1]), max(x1, rect[2]), max(y1, rect[3])
+		self.__dirty_rects[frame_index] = (x0, y0, x1, y1)
+
+	def __surface(self):
+		'''Returns the bytearray drawing methods write to, the current frame or the selected layer, and its bytes per pixel.'''
+		if self.__layer is not None:
+			return self.__layer.data, 4
+		return self.__frame_for_write(self.__current_frame), self.__frame_depth
+
+	def __pixel(self, color):
+		'''Returns the bytes of a pixel of the given color on the current drawing surface.'''
+		if self.__layer is not None:
+			return bytes(self.__color_rgb(color)) + b'\xff'
+		return self.__frame_pixel(color)
+
+	def __color_rgb(self, color):
+		'''Returns the RGB values of a color, where integers are palette indexes if a palette is used.'''
+		if self.__palette is not None and isinstance(color, int):
+			return self.__palette[self.__color_index(color)]
+		return tuple(get_color_rgb(color))
+
+	def __frame_pixel(self, color):
+		if self.__palette is not None:
+			return bytes((self.__color_index(color),))
+		return get_color_bytes(color)
+
+	def __decode_pixels(self, data, size, depth):
+		'''Returns an image (RGB, or RGBA for layers) from the pixels of a frame or layer region.'''
+		if depth == 4:
+			return Image.frombytes('RGBA', size, data)
+		if depth == 1:
+			image = Image.frombytes('P', size, data)
+			image.putpalette(self.__palette_bytes)
+			return image.convert('RGB')
+		return Image.frombytes('RGB', size, data)
+
+	def __encode_pixels(self, image):
+		'''Returns the pixels of an image as frame pixels, mapping them to the closest palette color if a palette is used.'''
+		if self.__palette is None:
+			return image.convert('RGB').tobytes()
+		indexes = image.convert('RGB').quantize(palette=self.__palette_image, dither=Image.Dither.NONE).tobytes()
+		# The palette is repeated to fill 256 entries, so repeated colors are mapped to their first index
+		return indexes.translate(self.__palette_table)
+
+	def __set_palette(self, palette):
+		if not 0 < len(palette) <= 256:
+			raise ValueError(f'Invalid palette size: {len(palette)} (expected between 1 and 256 colors)')
+		self.__palette = [tuple(get_color_rgb(color)) for color in palette]
+		self.__palette_bytes = b''.join(bytes(color) for color in self.__palette)
+		self.__palette_image = Image.new('P', (1, 1))
+		self.__palette_image.putpalette((self.__palette_bytes * (256 // len(self.__palette) + 1))[:768])
+		self.__palette_table = bytes(index % len(self.__palette) for index in range(256))
+		# Exact and closest palette index of every color used so far
+		self.__palette_indexes = {color: index for index, color in reversed(list(enumerate(self.__palette)))}
+		# Colors may map to other indexes with the new palette
+		self.__pixel_cache.clear()
+
+	def __color_index(self, color):
+		'''Returns the palette index used to draw a color. Integers are palette indexes, any other color is drawn with the closest palette color.'''
+		if isinstance(color, int):
+			if color < 0 or color >= len(self.__palette):
+				raise ValueError(f'Invalid palette index: {color} (palette has {len(self.__palette)} colors)')
+			return color
+		rgb = tuple(get_color_rgb(color))
+		index = self.__palette_indexes.get(rgb)
+		if index is None:
+			index = min(range(len(self.__palette)), key=lambda i: sum((a - b) ** 2 for a, b in zip(self.__palette[i], rgb)))
+			self.__palette_indexes[rgb] = index
+		return index
+
+	def get_palette(self):
+		'''Returns the palette frames are stored with.
+
+		Returns:
+			A list with the RGB tuple of every palette color, or None if frames are stored as RGB.
+		'''
+		return None if self.__palette is None else list(self.__palette)
+
+	def set_palette(self, palette):
+		'''Replaces the palette frames are stored with. Every pixel keeps its palette index, so this changes the colors of the whole animation buffer at once without drawing it again (Useful for flashing or day/night effects).
+
+		Args:
+			palette (list): A list of up to 256 colors, with at least as many colors as indexes in use.
+
+		Raises:
+			ValueError: If the Pizzoo object was not created with a palette or the palette is invalid.
+
+		Returns:
+			None
+		'''
+		if self.__palette is None:
+			raise ValueError('Frames are not stored with a palette')
+		self.__set_palette(palette)
+		for index in range(len(self.__buffer)):
+			self.__mark_frame_dirty(index, 0, 0, self.size, self.size)
+
+	def set_palette_color(self, index, color):
+		'''Changes a single color of the palette, recoloring every pixel drawn with it.
+
+		Args:
+			index (int): The palette index to change.
+			color (tuple(int, int, int) | string): The new color.
+
+		Raises:
+			ValueError: If the Pizzoo object was not created with a palette or the index is invalid.
+
+		Returns:
+			None
+		'''
+		if self.__palette is None:
+			raise ValueError('Frames are not stored with a palette')
+		self.__color_index(index)
+		palette = list(self.__palette)
+		palette[index] = color
+		self.set_palette(palette)
+
+	def push_clip(self, xy=(0, 0), width=None, height=None, translate=False):
+		'''Restricts drawing to a rectangle until pop_clip is called. Clips can be nested, every new one is intersected with the current one.
+
+		Every drawing method clips its shapes to the rectangle before writing them, so anything outside of it is not drawn and does not cost any time. Clearing the frame with cls is not clipped.
+
+		Args:
+			xy (tuple(int, int)): The coordinates of the top-left corner of the rectangle, relative to the current origin.
+			width (int | None): The width of the rectangle. If None, it extends to the right edge of the screen.
+			height (int | None): The height of the rectangle. If None, it extends to the bottom edge of the screen.
+			translate (bool): Whether to move the origin of every drawing method to the top-left corner of the rectangle. Default is False.
+
+		Returns:
+			None
+		'''
+		x, y = xy[0] + self.__origin[0], xy[1] + self.__origin[1]
+		x1 = self.size if width is None else x + width
+		y1 = self.size if height is None else y + height
+		self.__clip_stack.append((self.__clip, self.__origin))
+		clip = self.__clip
+		self.__clip = (max(x, clip[0]), max(y, clip[1]), min(x1, clip[2]), min(y1, clip[3]))
+		if translate:
+			self.__origin = (x, y)
+
+	def pop_clip(self):
+		'''Restores the clip rectangle and origin that were used before the last push_clip.
+
+		Raises:
+			ValueError: If there is no clip to pop.
+
+		Returns:
+			None
+		'''
+		if len(self.__clip_stack) == 0:
+			raise ValueError('No clip to pop')
+		self.__clip, self.__origin = self.__clip_stack.pop()
+
+	def get_clip(self):
+		'''Returns the region of the screen drawing methods are currently restricted to.
+
+		Returns:
+			A tuple (x, y, width, height) with the clip rectangle on screen coordinates, and the current origin as a tuple (x, y).
+		'''
+		x0, y0, x1, y1 = self.__clip
+		return (x0, y0, max(x1 - x0, 0), max(y1 - y0, 0)), self.__origin
+
+	def __local_clip(self):
+		'''Returns the clip rectangle relative to the current origin, as (x0, y0, x1, y1) with exclusive ends.'''
+		x0, y0, x1, y1 = self.__clip
+		ox, oy = self.__origin
+		return x0 - ox, y0 - oy, x1 - ox, y1 - oy
+
+	def add_layer(self, name, z=None, opacity=1.0, visible=True, blend='normal'):
+		'''Adds a new transparent layer, that is composited over every frame of the animation buffer when rendering.
+
+		Layers keep their content between renders, so static parts of a scene can be drawn only once. Use select_layer to draw on it.
+
+		Args:
+			name (str): The name to identify the layer.
+			z (int | None): The order of the layer, higher values are drawn on top. If None, it is placed on top of every other layer.
+			opacity (float): The opacity of the whole layer, between 0 and 1. Default is 1.
+			visible (bool): Whether the layer is shown or not. Default is True.
+			blend (str): How the layer is combined with the frame and layers below it: 'normal', 'add' or 'multiply'. Default is 'normal'.
+
+		Raises:
+			ValueError: If a layer with the same name already exists or the blend mode is invalid.
+
+		Returns:
+			The new Layer.
+		'''
+		return self.__layers.add(name, z, opacity, visible, blend)
+
+	def remove_layer(self, name):
+		'''Removes a layer. If it was selected, drawing goes back to the animation buffer.
+
+		Args:
+			name (str): The name of the layer.
 
 		Returns:
 			None
 		'''
-		self.__buffer[self.__current_frame] = frame
+		if self.__layers.remove(name) is self.__layer:
+			self.__layer = None
+
+	def get_layer(self, name):
+		'''Returns a layer by its name.
+
+		Args:
+			name (str): The name of the layer.
+
+		Raises:
+			ValueError: If the layer does not exist.
+
+		Returns:
+			The Layer.
+		'''
+		return self.__layers.get(name)
+
+	def update_layer(self, name, z=None, opacity=None, visible=None, blend=None, xy=None):
+		'''Changes the properties of a layer. Any property that is None is left as it is.
+
+		Moving a layer with xy does not need to draw it again, so it is the cheapest way to move a sprite drawn on its own layer.
+
+		Args:
+			name (str): The name of the layer.
+			z (int | None): The order of the layer, higher values are drawn on top.
+			opacity (float | None): The opacity of the whole layer, between 0 and 1.
+			visible (bool | None): Whether the layer is shown or not.
+			blend (str | None): How the layer is combined with the frame and layers below it: 'normal', 'add' or 'multiply'.
+			xy (tuple(int, int) | None): The offset the layer is drawn at.
+
+		Raises:
+			ValueError: If the layer does not exist or the blend mode is invalid.
+
+		Returns:
+			None
+		'''
+		layer = self.__layers.get(name)
+		if blend is not None:
+			if blend not in BLEND_MODES:
+				raise ValueError(f'Invalid blend mode: {blend} (expected one of {", ".join(BLEND_MODES)})')
+			layer.blend = blend
+		if z is not None:
+			layer.z = z
+		if opacity is not None:
+			layer.opacity = clamp(opacity, 0, 1)
+		if visible is not None:
+			layer.visible = visible
+		if xy is not None:
+			layer.xy = tuple(xy)
+
+	def select_layer(self, name=None):
+		'''Selects the layer every drawing method draws on. Gifs are always drawn on the animation buffer.
+
+		Args:
+			name (str | None): The name of the layer, or None to draw on the animation buffer again.
+
+		Raises:
+			ValueError: If the layer does not exist.
+
+		Returns:
+			None
+		'''
+		self.__layer = None if name is None else self.__layers.get(name)
+
+	def clear_layer(self, name=None):
+		'''Makes every pixel of a layer transparent.
+
+		Args:
+			name (str | None): The name of the layer. If None, the selected layer is cleared.
+
+		Returns:
+			None
+		'''
+		layer = self.__layer if name is None else self.__layers.get(name)
+		if layer is not None:
+			layer.clear()
+
+	def __composite_layers(self, buffer):
+		'''Returns the frames of the buffer with every visible layer drawn over them, leaving the buffer itself untouched so a failed render can be retried.'''
+		if len(self.__layers) == 0:
+			return buffer
+		passes = self.__layers.composite()
+		bbox = None
+		for _, image in passes:
+			rect = image.getchannel('A').getbbox()
+			if rect is not None:
+				bbox = rect if bbox is None else (min(bbox[0], rect[0]), min(bbox[1], rect[1]), max(bbox[2], rect[2]), max(bbox[3], rect[3]))
+		if bbox is None:
+			return buffer
+		passes = [(mode, image.crop(bbox)) for mode, image in passes]
+		depth = self.__frame_depth
+		stride = self.size * depth
+		row_size = (bbox[2] - bbox[0]) * depth
+		start = (bbox[1] * self.size + bbox[0]) * depth
+		rows = range(start, start + (bbox[3] - bbox[1]) * stride, stride)
+		# Frames sharing their storage are only composited once, and keep sharing the composited copy
+		composited = {}
+		for index, frame in enumerate(buffer):
+			self.__mark_frame_dirty(index, *bbox)
+			if id(frame) in composited:
+				continue
+			region = self.__decode_pixels(b''.join(frame[row:row + row_size] for row in rows), (bbox[2] - bbox[0], bbox[3] - bbox[1]), depth).convert('RGBA')
+			for mode, image in passes:
+				region = blend(region, image, mode)
+			data = self.__encode_pixels(region)
+			copy = bytearray(frame)
+			for offset, row in enumerate(rows):
+				copy[row:row + row_size] = data[offset * row_size:(offset + 1) * row_size]
+			composited[id(frame)] = copy
+		return [composited[id(frame)] for frame in buffer]
 
 	def draw_pixel(self, xy, color):
-		'''Draws a single pixel on the current frame at the given coordinates.
+		'''Draws a single pixel on the current frame at the given coordinates. As with every other drawing method, a pixel outside of the screen (Or the clip rectangle) is skipped.
 
 		Args:
 			xy (tuple(int, int)): The coordinates to draw the pixel at.
 			color (tuple(int, int, int) | int | string): The color to draw the pixel with.
 
+		Returns:
+			None
+		'''
+		x, y = xy[0] + self.__origin[0], xy[1] + self.__origin[1]
+		# The clip rectangle never extends past the screen, so this also skips pixels out of the screen
+		clip = self.__clip
+		if x < clip[0] or x >= clip[2] or y < clip[1] or y >= clip[3]:
+			return
+		layer = self.__layer
+		if layer is not None:
+			index = (x + y * self.size) * 4
+			layer.data[index:index + 4] = self.__pixel(color)
+			layer.version += 1
+			return
+		try:
+			pixel = self.__pixel_cache[color]
+		except (KeyError, TypeError):
+			pixel = self.__cache_pixel(color)
+		frame = self.__buffer[self.__current_frame]
+		if id(frame) in self.__frame_digests:
+			frame = self.__frame_for_write(self.__current_frame)
+		depth = self.__frame_depth
+		index = (x + y * self.size) * depth
+		frame[index:index + depth] = pixel
+		# Same as __mark_dirty, inlined as this is called once per pixel
+		rect = self.__dirty_rects[self.__current_frame]
+		if rect is None:
+			self.__dirty_rects[self.__current_frame] = (x, y, x + 1, y + 1)
+		elif x < rect[0] or x >= rect[2] or y < rect[1] or y >= rect[3]:
+			self.__dirty_rects[self.__current_frame] = (min(x, rect[0]), min(y, rect[1]), max(x + 1, rect[2]), max(y + 1, rect[3]))
+
+	def __cache_pixel(self, color):
+		'''Returns the bytes of a frame pixel of the given color, keeping them so next draw_pixel calls with the same color skip the conversion.'''
+		pixel = self.__frame_pixel(color)
+		if len(self.__pixel_cache) >= 256:
+			self.__pixel_cache.clear()
+		self.__pixel_cache[color] = pixel
+		return pixel
+
+	def draw_pixels(self, coords, colors):
+		'''Draws a batch of pixels on the current frame. Pixels outside of the screen (Or the clip rectangle) are skipped.
+
+		Both arguments can also be NumPy arrays (Of shape (n, 2) for coords and (n, 3) for colors, or (3,) and (1, 3) for a single color), in which case the pixels are clipped and written to the frame in a single vectorized operation. NumPy is not required otherwise.
+
+		Args:
+			coords (iterable(tuple(int, int))): The coordinates of every pixel to draw.
+			colors (tuple(int, int, int) | int | string | iterable): A single color for every pixel, or one color per pixel.
+
 		Raises:
-			ValueError: If the given coordinates are out of bounds.
+			ValueError: If one color per pixel is given and there are not as many colors as coordinates.
 
 		Returns:
 			None
 		'''
-		index = xy[0] + (xy[1] * self.size)
-		rgb = get_color_rgb(color)
-		if index < 0 or index >= self.pixel_count:
-			raise ValueError(f'Invalid index given: {index} (maximum index is {self.pixel_count - 1})')
-		# FIXME: Could we maybe move to rgba and use the alpha channel to determine if the pixel is on or off? -> index = index * 4
-		index = index * 3
-		self.__buffer[self.__current_frame][index + 1] = rgb[1]
-		self.__buffer[self.__current_frame][index] = rgb[0]
-		self.__buffer[self.__current_frame][index + 2] = rgb[2]
+		frame, depth = self.__surface()
+		if hasattr(colors, '__array__') and len(getattr(colors, 'shape', ())) == 1:
+			colors = tuple(int(value) for value in colors)
+		single = isinstance(colors, (tuple, str, int))
+		if not single:
+			# Iterators can only be read once, so they are stored to check both lengths
+			if not hasattr(coords, '__len__'):
+				coords = list(coords)
+			if not hasattr(colors, '__len__'):
+				colors = list(colors)
+			# An array with a single row is a single color for every pixel
+			expected = (1, len(coords)) if hasattr(colors, '__array__') else (len(coords),)
+			if len(colors) not in expected:
+				raise ValueError(f'Invalid colors given: {len(colors)} colors for {len(coords)} pixels')
+		if hasattr(coords, '__array__') or hasattr(colors, '__array__'):
+			self.__draw_pixels_array(frame, depth, coords, colors, single)
+			return
+		size = self.size
+		ox, oy = self.__origin
+		clip_x0, clip_y0, clip_x1, clip_y1 = self.__clip
+		xs, ys = [], []
+		if single:
+			pixel = self.__pixel(colors)
+			for x, y in coords:
+				x, y = x + ox, y + oy
+				if clip_x0 <= x < clip_x1 and clip_y0 <= y < clip_y1:
+					index = (x + y * size) * depth
+					frame[index:index + depth] = pixel
+					xs.append(x)
+					ys.append(y)
+		else:
+			pixels = {}
+			for (x, y), color in zip(coords, colors):
+				x, y = x + ox, y + oy
+				if clip_x0 <= x < clip_x1 and clip_y0 <= y < clip_y1:
+					key = tuple(color) if isinstance(color, list) else color
+					if key not in pixels:
+						pixels[key] = self.__pixel(key)
+					index = (x + y * size) * depth
+					frame[index:index + depth] = pixels[key]
+					xs.append(x)
+					ys.append(y)
+		if len(xs) > 0:
+			self.__mark_dirty(min(xs), min(ys), max(xs) + 1, max(ys) + 1)
+
+	def __draw_pixels_array(self, frame, depth, coords, colors, single):
+		import numpy as np
+		points = np.asarray(coords, dtype=np.intp).reshape(-1, 2)
+		xs, ys = points[:, 0] + self.__origin[0], points[:, 1] + self.__origin[1]
+		clip_x0, clip_y0, clip_x1, clip_y1 = self.__clip
+		visible = (xs >= clip_x0) & (xs < clip_x1) & (ys >= clip_y0) & (ys < clip_y1)
+		if not visible.any():
+			return
+		self.__mark_dirty(int(xs[visible].min()), int(ys[visible].min()), int(xs[visible].max()) + 1, int(ys[visible].max()) + 1)
+		# Zero-copy view of the frame, so the scatter writes straight into the buffer
+		view = np.frombuffer(frame, dtype=np.uint8).reshape(self.size, self.size, depth)
+		if depth == 1:
+			if single:
+				indexes = self.__color_index(colors)
+			elif hasattr(colors, '__array__'):
+				# Closest palette color of every pixel
+				rgb = np.asarray(colors, dtype=np.int32).reshape(-1, np.shape(colors)[-1])[:, :3]
+				indexes = self.__broadcast_colors(((rgb[:, None, :] - np.array(self.__palette, dtype=np.int32)[None]) ** 2).sum(axis=2).argmin(axis=1), len(points))[visible]
+			else:
+				indexes = np.array([self.__color_index(tuple(color) if isinstance(color, list) else color) for color in colors], dtype=np.uint8)[visible]
+			view[ys[visible], xs[visible], 0] = indexes
+			return
+		if depth == 4:
+			view[ys[visible], xs[visible], 3] = 255
+		if single:
+			view[ys[visible], xs[visible], :3] = self.__color_rgb(colors)
+			return
+		if hasattr(colors, '__array__'):
+			rgb = np.asarray(colors, dtype=np.uint8).reshape(-1, np.shape(colors)[-1])[:, :3]
+		else:
+			rgb = np.array([self.__color_rgb(tuple(color) if isinstance(color, list) else color) for color in colors], dtype=np.uint8)
+		view[ys[visible], xs[visible], :3] = self.__broadcast_colors(rgb, len(points))[visible]
+
+	def __broadcast_colors(self, colors, count):
+		'''Repeats a single row of colors for every pixel, checking there is one color per pixel otherwise.'''
+		import numpy as np
+		if len(colors) == 1:
+			return np.broadcast_to(colors, (count,) + colors.shape[1:])
+		if len(colors) != count:
+			raise ValueError(f'Invalid colors given: {len(colors)} colors for {count} pixels')
+		return colors
 
 	def draw_rectangle(self, xy, width, height, color, filled=True):
-		'''Draws a rectangle on the current frame at the given coordinates.
+		'''Draws a rectangle on the current frame at the given coordinates. Any part of the rectangle outside of the screen is clipped.
 
 		Args:
 			xy (tuple(int, int)): The coordinates of the top-left corner of the rectangle.
@@ -163,10 +911,44 @@ class Pizzoo:
 		Returns:
 			None
 		'''
-		for x in range(xy[0], xy[0] + width):
-			for y in range(xy[1], xy[1] + height):
-				if filled or x == xy[0] or x == xy[0] + width - 1 or y == xy[1] or y == xy[1] + height - 1:
-					self.draw_pixel((x, y), color)
+		if width <= 0 or height <= 0:
+			return
+		pixel = self.__pixel(color)
+		x, y = xy
+		if filled or width <= 2 or height <= 2:
+			self.__fill_rect(x, y, width, height, pixel)
+			return
+		# Only the four edges are written for outlined rectangles
+		self.__fill_rect(x, y, width, 1, pixel)
+		self.__fill_rect(x, y + height - 1, width, 1, pixel)
+		self.__fill_rect(x, y + 1, 1, height - 2, pixel)
+		self.__fill_rect(x + width - 1, y + 1, 1, height - 2, pixel)
+
+	def __fill_rect(self, x, y, width, height, pixel):
+		'''Fills a block of the current frame with the given pixel bytes, relative to the current origin and clipped to the clip rectangle.
+
+		Blocks are written a whole scanline at a time using slice assignment, full-width blocks in a single assignment and single columns with a strided assignment per channel.
+		'''
+		x, y = x + self.__origin[0], y + self.__origin[1]
+		clip = self.__clip
+		x0, y0 = max(x, clip[0]), max(y, clip[1])
+		x1, y1 = min(x + width, clip[2]), min(y + height, clip[3])
+		if x0 >= x1 or y0 >= y1:
+			return
+		self.__mark_dirty(x0, y0, x1, y1)
+		frame, depth = self.__surface()
+		stride = self.size * depth
+		start = (y0 * self.size + x0) * depth
+		if x0 == 0 and x1 == self.size:
+			frame[start:y1 * stride] = pixel * ((y1 - y0) * self.size)
+		elif x1 - x0 == 1:
+			end = start + (y1 - y0) * stride
+			for channel in range(depth):
+				frame[start + channel:end:stride] = pixel[channel:channel + 1] * (y1 - y0)
+		else:
+			span = pixel * (x1 - x0)
+			for row_start in range(start, start + (y1 - y0) * stride, stride):
+				frame[row_start:row_start + len(span)] = span
 
 	def draw_circle(self, xy, radius, color, filled=True):
 		'''Draws a circle on the current frame at the given coordinates.
@@ -180,12 +962,91 @@ class Pizzoo:
 		Returns:
 			None
 		'''
-		for x in range(xy[0] - radius, xy[0] + radius + 1):
-			for y in range(xy[1] - radius, xy[1] + radius + 1):
-				if (x - xy[0]) ** 2 + (y - xy[1]) ** 2 <= radius ** 2:
-					self.draw_pixel((x, y), color)
+		self.__fill_ellipse(xy[0], xy[1], radius, radius, self.__pixel(color), filled)
+
+	def draw_ellipse(self, xy, radius_x, radius_y, color, filled=True):
+		'''Draws an ellipse on the current frame at the given coordinates.
+
+		Args:
+			xy (tuple(int, int)): The coordinates of the center of the ellipse.
+			radius_x (int): The horizontal radius of the ellipse.
+			radius_y (int): The vertical radius of the ellipse.
+			color (tuple(int, int, int) | int | string): The color to draw the ellipse with.
+			filled (bool): Whether to fill the ellipse or not.
+
+		Returns:
+			None
+		'''
+		self.__fill_ellipse(xy[0], xy[1], radius_x, radius_y, self.__pixel(color), filled)
+
+	def __fill_ellipse(self, cx, cy, radius_x, radius_y, pixel, filled=True):
+		'''Rasterizes an ellipse as horizontal spans, one per row when filled and two per row for outlines.
+
+		The half width of every row is the largest dx that satisfies (dx / rx)^2 + (dy / ry)^2 <= 1, computed with an integer square root. Outlines keep only the pixels that are not covered by the rows above and below.
+		'''
+		if radius_x < 0 or radius_y < 0:
+			return
+		clip_x0, clip_y0, clip_x1, clip_y1 = self.__local_clip()
+		top = cy - radius_y
+		# Only the rows inside of the clip rectangle (And their neighbours, for outlines) are computed
+		first, last = max(clip_y0 - top, 0), min(clip_y1 - 1 - top, radius_y * 2)
+		if first > last or cx + radius_x < clip_x0 or cx - radius_x >= clip_x1:
+			return
+		start, last_row = max(first - 1, 0), min(last + 1, radius_y * 2)
+		if radius_y == 0:
+			halves = [radius_x]
+		else:
+			rx2, ry2 = radius_x * radius_x, radius_y * radius_y
+			halves = [isqrt(rx2 * (ry2 - dy * dy) // ry2) for dy in range(start - radius_y, last_row - radius_y + 1)]
+		for row in range(first, last + 1):
+			half = halves[row - start]
+			y = top + row
+			inner = -1
+			if not filled:
+				above = halves[row - start - 1] if row > 0 else -1
+				below = halves[row - start + 1] if row < radius_y * 2 else -1
+				inner = min(above, below, half - 1)
+			if inner < 0:
+				self.__fill_rect(cx - half, y, half * 2 + 1, 1, pixel)
+			else:
+				self.__fill_rect(cx - half, y, half - inner, 1, pixel)
+				self.__fill_rect(cx + inner + 1, y, half - inner, 1, pixel)
+
+	def draw_polygon(self, points, color, filled=True):
+		'''Draws a closed polygon on the current frame with the given vertices.
+
+		Args:
+			points (list(tuple(int, int))): The coordinates of every vertex of the polygon, in order.
+			color (tuple(int, int, int) | int | string): The color to draw the polygon with.
+			filled (bool): Whether to fill the polygon or not. The fill uses the even-odd rule.
+
+		Returns:
+			None
+		'''
+		pixel = self.__pixel(color)
+		points = [(int(x), int(y)) for x, y in points]
+		if filled and len(points) > 2:
+			edges = [(points[i - 1], points[i]) for i in range(len(points)) if points[i - 1][1] != points[i][1]]
+			_, clip_y0, _, clip_y1 = self.__local_clip()
+			top = max(min(y for _, y in points), clip_y0)
+			bottom = min(max(y for _, y in points), clip_y1 - 1)
+			for y in range(top, bottom + 1):
+				# Every crossing is kept as an exact fraction (numerator, denominator) to round the spans without float errors
+				crossings = []
+				for (x0, y0), (x1, y1) in edges:
+					if min(y0, y1) <= y < max(y0, y1):
+						numerator, denominator = x0 * (y1 - y0) + (y - y0) * (x1 - x0), y1 - y0
+						if denominator < 0:
+							numerator, denominator = -numerator, -denominator
+						crossings.append((numerator / denominator, numerator, denominator))
+				crossings.sort()
+				for (_, n0, d0), (_, n1, d1) in zip(crossings[::2], crossings[1::2]):
+					start, end = -(-n0 // d0), n1 // d1
+					self.__fill_rect(start, y, end - start + 1, 1, pixel)
+		for i in range(len(points)):
+			self.__draw_line(points[i - 1], points[i], pixel)
 	
-	def draw_image(self, image_or_path, xy=(0, 0), size='auto', resample_method=Image.NEAREST):
+	def draw_image(self, image_or_path, xy=(0, 0), size='auto', resample_method=Image.NEAREST, blend=False):
 		'''Draws an image on the current frame at the given coordinates.
 
 		Args:
@@ -193,25 +1054,94 @@ class Pizzoo:
 			xy (tuple(int, int)): The coordinates of the top-left corner of the image.
 			size (tuple(int, int) | str): The size to resize the image to. If 'auto' is given, the image will be resized to fit the screen if needed.
 			resample_method (Resampling): The resample mode to use when resizing the image to fit the screen. Default is Image.NEAREST.
+			blend (bool): Whether to blend semi-transparent pixels with the frame using their alpha value. If False, any pixel that is not fully transparent is drawn as opaque. Default is False.
 		
 		Returns:
 			None
 		'''
 		if isinstance(image_or_path, str):
-			image = Image.open(image_or_path)
+			image = self.__load_image(image_or_path, size, resample_method)
 		else:
-			image = image_or_path
+			image = self.__prepare_image(image_or_path, size, resample_method)
+		self.__blit_image(image, xy, blend)
+
+	def __prepare_image(self, image, size, resample_method):
 		width, height = self.__compute_image_resize(image, size)
 		image = ImageOps.fit(image, (width, height), method=resample_method, centering=(0.5, 0.5))
-		image = image.convert('RGBA')
-		for x in range(image.width):
-			for y in range(image.height):
-				rgba = image.getpixel((x, y))
-				if rgba[3] > 0:
-					placed_x, placed_y = x + xy[0], y + xy[1]
-					if self.size - 1 < placed_x or placed_x < 0 or self.size - 1 < placed_y or placed_y < 0:
-						continue
-					self.draw_pixel((placed_x, placed_y), rgba)
+		return image.convert('RGBA')
+
+	def __load_image(self, path, size, resample_method):
+		'''Returns the image on the given path already resized and converted to RGBA, using the image cache.
+
+		Entries are keyed by the file modification time too, so an asset is decoded again when it changes on disk.
+		'''
+		key = (path, stat(path).st_mtime_ns, size, resample_method, self.size)
+		image = self.__image_cache.get(key)
+		if image is None:
+			with Image.open(path) as source:
+				image = self.__prepare_image(source, size, resample_method)
+			self.__image_cache.put(key, image)
+		return image
+
+	def get_image_cache_info(self):
+		'''Returns the usage stats of the image cache used by draw_image when drawing images from a path.
+
+		Returns:
+			A dict with the hits, misses, current size and maximum size of the cache.
+		'''
+		return self.__image_cache.info()
+
+	def clear_image_cache(self, path=None):
+		'''Removes decoded images from the image cache, so they are read from disk again the next time they are drawn.
+
+		Args:
+			path (str | None): The path of the image to remove. If None, every cached image is removed.
+
+		Returns:
+			An int with the number of removed items.
+		'''
+		return self.__image_cache.invalidate(None if path is None else lambda key: key[0] == path)
+
+	def __blit_image(self, image, xy, blend=False):
+		'''Copies an RGBA image into the current frame at the given coordinates.
+
+		The image is clipped to the clip rectangle once. Fully opaque images are copied row by row with slice assignments, any other one is composited with its alpha mask by Pillow over the covered region of the frame.
+		'''
+		xy = (xy[0] + self.__origin[0], xy[1] + self.__origin[1])
+		clip = self.__clip
+		x0, y0 = max(xy[0], clip[0]), max(xy[1], clip[1])
+		x1, y1 = min(xy[0] + image.width, clip[2]), min(xy[1] + image.height, clip[3])
+		if x0 >= x1 or y0 >= y1:
+			return
+		if x1 - x0 != image.width or y1 - y0 != image.height:
+			image = image.crop((x0 - xy[0], y0 - xy[1], x1 - xy[0], y1 - xy[1]))
+		alpha = image.getchannel('A')
+		min_alpha, max_alpha = alpha.getextrema()
+		if max_alpha == 0:
+			return
+		self.__mark_dirty(x0, y0, x1, y1)
+		frame, depth = self.__surface()
+		mode = 'RGBA' if depth == 4 else 'RGB'
+		stride = self.size * depth
+		row_size = (x1 - x0) * depth
+		start = (y0 * self.size + x0) * depth
+		rows = range(start, start + (y1 - y0) * stride, stride)
+		# Pixels that are drawn are opaque, unless they are blended over a layer
+		source = image.convert('RGB').convert(mode)
+		if min_alpha == 255 or (min_alpha > 0 and not blend):
+			data = source.tobytes() if depth != 1 else self.__encode_pixels(source)
+		else:
+			region = self.__decode_pixels(b''.join(frame[row:row + row_size] for row in rows), source.size, depth)
+			if blend and mode == 'RGBA':
+				region.alpha_composite(image)
+			else:
+				region.paste(source, (0, 0), alpha if blend else alpha.point(ALPHA_MASK_TABLE))
+			data = region.tobytes() if depth != 1 else self.__encode_pixels(region)
+		if row_size == stride:
+			frame[start:start + len(data)] = data
+			return
+		for offset, row in enumerate(rows):
+			frame[row:row + row_size] = data[offset * row_size:(offset + 1) * row_size]
 
 	def draw_gif(self, gif_path, xy=(0, 0), size='auto', loop=False, resample_method=Image.NEAREST, fill='auto'):
 		'''Draws a gif on the animation buffer, starting on current frame. If the gif is larger than the screen, it will be resized to fit the screen.
@@ -228,39 +1158,76 @@ class Pizzoo:
 			None
 		'''
 		current_frame = self.__current_frame if self.__current_frame >= 0 else 0
-		gif = Image.open(gif_path)
 		remaining_frames = self.__max_frames - current_frame
-		total_frames = remaining_frames if loop else min(remaining_frames, gif.n_frames)
-		current_gif_frame = 0
-		for frame in range(0, total_frames):
-			if frame >= self.__max_frames:
-				break
-			try:
-				current_gif_frame += 1
-				gif.seek(current_gif_frame)
-			except EOFError:
-				current_gif_frame = 0
-				gif.seek(current_gif_frame)
-			if fill == 'auto':
-				self.cls()
-			elif fill is not None:
-				self.cls(fill)
-			self.draw_image(gif, xy, size, resample_method)
-			if frame < total_frames - 1:
-				if len(self.__buffer) < self.__current_frame + 2:
-					self.add_frame()
-				else:
-					self.__current_frame += 1
-		self.__current_frame = current_frame
+		frame_count, frames = self.__load_gif_frames(gif_path, size, resample_method)
+		layer, self.__layer = self.__layer, None
+		# The gif file, the selected layer and the current frame are restored even if drawing fails
+		try:
+			total_frames = remaining_frames if loop else min(remaining_frames, frame_count)
+			for frame, image in zip(range(0, total_frames), frames):
+				if fill == 'auto':
+					self.cls()
+				elif fill is not None:
+					self.cls(fill)
+				self.__blit_image(image, xy)
+				if frame < total_frames - 1:
+					if len(self.__buffer) < self.__current_frame + 2:
+						self.add_frame()
+					else:
+						self.__intern_frame(self.__current_frame)
+						self.__current_frame += 1
+		finally:
+			frames.close()
+			self.__current_frame = current_frame
+			self.__layer = layer
+
+	def __load_gif_frames(self, gif_path, size, resample_method):
+		'''Returns the number of frames of a gif and an endless iterator with its frames already resized and converted to RGBA, starting on its second frame and looping.
+
+		Gifs that fit on the animation buffer are decoded once and kept on the image cache, so drawing or looping them again reuses the same frames without opening the file. Longer gifs are decoded as a stream, one frame at a time, so memory use does not depend on their length.
+		'''
+		key = (gif_path, stat(gif_path).st_mtime_ns, size, resample_method, self.size, 'frames')
+		frames = self.__image_cache.get(key)
+		if frames is None:
+			with Image.open(gif_path) as gif:
+				frame_count = gif.n_frames
+				if frame_count > self.__max_frames:
+					return frame_count, self.__stream_gif_frames(gif_path, size, resample_method)
+				frames = []
+				for index in range(frame_count):
+					gif.seek(index)
+					frames.append(self.__prepare_image(gif, size, resample_method))
+			self.__image_cache.put(key, frames)
+		return len(frames), (frames[index % len(frames)] for index in count(1))
+
+	def __stream_gif_frames(self, gif_path, size, resample_method):
+		with Image.open(gif_path) as gif:
+			index = 0
+			while True:
+				try:
+					index += 1
+					gif.seek(index)
+				except EOFError:
+					index = 0
+					gif.seek(index)
+				yield self.__prepare_image(gif, size, resample_method)
 
 	def __get_font(self, font_name):
 		if font_name not in self.__fonts:
 			raise ValueError(f'Font "{font_name}" not found')
 		if type(self.__fonts[font_name]) == str:
-			from bdfparser import Font
-			self.__fonts[font_name] = Font(self.__fonts[font_name])
+			self.__fonts[font_name] = self.__load_bitmap_font(self.__fonts[font_name])
 		return self.__fonts[font_name]
 
+	def __load_bitmap_font(self, path):
+		'''Returns the font on the given path, parsing it only once for every instance.'''
+		key = (realpath(path), stat(path).st_mtime_ns)
+		font = self.__font_cache.get(key)
+		if font is None:
+			font = BitmapFont.load(path)
+			self.__font_cache.put(key, font)
+		return font
+
 	def draw_text(self, text, xy=(0, 0), font='default', color='#FFFFFF', align=0, line_width='auto', shadow=None, shadow_rgb=(0, 0, 0)):
 		'''Draws a text on the current frame at the given coordinates.
 
@@ -279,10 +1246,10 @@ class Pizzoo:
 		'''
 		font = self.__get_font(font)
 		line_width = self.size if line_width == 'auto' else line_width
-		rgb = get_color_rgb(color)
-		bitmap = font.draw(text.strip(), missing='?', linelimit=line_width)
+		rgb = self.__color_rgb(color)
+		shadow_displacement = None
 		if shadow is not None:
-			shadow_rgb = get_color_rgb(shadow_rgb)
+			shadow_rgb = self.__color_rgb(shadow_rgb)
 			shadow_displacement = (0, 0)
 			if type(shadow) == tuple:
 				shadow_displacement = shadow
@@ -292,17 +1259,28 @@ class Pizzoo:
 				shadow_displacement = (0, -1)
 			elif shadow == 'diagonal':
 				shadow_displacement = (1, -1)
-			bitmap.shadow(shadow_displacement[0], shadow_displacement[1])
-		text_data = bitmap.todata(2)
-		width, height = bitmap.width(), bitmap.height()
-		xy = self.__compute_text_coords(text, xy, width, height, (0, 0))
-		for x in range(width):
-			for y in range(height):
-				if text_data[y][x]:
-					placed_x, placed_y = x + xy[0], y + xy[1]
-					if self.size - 1 < placed_x or placed_x < 0 or self.size - 1 < placed_y or placed_y < 0:
-						continue
-					self.draw_pixel((placed_x, placed_y), rgb if text_data[y][x] == 1 else shadow_rgb)
+		text = text.strip()
+		key = (font, text, line_width, shadow_displacement)
+		mask = self.__text_cache.get(key)
+		if mask is None:
+			mask = font.draw(text, line_width, shadow_displacement)
+			self.__text_cache.put(key, mask)
+		if mask is None:
+			return
+		xy = self.__compute_text_coords(text, xy, mask.width, mask.height, (0, 0))
+		# The cached mask is colored through its palette: 0 is transparent, 1 is the text and 2 the shadow
+		image = mask.copy()
+		image.putpalette((0, 0, 0) + rgb + (shadow_rgb if shadow is not None else (0, 0, 0)))
+		image.info['transparency'] = 0
+		self.__blit_image(image.convert('RGBA'), xy)
+
+	def get_text_cache_info(self):
+		'''Returns the usage stats of the cache of rasterized texts used by draw_text.
+
+		Returns:
+			A dict with the hits, misses, current size and maximum size of the cache.
+		'''
+		return self.__text_cache.info()
 
 	def __compute_image_resize(self, image, size):
 		if size == 'auto':
@@ -337,41 +1315,313 @@ class Pizzoo:
 		Returns:
 			None
 		'''
+		self.__draw_line(start, end, self.__pixel(color))
+
+	def __draw_line(self, start, end, pixel):
+		'''Rasterizes a line with the Bresenham algorithm, both ends included.
+
+		The pixel at step i along the major axis is offset floor((2 * i * minor + major - 1) / (2 * major)) on the minor axis, so the pixels sharing the same row (or column for steep lines) are computed directly as a single span. Lines are clipped once: segments with both ends on the same outer side of the clip rectangle (Cohen-Sutherland outcodes) are rejected, and only the steps and spans inside of it are computed.
+		'''
 		x0, y0 = start
 		x1, y1 = end
+		clip = self.__local_clip()
+		if self.__outcode(x0, y0, clip) & self.__outcode(x1, y1, clip):
+			return
 		dx = abs(x1 - x0)
 		dy = abs(y1 - y0)
-		sx = 1 if x0 < x1 else -1
-		sy = 1 if y0 < y1 else -1
-		err = dx - dy
-		while x0 != x1 or y0 != y1:
-			self.draw_pixel((x0, y0), color)
-			e2 = 2 * err
-			if e2 > -dy:
-				err -= dy
-				x0 += sx
-			if e2 < dx:
-				err += dx
-				y0 += sy
-
-	def render(self, frame_speed=150):
+		if dx == 0 or dy == 0:
+			self.__fill_rect(min(x0, x1), min(y0, y1), dx + 1, dy + 1, pixel)
+			return
+		horizontal = dx >= dy
+		# Work on the major (a) and minor (b) axes, so steep lines are handled as horizontal ones
+		if horizontal:
+			a0, b0, a1, b1, major, minor = x0, y0, x1, y1, dx, dy
+			a_min, b_min, a_max, b_max = clip
+		else:
+			a0, b0, a1, b1, major, minor = y0, x0, y1, x1, dy, dx
+			b_min, a_min, b_max, a_max = clip
+		sa = 1 if a0 < a1 else -1
+		sb = 1 if b0 < b1 else -1
+		# Range of steps inside of the clip rectangle on the major axis
+		if sa > 0:
+			first, last = max(a_min - a0, 0), min(a_max - 1 - a0, major)
+		else:
+			first, last = max(a0 - a_max + 1, 0), min(a0 - a_min, major)
+		if first > last:
+			return
+		# Range of spans inside of it on the minor axis
+		offset = lambda step: (2 * step * minor + major - 1) // (2 * major)
+		if sb > 0:
+			k_first, k_last = max(offset(first), b_min - b0), min(offset(last), b_max - 1 - b0)
+		else:
+			k_first, k_last = max(offset(first), b0 - b_max + 1), min(offset(last), b0 - b_min)
+		for k in range(k_first, k_last + 1):
+			# Steps whose offset is k, the first one being the smallest step with offset(step) >= k
+			span_start = max(-((major - 1 - 2 * major * k) // (2 * minor)), first)
+			span_end = min(-((major - 1 - 2 * major * (k + 1)) // (2 * minor)) - 1, last)
+			if span_start > span_end:
+				continue
+			a = a0 + sa * span_start if sa > 0 else a0 + sa * span_end
+			b = b0 + sb * k
+			if horizontal:
+				self.__fill_rect(a, b, span_end - span_start + 1, 1, pixel)
+			else:
+				self.__fill_rect(b, a, 1, span_end - span_start + 1, pixel)
+
+	def __outcode(self, x, y, clip):
+		return (x < clip[0]) | (x >= clip[2]) << 1 | (y < clip[1]) << 2 | (y >= clip[3]) << 3
+
+	def render(self, frame_speed=150, force=False):
 		'''Renders the current animation buffer to the Pixoo device. After that it resets the buffer.
 
 		Take into account that only a max of 60 frames can be rendered at once. So any buffer with more than 60 frames will be truncated.
+		If background_render is enabled, it returns as soon as the buffer is handed to the background renderer, and errors of a previous background render are raised here.
 
 		Args:
 			frame_speed (int): The speed in milliseconds per frame. Default is 150. (Only useful if more than 1 frame is being rendered)
+			force (bool): Whether to render the buffer even if it is the same as the last rendered one. Only useful if skip_unchanged is enabled. Default is False.
 		
 		Returns:
 			None
 		'''
-		self.renderer.render(self.__buffer, frame_speed)
-		self.reset_buffer()
+		buffer = self.__prepare_render()
+		state = self.__capture_render_state()
+		if self.__render_worker is not None:
+			# The front buffer is sent while drawing goes on in a new back buffer, and its frames are recycled by the worker once they are sent or dropped
+			self.__render_worker.submit(buffer, frame_speed, force, state)
+			self.__finish_render(buffer, in_flight=buffer is self.__buffer)
+		else:
+			self.__render_buffer(buffer, frame_speed, force, state)
+			self.__finish_render(buffer)
+
+	def wait_render(self, timeout=None):
+		'''Waits until the last buffer handed to the background renderer is rendered. Does nothing if background_render is disabled.
+
+		Args:
+			timeout (float | None): The maximum time to wait in seconds. Default is None (No limit).
+
+		Raises:
+			Exception: The error of a background render that failed, if any.
+
+		Returns:
+			A bool, False if the timeout expired before the render finished.
+		'''
+		if self.__render_worker is None:
+			return True
+		return self.__render_worker.wait(timeout)
+
+	def get_render_stats(self):
+		'''Returns the statistics of the background renderer.
+
+		Returns:
+			A dict with the submitted, sent, dropped (Replaced by a newer buffer before being rendered) and failed buffers, whether one is pending, and the average and max time in seconds buffers waited before being rendered. None if background_render is disabled.
+		'''
+		if self.__render_worker is None:
+			return None
+		return self.__render_worker.get_stats()
+
+	def close(self):
+		'''Stops the background renderer once the last buffer handed to it is rendered, and closes the connections of every renderer. Rendering with background_render raises a RuntimeError after this.
+
+		It is called when leaving a with block that uses the instance. Renderers with an async close method (Like AsyncPixoo64Renderer) have to be closed by awaiting it instead.
+
+		Raises:
+			Exception: The error of a background render that failed, if any.
+
+		Returns:
+			None
+		'''
+		try:
+			if self.__render_worker is not None:
+				self.__render_worker.close()
+		finally:
+			self.__reset_render_pool()
+			for renderer in self.get_renderers():
+				close = getattr(renderer, 'close', None)
+				if close is not None and not iscoroutinefunction(close):
+					close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+	def __render_buffer(self, buffer, frame_speed, force=False, state=None):
+		if len(self.__renderers) == 0:
+			self.__render_to(self.renderer, buffer, frame_speed, force, state)
+		else:
+			self.__render_all(buffer, frame_speed, force, state)
+
+	async def render_async(self, frame_speed=150, force=False):
+		'''Renders the current animation buffer on every renderer without blocking the event loop. After that it resets the buffer.
+
+		Renderers with a render_async method (Like AsyncPixoo64Renderer) are awaited concurrently on the running loop, any other renderer is run on a worker thread.
+
+		Args:
+			frame_speed (int): The speed in milliseconds per frame. Default is 150. (Only useful if more than 1 frame is being rendered)
+			force (bool): Whether to render the buffer even if it is the same as the last rendered one. Only useful if skip_unchanged is enabled. Default is False.
+
+		Returns:
+			None
+		'''
+		buffer = self.__prepare_render()
+		state = self.__capture_render_state()
+		results = await gather(*(self.__render_to_async(renderer, buffer, frame_speed, force, state) for renderer in self.get_renderers()), return_exceptions=True)
+		self.__finish_render(buffer)
+		for result in results:
+			if isinstance(result, BaseException):
+				raise result
+
+	def __prepare_render(self):
+		'''Interns the frames and composites the layers on them, returning the RGB frames to render.'''
+		for index in range(len(self.__buffer)):
+			self.__intern_frame(index)
+		buffer = self.__composite_layers(self.__buffer)
+		return buffer if self.__palette is None else self.__expand_frames(buffer)
+
+	def __finish_render(self, buffer, in_flight=False):
+		# Keep the area of the rendered frame that is not black, as that is all a cleared frame will change
+		if len(buffer) == 1:
+			self.__clear_rect = Image.frombytes('RGB', (self.size, self.size), buffer[0]).getbbox()
+		else:
+			self.__clear_rect = (0, 0, self.size, self.size)
+		front = self.__buffer
+		self.__swap_buffers()
+		if not in_flight:
+			self.__recycle_frames(front)
+
+	def __expand_frames(self, buffer):
+		'''Returns the given palette frames as RGB frames, expanding their palette indexes through the palette lookup table. Duplicated frames are only expanded once.'''
+		expanded = {}
+		for frame in buffer:
+			if id(frame) not in expanded:
+				image = Image.frombuffer('P', (self.size, self.size), frame, 'raw', 'P', 0, 1)
+				image.putpalette(self.__palette_bytes)
+				expanded[id(frame)] = bytearray(image.convert('RGB').tobytes())
+		return [expanded[id(frame)] for frame in buffer]
+
+	def add_renderer(self, address, renderer=Pixoo64Renderer, renderer_params={}):
+		'''Adds another renderer that will show the same animation buffer as the main one.
+
+		Every call to render sends the buffer to all the renderers at the same time, so rendering on several devices takes about as long as the slowest one.
+
+		Args:
+			address (str): The IP address of the device, or any renderer that needs an address.
+			renderer (Renderer): The renderer to use. Default is Pixoo64Renderer.
+			renderer_params (dict): Additional parameters to pass to the renderer.
+
+		Raises:
+			ValueError: If the size of the renderer does not match the size of the main one, or background_render is enabled and the renderer is not thread safe.
+
+		Returns:
+			The new renderer instance.
+		'''
+		if self.__render_worker is not None and not renderer._thread_safe:
+			raise ValueError(f'{renderer.__name__} is not thread safe, so it can not be used with background_render')
+		instance = renderer(address=address, pizzoo=self, debug=self.__debug, **renderer_params)
+		if instance.get_size() != self.size:
+			raise ValueError(f'Invalid renderer size: {instance.get_size()} (expected {self.size})')
+		self.__renderers.append(instance)
+		self.__reset_render_pool()
+		# The new device is not showing anything known yet
+		self.__clear_rect = (0, 0, self.size, self.size)
+		return instance
+
+	def remove_renderer(self, renderer):
+		'''Removes a renderer previously added with add_renderer.
+
+		Args:
+			renderer (Renderer): The renderer instance to remove.
+
+		Returns:
+			None
+		'''
+		self.__renderers.remove(renderer)
+		self.__reset_render_pool()
+
+	def get_renderers(self):
+		'''Returns all the renderers the animation buffer is rendered on, starting with the main one.
+
+		Returns:
+			A list of Renderer instances.
+		'''
+		return [self.renderer] + self.__renderers
+
+	def __reset_render_pool(self):
+		if self.__render_pool is not None:
+			self.__render_pool.shutdown(wait=False)
+		self.__render_pool = None
+
+	def __render_all(self, buffer, frame_speed, force=False, state=None):
+		'''Renders the buffer on every renderer concurrently, raising the first error once all of them finished.'''
+		if self.__render_pool is None:
+			self.__render_pool = ThreadPoolExecutor(max_workers=len(self.__renderers), thread_name_prefix='pizzoo-render')
+		futures = [self.__render_pool.submit(self.__render_to, renderer, buffer, frame_speed, force, state) for renderer in self.__renderers if renderer._thread_safe]
+		# The main renderer and the ones that are not thread safe (Like the window one) stay on the calling thread
+		error = None
+		for renderer in [self.renderer] + [renderer for renderer in self.__renderers if not renderer._thread_safe]:
+			try:
+				self.__render_to(renderer, buffer, frame_speed, force, state)
+			except Exception as e:
+				if error is None:
+					error = e
+		for future in futures:
+			exception = future.exception()
+			if error is None and exception is not None:
+				error = exception
+		if error is not None:
+			raise error
+
+	def __render_to(self, renderer, buffer, frame_speed, force=False, state=None):
+		'''Renders the buffer on the given renderer, unless skip_unchanged is enabled and the renderer already shows it.
+
+		A hash of the rendered frames and frame speed is kept on every renderer to compare with the next render. The render state of the buffer is what the renderer gets from get_dirty_rect, is_dirty and get_duplicate_frames while rendering it.
+
+		Returns:
+			A bool, False if the render was skipped.
+		'''
+		digest = self.__render_digest(renderer, buffer, frame_speed, force)
+		if digest is False:
+			return False
+		previous, self.__render_state.state = getattr(self.__render_state, 'state', None), state
+		try:
+			renderer.render(buffer, frame_speed)
+		finally:
+			self.__render_state.state = previous
+		renderer._last_render_digest = digest
+		return True
+
+	async def __render_to_async(self, renderer, buffer, frame_speed, force=False, state=None):
+		'''Same as __render_to, awaiting the renderers that support it and running the rest on a worker thread, or on the loop thread if they are not thread safe.'''
+		if not hasattr(renderer, 'render_async'):
+			if not renderer._thread_safe:
+				return self.__render_to(renderer, buffer, frame_speed, force, state)
+			return await to_thread(self.__render_to, renderer, buffer, frame_speed, force, state)
+		digest = self.__render_digest(renderer, buffer, frame_speed, force)
+		if digest is False:
+			return False
+		await renderer.render_async(buffer, frame_speed)
+		renderer._last_render_digest = digest
+		return True
+
+	def __render_digest(self, renderer, buffer, frame_speed, force):
+		'''Returns the hash of the frames the renderer would show (None if skip_unchanged is disabled), or False if the render has to be skipped.'''
+		if not self.__skip_unchanged:
+			return None
+		content = blake2b(str(frame_speed).encode(), digest_size=16)
+		for frame in buffer[-renderer.get_max_frames():]:
+			content.update(frame)
+		digest = content.digest()
+		if not force and digest == renderer._last_render_digest:
+			renderer._skipped_renders += 1
+			return False
+		return digest
 
 	def switch(self, on=True):
 		'''Turns the device on or off.
 		'''
-		self.renderer.switch(on)
+		return self.renderer.switch(on)
 	
 	def get_settings(self):
 		'''Get the current settings from the device.
@@ -390,7 +1640,7 @@ class Pizzoo:
 		Returns:
 			None
 		'''
-		self.renderer.set_brightness(brightness)
+		return self.renderer.set_brightness(brightness)
 
 	def __compute_x_text_position(self, text_width, position, padding):
 		if isinstance(position, int):
@@ -488,6 +1738,9 @@ class Pizzoo:
 			width, height = self.__node_size(node, x, y, abs_x, abs_y, new_props)
 			new_props['width'] = width
 			new_props['height'] = height
+			# Children of a section are clipped to it, and to any section it is inside of
+			clip = new_props.get('clip', (0, 0, self.size, self.size))
+			new_props['clip'] = (max(abs_x, clip[0]), max(abs_y, clip[1]), min(abs_x + width, clip[2]), min(abs_y + height, clip[3]))
 			result = None
 		elif tag == 'line':
 			x2 = int(node.attrib.get('x2', '0'))
@@ -546,8 +1799,17 @@ class Pizzoo:
 				'node_size': (width, height)
 			}
 			result = self.renderer.compile_node(node, parent_node, inherited_props, node_props)
+		if result is not None and callable(result[0]) and inherited_props is not None and 'clip' in inherited_props:
+			result = (self.__draw_clipped, {'clip': inherited_props['clip'], 'command': result})
 		new_props = {**new_props, **position_props}
 		return result, new_props
+
+	def __draw_clipped(self, clip, command):
+		self.push_clip((clip[0], clip[1]), clip[2] - clip[0], clip[3] - clip[1])
+		try:
+			command[0](**command[1])
+		finally:
+			self.pop_clip()
 	
 	def __compile_root_options(self, root):
 		result = []
@@ -591,10 +1853,13 @@ class Pizzoo:
 				pending.append({'node': child, 'parent': current, 'props': props})
 		return commands
 	
-	def execute_commands(self, commands, renderer_items):
+	def execute_commands(self, commands, renderer_items, awaitables=None):
 		for command in commands:
 			if callable(command[0]):
-				command[0](**command[1])
+				result = command[0](**command[1])
+				# Commands of async renderers are coroutines, awaited by render_template_async
+				if awaitables is not None and isawaitable(result):
+					awaitables.append(result)
 			elif renderer_items is not None:
 				renderer_items.append(command)
 
@@ -604,7 +1869,7 @@ class Pizzoo:
 		This template can have a number of valid tags that are directly supported by the library, but any other renderer can add his own nodes.
 		The template must have a root tag named 'pizzoo' and can have the following tags:
 
-		* section - A container for other elements. It can have x, y, width, height and position attributes.
+		* section - A container for other elements, that are clipped to its bounds. It can have x, y, width, height and position attributes.
 		* rectangle - Draws a rectangle. It can have x, y, width, height, color and filled attributes.
 		* circle - Draws a circle. It can have x, y, radius and color attributes.
 		* text - Draws a text. It can have x, y, color, wrap, shadow, shadowColor and font attributes.
@@ -623,19 +1888,53 @@ class Pizzoo:
 		Returns:
 			None
 		'''
+		if isinstance(self.renderer, AsyncPixoo64Renderer):
+			# Device commands of async renderers are coroutines, so they are run on their own loop
+			return self.renderer.run(self.render_template_async(template, use_cache))
+		renderer_items = []
+		# Device commands of the root options are sent together if the renderer supports it
+		batch = getattr(self.renderer, 'batch', None)
+		with batch() if batch is not None else nullcontext():
+			self.__execute_template(template, renderer_items)
+		self.render()
+		if len(renderer_items) > 0:
+			# The items are drawn over the rendered frames, so a background render has to reach the device first
+			self.wait_render()
+			self.renderer.render_template_items(renderer_items, use_cache)
+
+	async def render_template_async(self, template, use_cache=False):
+		'''Same as render_template, but awaits the device commands and the render, so templates can be rendered with AsyncPixoo64Renderer from a running event loop.
+
+		Args:
+			template (str): The XML template to render.
+			use_cache (bool): Whether to use the cache or not. Default is False. (Currently not in use)
+
+		Returns:
+			None
+		'''
+		renderer_items = []
+		awaitables = []
+		self.__execute_template(template, renderer_items, awaitables)
+		# The root options (Like brightness) are sent in order before the frames
+		for awaitable in awaitables:
+			await awaitable
+		await self.render_async()
+		if len(renderer_items) > 0:
+			result = self.renderer.render_template_items(renderer_items, use_cache)
+			if isawaitable(result):
+				await result
+
+	def __execute_template(self, template, renderer_items, awaitables=None):
+		'''Draws a template on the reset buffer, collecting its renderer items and the awaitables of its device commands.'''
 		self.reset_buffer()
 		commands = self.__compile_template(template)
-		renderer_items = []
 		if len(self.__buffer) == 0:
-			self.execute_commands(commands, renderer_items)
+			self.execute_commands(commands, renderer_items, awaitables)
 		else:
 			self.__current_frame = 0
 			while self.__current_frame < len(self.__buffer):
-				self.execute_commands(commands, renderer_items if self.__current_frame == 0 else None)
+				self.execute_commands(commands, renderer_items if self.__current_frame == 0 else None, awaitables)
 				self.__current_frame += 1
-		self.render()
-		if len(renderer_items) > 0:
-			self.renderer.render_template_items(renderer_items, use_cache)
 	
 	def __getattr__(self, name):
 		if hasattr(self.renderer, name) and callable(getattr(self.renderer, name)):
@@ -643,4 +1942,4 @@ class Pizzoo:
 		raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{name}'")
 
 
-__all__ = (Pizzoo, Renderer, Pixoo64Renderer, ImageRenderer, WindowRenderer)
\ No newline at end of file
+__all__ = (Pizzoo, Renderer, Pixoo64Renderer, AsyncPixoo64Renderer, ImageRenderer, WindowRenderer, BitmapFont, Layer, CommandBatchError)
\ No newline at end of file
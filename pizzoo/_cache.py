@@ -0,0 +1,82 @@
+from collections import OrderedDict
+from threading import Lock
+
+class LRUCache:
+	def __init__(self, maxsize=128):
+		'''
+		A bounded least-recently-used cache that keeps count of its hits and misses. It is thread safe, so it can be shared between instances.
+
+		Args:
+			maxsize (int): The maximum number of items to keep in the cache.
+		'''
+		self.maxsize = maxsize
+		self.hits = 0
+		self.misses = 0
+		self.__items = OrderedDict()
+		self.__lock = Lock()
+
+	def get(self, key, default=None):
+		'''
+		Returns the item stored for the given key, marking it as the most recently used one.
+
+		Args:
+			key (hashable): The key of the item.
+			default (any): The value to return if the key is not cached.
+
+		Returns:
+			The cached item or the default value.
+		'''
+		with self.__lock:
+			if key in self.__items:
+				self.__items.move_to_end(key)
+				self.hits += 1
+				return self.__items[key]
+			self.misses += 1
+			return default
+
+	def put(self, key, value):
+		'''
+		Stores an item on the cache, removing the least recently used one if the cache is full.
+
+		Args:
+			key (hashable): The key of the item.
+			value (any): The item to store.
+		'''
+		with self.__lock:
+			self.__items[key] = value
+			self.__items.move_to_end(key)
+			while len(self.__items) > self.maxsize:
+				self.__items.popitem(last=False)
+
+	def invalidate(self, predicate=None):
+		'''
+		Removes items from the cache.
+
+		Args:
+			predicate (callable): A function that receives a key and returns True if its item should be removed. If None, every item is removed.
+
+		Returns:
+			int: The number of removed items.
+		'''
+		with self.__lock:
+			keys = [key for key in self.__items if predicate is None or predicate(key)]
+			for key in keys:
+				del self.__items[key]
+			return len(keys)
+
+	def info(self):
+		'''
+		Returns the usage stats of the cache.
+
+		Returns:
+			dict: A dict with the hits, misses, current size and maximum size of the cache.
+		'''
+		return {'hits': self.hits, 'misses': self.misses, 'size': len(self.__items), 'maxsize': self.maxsize}
+
+	def __len__(self):
+		return len(self.__items)
+
+	def __contains__(self, key):
+		return key in self.__items
+
+__all__ = (LRUCache,)
@@ -68,6 +68,9 @@ PICO_HEX_PALETTE = [
 	'#FFCCAA'
 ];
 
+# Maps any non-transparent alpha value to a fully opaque one, to be used with Image.point
+ALPHA_MASK_TABLE = [0] + [255] * 255
+
 DIAL_DEFAULT_ITEM = {
 	'x': 0,
 	'y': 0,
@@ -82,4 +85,4 @@ DIAL_DEFAULT_ITEM = {
 	'update_time': 60
 }
 
-__all__ = (PICO_PALETTE, PICO_HEX_PALETTE, DisplayType, DIAL_ALIGN, DIAL_DEFAULT_ITEM)
+__all__ = (PICO_PALETTE, PICO_HEX_PALETTE, ALPHA_MASK_TABLE, DisplayType, DIAL_ALIGN, DIAL_DEFAULT_ITEM)
@@ -0,0 +1,227 @@
+from PIL import Image
+from hashlib import sha1
+from os import environ, getpid, makedirs, replace, stat
+from os.path import basename, dirname, expanduser, join, realpath
+import struct
+
+# Default directory of the on-disk cache of compiled fonts
+FONT_CACHE_DIR = join(environ.get('XDG_CACHE_HOME', join(expanduser('~'), '.cache')), 'pizzoo', 'fonts')
+
+# Compiled font layout: header (magic, width, height, glyph count), glyph table (codepoint, spacing offset) and packed glyph bitmaps
+_MAGIC = b'PZF1'
+_HEADER = struct.Struct('<4sHHI')
+_GLYPH = struct.Struct('<Ih')
+
+class BitmapFont:
+	def __init__(self, width, height, glyphs, data):
+		'''
+		A bitmap font that rasterizes texts from pre-rasterized glyph masks. Glyph bitmaps are stored packed, one bit per pixel with every row padded to a full byte, and turned into masks the first time they are used.
+
+		Args:
+			width (int): The width of the font bounding box.
+			height (int): The height of the font bounding box.
+			glyphs (dict): The index of every glyph on the packed data and its spacing offset, by codepoint.
+			data (bytes): The packed bitmaps of every glyph, in index order.
+		'''
+		self.width = width
+		self.height = height
+		self.__glyph_table = glyphs
+		self.__data = data
+		self.__glyph_size = (width + 7) // 8 * height
+		self.__glyphs = {}
+
+	@classmethod
+	def from_bdf(cls, path):
+		'''
+		Compiles a bdf font file, rasterizing all of its glyphs.
+
+		Args:
+			path (str): The path to the bdf file.
+
+		Returns:
+			BitmapFont: The compiled font.
+		'''
+		from bdfparser import Font
+		font = Font(path)
+		width, height = font.headers['fbbx'], font.headers['fbby']
+		# Font-wide glyph spacing, used by glyphs that do not define their own
+		font_spacing = font.headers.get('dwx0', font.headers.get('dwy0'))
+		row_size = (width + 7) // 8
+		glyphs = {}
+		data = bytearray()
+		for index, codepoint in enumerate(sorted(font.glyphs)):
+			glyph = font.glyphbycp(codepoint)
+			for row in glyph.draw().todata(1):
+				data += int(row.ljust(row_size * 8, '0'), 2).to_bytes(row_size, 'big')
+			spacing = glyph.meta['dwx0'] or glyph.meta['dwy0']
+			if spacing is None:
+				spacing = font_spacing
+			glyphs[codepoint] = (index, 0 if spacing is None else spacing - width)
+		return cls(width, height, glyphs, bytes(data))
+
+	@classmethod
+	def from_bytes(cls, buffer):
+		'''
+		Loads a compiled font from its binary representation.
+
+		Args:
+			buffer (bytes): The compiled font, as returned by to_bytes.
+
+		Raises:
+			ValueError: If the buffer is not a valid compiled font.
+
+		Returns:
+			BitmapFont: The loaded font.
+		'''
+		buffer = memoryview(buffer)
+		if len(buffer) < _HEADER.size:
+			raise ValueError('Invalid compiled font')
+		magic, width, height, count = _HEADER.unpack_from(buffer)
+		table_end = _HEADER.size + count * _GLYPH.size
+		if magic != _MAGIC or len(buffer) != table_end + count * ((width + 7) // 8) * height:
+			raise ValueError('Invalid compiled font')
+		glyphs = {codepoint: (index, offset) for index, (codepoint, offset) in enumerate(_GLYPH.iter_unpack(buffer[_HEADER.size:table_end]))}
+		return cls(width, height, glyphs, buffer[table_end:])
+
+	def to_bytes(self):
+		'''
+		Returns the binary representation of the compiled font.
+
+		Returns:
+			bytes: The compiled font.
+		'''
+		table = sorted(self.__glyph_table.items(), key=lambda item: item[1][0])
+		return b''.join([
+			_HEADER.pack(_MAGIC, self.width, self.height, len(table)),
+			b''.join(_GLYPH.pack(codepoint, offset) for codepoint, (_, offset) in table),
+			bytes(self.__data)
+		])
+
+	@classmethod
+	def from_file(cls, path):
+		'''
+		Loads a compiled font file with a single read.
+
+		Args:
+			path (str): The path to the compiled font file.
+
+		Returns:
+			BitmapFont: The loaded font.
+		'''
+		with open(path, 'rb') as file:
+			return cls.from_bytes(file.read())
+
+	def save(self, path):
+		'''
+		Saves the compiled font to a file. The file is replaced atomically, so concurrent readers never see a partial font.
+
+		Args:
+			path (str): The path of the compiled font file.
+		'''
+		makedirs(dirname(path) or '.', exist_ok=True)
+		temp_path = f'{path}.{getpid()}.tmp'
+		with open(temp_path, 'wb') as file:
+			file.write(self.to_bytes())
+		replace(temp_path, path)
+
+	@classmethod
+	def load(cls, path, cache_dir=FONT_CACHE_DIR):
+		'''
+		Loads a font file, that can be a compiled (.pzf) or a bdf one. Bdf fonts are compiled only once and kept on the given cache directory, so next loads just read the compiled file.
+
+		Args:
+			path (str): The path to the font file.
+			cache_dir (str | None): The directory of the compiled fonts cache, or None to always compile bdf fonts.
+
+		Returns:
+			BitmapFont: The loaded font.
+		'''
+		if path.endswith('.pzf'):
+			return cls.from_file(path)
+		if cache_dir is None:
+			return cls.from_bdf(path)
+		info = stat(path)
+		digest = sha1(f'{realpath(path)}:{info.st_mtime_ns}:{info.st_size}'.encode()).hexdigest()[:16]
+		cache_path = join(cache_dir, f'{basename(path)}.{digest}.pzf')
+		try:
+			return cls.from_file(cache_path)
+		except (OSError, ValueError):
+			pass
+		font = cls.from_bdf(path)
+		try:
+			font.save(cache_path)
+		except OSError:
+			# A read-only cache only means the font will be compiled again next time
+			pass
+		return font
+
+	def glyph(self, codepoint):
+		'''
+		Returns the mask of a glyph and its spacing offset, falling back to the '?' glyph (Or an empty one) if the font does not include it.
+
+		Args:
+			codepoint (int): The unicode codepoint of the glyph.
+
+		Returns:
+			tuple(Image, int): An 'L' image of the font bounding box size with the glyph pixels set to 255, and the offset to add to the width of the glyph before the next one.
+		'''
+		if codepoint not in self.__glyphs:
+			if codepoint in self.__glyph_table:
+				index, offset = self.__glyph_table[codepoint]
+				bitmap = self.__data[index * self.__glyph_size:(index + 1) * self.__glyph_size]
+				self.__glyphs[codepoint] = (Image.frombytes('1', (self.width, self.height), bytes(bitmap)).convert('L'), offset)
+			elif codepoint != ord('?'):
+				self.__glyphs[codepoint] = self.glyph(ord('?'))
+			else:
+				self.__glyphs[codepoint] = (Image.new('L', (self.width, self.height)), 0)
+		return self.__glyphs[codepoint]
+
+	def draw(self, text, line_width, shadow=None):
+		'''
+		Rasterizes a text, wrapping it into lines that fit on the given width.
+
+		Args:
+			text (str): The text to rasterize.
+			line_width (int): The maximum width of every line.
+			shadow (tuple(int, int) | None): The displacement of the shadow, with positive y values moving it up, or None for no shadow.
+
+		Returns:
+			Image | None: A 'P' image with the text pixels set to 1 and the shadow pixels set to 2, or None if the text is empty.
+		'''
+		lines = self.__layout(text, line_width)
+		if len(lines) == 0:
+			return None
+		width = max(end for _, end in lines)
+		mask = Image.new('L', (width, self.height * len(lines)))
+		for line, (positions, _) in enumerate(lines):
+			for glyph, x in positions:
+				# Pasting the glyph using itself as a mask merges overlapping glyphs
+				mask.paste(glyph, (x, line * self.height), glyph)
+		text_mask = mask.point([0] + [1] * 255)
+		if shadow is not None and shadow != (0, 0):
+			dx, dy = shadow[0], -shadow[1]
+			result = Image.new('L', (width + abs(dx), mask.height + abs(dy)))
+			result.paste(2, (max(dx, 0), max(dy, 0)), mask)
+			result.paste(text_mask, (max(-dx, 0), max(-dy, 0)), mask)
+			text_mask = result
+		return Image.frombytes('P', text_mask.size, text_mask.tobytes())
+
+	def __layout(self, text, line_width):
+		'''Splits the text in lines of glyphs with their horizontal positions, using the same glyph spacing and wrapping rules as bdfparser.'''
+		lines = []
+		positions, end, size, offset = [], 0, 0, 0
+		for char in text:
+			glyph, glyph_offset = self.glyph(ord(char))
+			size += self.width + glyph_offset
+			if size > line_width and len(positions) > 0:
+				lines.append((positions, end))
+				positions, end, size = [], 0, self.width + glyph_offset
+			x = end + offset if len(positions) > 0 else 0
+			positions.append((glyph, x))
+			end = max(end, x + self.width)
+			offset = glyph_offset
+		if len(positions) > 0:
+			lines.append((positions, end))
+		return lines
+
+__all__ = (BitmapFont,)
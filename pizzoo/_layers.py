@@ -0,0 +1,196 @@
+from PIL import Image, ImageChops
+
+BLEND_MODES = ('normal', 'add', 'multiply')
+
+def blend(backdrop, source, mode='normal'):
+	'''
+	Draws an image over another one with the given blend mode. Blended colors are only used where the backdrop is not transparent, elsewhere the source keeps its own colors.
+
+	Args:
+		backdrop (Image): The RGBA image below.
+		source (Image): The RGBA image to draw, of the same size.
+		mode (str): One of 'normal', 'add' or 'multiply'.
+
+	Returns:
+		Image: The resulting RGBA image.
+	'''
+	if mode != 'normal':
+		colors = source.convert('RGB')
+		below = backdrop.convert('RGB')
+		mixed = ImageChops.add(below, colors) if mode == 'add' else ImageChops.multiply(below, colors)
+		colors = Image.composite(mixed, colors, backdrop.getchannel('A'))
+		colors.putalpha(source.getchannel('A'))
+		source = colors
+	return Image.alpha_composite(backdrop, source)
+
+class Layer:
+	def __init__(self, name, size, z=0, opacity=1.0, visible=True, blend='normal', xy=(0, 0)):
+		'''
+		A named RGBA drawing surface that is composited over the animation buffer when rendering. Pixels are stored as a flat bytearray with the RGBA values of every pixel, fully transparent by default.
+
+		Args:
+			name (str): The name of the layer.
+			size (int): The width and height of the layer, the same as the screen.
+			z (int): The order of the layer on the stack, higher values are drawn on top.
+			opacity (float): The opacity of the whole layer, between 0 and 1.
+			visible (bool): Whether the layer is composited or not.
+			blend (str): How the layer is combined with the frame and layers below it. One of 'normal', 'add' or 'multiply'.
+			xy (tuple(int, int)): The offset the layer is composited at.
+
+		Raises:
+			ValueError: If the blend mode is invalid.
+		'''
+		if blend not in BLEND_MODES:
+			raise ValueError(f'Invalid blend mode: {blend} (expected one of {", ".join(BLEND_MODES)})')
+		self.name = name
+		self.size = size
+		self.data = bytearray(size * size * 4)
+		self.z = z
+		self.opacity = opacity
+		self.visible = visible
+		self.blend = blend
+		self.xy = tuple(xy)
+		# Increased on every change of the pixels, so cached composites can be reused until then
+		self.version = 0
+
+	def clear(self):
+		'''
+		Makes every pixel of the layer fully transparent.
+		'''
+		self.data[:] = bytes(len(self.data))
+		self.version += 1
+
+	def to_image(self):
+		'''
+		Returns the pixels of the layer, placed at its offset on the screen and with its opacity applied.
+
+		Returns:
+			Image: An RGBA image of the size of the screen.
+		'''
+		image = Image.frombytes('RGBA', (self.size, self.size), bytes(self.data))
+		if self.xy != (0, 0):
+			placed = Image.new('RGBA', image.size)
+			placed.paste(image, self.xy)
+			image = placed
+		if self.opacity < 1:
+			image.putalpha(image.getchannel('A').point(lambda value: round(value * self.opacity)))
+		return image
+
+	def _signature(self):
+		return (id(self), self.version, self.opacity, self.blend, self.xy)
+
+class LayerStack:
+	def __init__(self, size):
+		'''
+		An ordered set of layers that are combined into a single RGBA image.
+
+		The composite of every prefix of the stack (From the bottom layer up to each one) is kept, so after a change only the changed layer and the ones above it are composited again.
+
+		Args:
+			size (int): The width and height of the layers.
+		'''
+		self.size = size
+		self.__layers = {}
+		self.__prefixes = {}
+
+	def add(self, name, z=None, opacity=1.0, visible=True, blend='normal'):
+		'''
+		Adds a new transparent layer to the stack.
+
+		Args:
+			name (str): The name of the layer.
+			z (int | None): The order of the layer on the stack. If None, it is placed on top of every other layer.
+			opacity (float): The opacity of the whole layer, between 0 and 1.
+			visible (bool): Whether the layer is composited or not.
+			blend (str): How the layer is combined with the frame and layers below it. One of 'normal', 'add' or 'multiply'.
+
+		Raises:
+			ValueError: If a layer with the same name already exists or the blend mode is invalid.
+
+		Returns:
+			Layer: The new layer.
+		'''
+		if name in self.__layers:
+			raise ValueError(f'Layer "{name}" already exists')
+		if z is None:
+			z = max((layer.z for layer in self.__layers.values()), default=-1) + 1
+		layer = Layer(name, self.size, z, opacity, visible, blend)
+		self.__layers[name] = layer
+		return layer
+
+	def remove(self, name):
+		'''
+		Removes a layer from the stack.
+
+		Args:
+			name (str): The name of the layer.
+
+		Returns:
+			Layer: The removed layer.
+		'''
+		return self.__layers.pop(self.__check(name))
+
+	def get(self, name):
+		'''
+		Returns the layer with the given name.
+
+		Args:
+			name (str): The name of the layer.
+
+		Raises:
+			ValueError: If there is no layer with that name.
+
+		Returns:
+			Layer: The layer.
+		'''
+		return self.__layers[self.__check(name)]
+
+	def __check(self, name):
+		if name not in self.__layers:
+			raise ValueError(f'Layer "{name}" not found')
+		return name
+
+	def composite(self):
+		'''
+		Combines every visible layer, from the lowest z to the highest one, into the passes needed to draw them over a frame.
+
+		Consecutive layers with the 'normal' blend mode are combined into a single pass, while every other layer is a pass of its own, as it has to be blended with the frame below it. The composite of every prefix of a group of normal layers is kept, so after a change only the changed layer and the ones above it are composited again.
+
+		Returns:
+			list(tuple(str, Image)): The blend mode and the RGBA image of every pass, from the bottom up. Empty if no layer is visible.
+		'''
+		# Sorting is stable, so layers with the same z keep the order they were added in
+		layers = sorted((layer for layer in self.__layers.values() if layer.visible and layer.opacity > 0), key=lambda layer: layer.z)
+		cache = {}
+		passes = []
+		key = ()
+		result = None
+		for layer in layers:
+			if layer.blend != 'normal':
+				if result is not None:
+					passes.append(('normal', result))
+				key, result = (), None
+				signature = (layer._signature(),)
+				image = self.__prefixes.get(signature)
+				if image is None:
+					image = layer.to_image()
+				cache[signature] = image
+				passes.append((layer.blend, image))
+				continue
+			key += (layer._signature(),)
+			image = self.__prefixes.get(key)
+			if image is None:
+				image = layer.to_image() if result is None else Image.alpha_composite(result, layer.to_image())
+			cache[key] = result = image
+		if result is not None:
+			passes.append(('normal', result))
+		self.__prefixes = cache
+		return passes
+
+	def __len__(self):
+		return len(self.__layers)
+
+	def __iter__(self):
+		return iter(sorted(self.__layers.values(), key=lambda layer: layer.z))
+
+__all__ = (Layer, LayerStack, BLEND_MODES, blend)
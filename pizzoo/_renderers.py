@@ -1,6 +1,11 @@
-from json import dumps
-from requests import post
+from json import dumps, loads
+from asyncio import IncompleteReadError, Semaphore, gather, get_running_loop, open_connection, run, wait_for, sleep as async_sleep
+from requests import Session
+from requests.exceptions import ConnectionError as RequestConnectionError, Timeout
+from requests.adapters import HTTPAdapter
 from base64 import b64encode
+from contextlib import contextmanager
+from threading import local
 from math import floor
 from ._utils import clamp, get_color_rgb, tuple_to_hex
 from ._constants import DisplayType, DIAL_DEFAULT_ITEM
@@ -9,6 +14,17 @@ from time import time, sleep
 from PIL import Image, ImageTk
 import tkinter as tk
 
+class CommandBatchError(Exception):
+	def __init__(self, errors):
+		'''
+		Raised when some of the commands of a batch failed on the device.
+
+		Args:
+			errors (list(tuple(str, Exception))): The command name and the error of every failed command.
+		'''
+		super().__init__(f'{len(errors)} batched command(s) failed: ' + ', '.join(f'{command} ({error})' for command, error in errors))
+		self.errors = errors
+
 class Renderer:
 	_size = None
 	_max_frames = None
@@ -17,6 +33,13 @@ class Renderer:
 	_pizoo = None
 	_max_frame_speed = 10000  # in ms
 	_min_frame_speed = 10     # in ms
+	# Hash of the last rendered buffer, used by Pizzoo to skip unchanged renders
+	_last_render_digest = None
+	_skipped_renders = 0
+	# Whether render can be called from a thread other than the one that created the renderer
+	_thread_safe = True
+	# Whether render keeps the frames it is given once it returns, so Pizzoo does not reuse their storage for new frames
+	_keeps_frames = True
 
 	def __init__(self, address, pizzoo, debug):
 		'''
@@ -62,6 +85,15 @@ class Renderer:
 		'''
 		return self._min_frame_speed
 	
+	def get_skipped_renders(self):
+		'''
+		Returns how many renders were skipped because the device was already showing the same buffer.
+
+		Returns:
+			int: The amount of skipped renders.
+		'''
+		return self._skipped_renders
+
 	def get_settings(self):
 		'''
 		Gets the current settings of the device.
@@ -90,8 +122,10 @@ class Renderer:
 		'''
 		Renders the buffer on the device.
 
+		The frames are borrowed: once render returns, Pizzoo may reuse their storage for new frames, unless _keeps_frames is True. Renderers that keep frames without setting it (Like to record them) have to copy them.
+
 		Args:
-			buffer (list): A list of frames to render on the device.
+			buffer (list(bytearray)): A list of frames to render on the device, each one a flat bytearray with the RGB values of every pixel. Identical frames are the same bytearray object.
 			frame_speed (int): The speed at which the frames should be displayed.
 		'''
 		raise NotImplementedError
@@ -127,49 +161,88 @@ class Renderer:
 		'''
 		return None
 
-class Pixoo64Renderer(Renderer):
+class _BasePixoo64Renderer(Renderer):
+	_keeps_frames = False
+	__max_batch_failures = 3
 	__start_countdown_time = -1
-	__pic_id = None
-	__url = None
-	__id_limit = None
-	def __init__(self, address, pizzoo, debug):
+	def __init__(self, address, pizzoo, debug, batch_size=8):
 		'''
-		This renderer is used to render the frames on the Divoom Pixoo64 device. It uses the Divoom API to send the frames to the device.
-		Also includes some built-in methods for controlling the device like the buzzer, scoreboard, countdown, etc.
+		The parts shared by the Pixoo64 renderers: the device commands, the frame upload commands and the template nodes. Subclasses send the commands with _command, which returns the result of the request or an awaitable of it.
 		'''
 		super().__init__(address, pizzoo, debug)
 		self._size = 64
 		self._max_frames = 60
-		self.__id_limit = 100
-		self.__url = f'http://{address}/post'
-		self.__pic_id = self.__request('Draw/GetHttpGifId')['PicId']
-		if self.__pic_id > self.__id_limit:
-			self.__reset_pic_id()
+		self._id_limit = 100
+		self._batch_size = max(batch_size, 1)
+		self.__batch_failures = 0
 
-	def __request(self, endpoint, data=None):
-		data = {'Command': endpoint, **(data if data else {})}
-		result = post(self.__url, dumps(data)).json()
-		if result['error_code'] != 0:
-			raise Exception(f'Error on request {endpoint} with code \"{result["error_code"]}\"')
-		return result
-	
-	def __reset_pic_id(self):
-		try:
-			self.__request('Draw/ResetHttpGifId')
-			self.__pic_id = 1
-		except Exception as e:
-			if self._debug: print(e)
+	def _command(self, endpoint, data=None):
+		'''
+		Sends a command to the device, returning its result (Or an awaitable of it).
+		'''
+		raise NotImplementedError
+
+	def _then(self, result, value):
+		'''
+		Returns the given value once the result of a command is available, as an awaitable if the result is one.
+		'''
+		return value
+
+	def _frame_commands(self, buffer, frame_speed, pic_id):
+		'''
+		Returns the commands that upload the buffer as an animation with the given picture id.
+		'''
+		buffer = buffer[-self._max_frames:]
+		# Because of a weird bug in the Pixoo64, we need to make sure the frame speed is not below 95 or greater than 280 (290 is the max speed)
+		# frame_speed = floor(clamp(frame_speed, 95, 280))
+		frame_speed = floor(clamp(frame_speed, 10, 10000))
+		# Duplicated frames share the same bytearray, so they are only encoded once
+		encoded_frames = {}
+		commands = []
+		for i, frame in enumerate(buffer):
+			if id(frame) not in encoded_frames:
+				encoded_frames[id(frame)] = b64encode(frame).decode()
+			commands.append({
+				'Command': 'Draw/SendHttpGif',
+				'PicNum': len(buffer),
+				'PicWidth': self._size,
+				'PicOffset': i,
+				'PicID': pic_id,
+				'PicSpeed': frame_speed,
+				'PicData': encoded_frames[id(frame)]
+			})
+		return commands
+
+	def _batch_sent(self, failed):
+		'''
+		Keeps track of the batches of frames that were rejected as a command list, disabling batching only after several of them in a row failed while their frames were accepted one by one.
+		'''
+		if not failed:
+			self.__batch_failures = 0
+			return
+		# A single failure may be transient, but repeated ones mean the device does not support command lists
+		self.__batch_failures += 1
+		if self.__batch_failures >= self.__max_batch_failures:
+			self._batch_size = 1
+
+	def _draw_dial_background(self, background):
+		'''
+		Draws the background image or gif of a dial on the Pizzoo buffer, to be rendered before the items are sent.
+		'''
+		path_ext = background.split('.')[-1]
+		if path_ext == 'gif':
+			self._pizzoo.draw_gif(background, size='auto', fill='auto')
+		else:
+			self._pizzoo.draw_image(background)
+
+	def _dial_items(self, items):
+		'''
+		Returns the items of a dial as expected by the device.
+		'''
+		# The device is no longer showing only the last rendered buffer
+		self._last_render_digest = None
+		return [{'TextId': index + 1, **DIAL_DEFAULT_ITEM, **item} for index, item in enumerate(items)]
 
-	def __send_frame(self, frame_data, speed=1000, frame_number=1, offset=0):
-		return self.__request('Draw/SendHttpGif', {
-			'PicNum': frame_number,
-			'PicWidth': self._size,
-			'PicOffset': offset,
-			'PicID': self.__pic_id,
-			'PicSpeed': speed,
-			'PicData': b64encode(bytearray(frame_data)).decode()
-		})
-	
 	def buzzer(self, active=0.5, inactive=0.5, duration=1):
 		'''
 		Plays a sound on the device buzzer.
@@ -182,11 +255,11 @@ class Pixoo64Renderer(Renderer):
 		Returns:
 			None
 		'''
-		self.__request('Device/PlayBuzzer', {
+		return self._then(self._command('Device/PlayBuzzer', {
 			'ActiveTimeInCycle': active * 1000,
 			'OffTimeInCycle': inactive * 1000,
 			'PlayTotalTime': duration * 1000
-		})
+		}), None)
 	
 	def set_scoreboard(self, blue_score=0, red_score=0):
 		'''
@@ -199,10 +272,11 @@ class Pixoo64Renderer(Renderer):
 		Returns:
 			None
 		'''
-		self.__request('Tools/SetScoreBoard', {
+		self._last_render_digest = None
+		return self._then(self._command('Tools/SetScoreBoard', {
 			'BlueScore': blue_score,
 			'RedScore': red_score
-		})
+		}), None)
 
 	def start_countdown(self, seconds=0):
 		'''
@@ -216,12 +290,13 @@ class Pixoo64Renderer(Renderer):
 		'''
 		minutes = int(seconds / 60)
 		seconds = seconds % 60
-		self.__request('Tools/SetTimer', {
+		self._last_render_digest = None
+		self.__start_countdown_time = time()
+		return self._then(self._command('Tools/SetTimer', {
 			'Minute': minutes,
 			'Second': seconds,
 			'Status': 1
-		})
-		self.__start_countdown_time = time()
+		}), None)
 
 	def stop_countdown(self):
 		'''
@@ -233,68 +308,27 @@ class Pixoo64Renderer(Renderer):
 		Returns:
 			int: Elapsed time in seconds
 		'''
-		self.__request('Tools/SetTimer', {
+		elapsed = int(time() - self.__start_countdown_time)
+		return self._then(self._command('Tools/SetTimer', {
 			'Status': 0
-		})
-		return int(time() - self.__start_countdown_time)
+		}), elapsed)
 	
 	def clear_remote_text(self):
 		'''
 		Clears the remote text on the device.
 		'''
-		return self.__request('Draw/ClearHttpText')
+		self._last_render_digest = None
+		return self._command('Draw/ClearHttpText')
 
 	def switch(self, on=True):
-		self.__request('Channel/OnOffScreen', {
+		return self._then(self._command('Channel/OnOffScreen', {
 			'OnOff': 1 if on else 0
-		})
+		}), None)
 
 	def set_brightness(self, brightness):
-		self.__request('Channel/SetBrightness', {
+		return self._then(self._command('Channel/SetBrightness', {
 			'Brightness': clamp(brightness, 0, 100)
-		})
-
-	def set_dial(self, items, background=None, clear=True):
-		'''
-		Sets the dial on the device with the given items. These are networking commands on the pixoo device that manage things like temperature, weather, time, etc.
-		Most of them just auto-update, so it's useful for creating custom dials (Like watchfaces, for example).
-		
-		Args:
-			items (list(dict)): A list of items to display on the dial. Each item should have at least a 'DisplayType' type.
-			background (str): The path to an image to use as the background of the dial. Default is None.
-			clear (bool): Whether to send a network clear for the current text on the device or not. Default is True.
-
-		Returns:
-			None
-
-		Note: This method is pretty raw and depends on knowing the exact parameters to send to the device. It's recommended to use the higher-level render_template method.
-		If needed additional documentation [can be found on the official API](https://doc.divoom-gz.com/web/#/12?page_id=234).
-		'''
-		if background is not None:
-			path_ext = background.split('.')[-1]
-			if path_ext == 'gif':
-				self._pizoo.draw_gif(background, size='auto', fill='auto')
-			else:
-				self._pizoo.draw_image(background)
-			self._pizoo.render()
-		if clear:
-			self.clear_remote_text()
-		processed_items = [{'TextId': index + 1, **DIAL_DEFAULT_ITEM, **item} for index, item in enumerate(items)]
-		self.__request('Draw/SendHttpItemList', {
-			'ItemList': processed_items
-		})
-
-	def render(self, buffer, frame_speed):
-		# TODO: This may improve render speed when sending multi-frame buffers: https://www.reddit.com/r/Divoom_Products/comments/11107e1/comment/j9z776i/?utm_source=share&utm_medium=web3x&utm_name=web3xcss&utm_term=1&utm_content=share_button
-		self.__pic_id += 1
-		if self.__pic_id >= self.__id_limit:
-			self.__reset_pic_id()
-		buffer = buffer[-self._max_frames:]
-		# Because of a weird bug in the Pixoo64, we need to make sure the frame speed is not below 95 or greater than 280 (290 is the max speed)
-		# frame_speed = floor(clamp(frame_speed, 95, 280))
-		frame_speed = floor(clamp(frame_speed, 10, 10000))
-		for i, frame in enumerate(buffer):
-			self.__send_frame(frame, speed=frame_speed, frame_number=len(buffer), offset=i)
+		}), None)
 
 	def compile_node_root_options(self, options):
 		result = []
@@ -381,14 +415,454 @@ class Pixoo64Renderer(Renderer):
 				dt = DisplayType.ENG_WEEK_FULL
 			result = (dt, {**attributes, 'x': abs_x, 'y': abs_y, 'TextWidth': width, 'TextHeight': height})
 		return result
+
+class Pixoo64Renderer(_BasePixoo64Renderer):
+	__pic_id = None
+	__url = None
+	def __init__(self, address, pizzoo, debug, timeout=(3.05, 10), pool_size=4, batch_size=8):
+		'''
+		This renderer is used to render the frames on the Divoom Pixoo64 device. It uses the Divoom API to send the frames to the device.
+		Also includes some built-in methods for controlling the device like the buzzer, scoreboard, countdown, etc.
+
+		Every request goes through a keep-alive session, so the connection to the device is opened once and reused by every frame and command.
+
+		Args:
+			timeout (float | tuple(float, float)): The connect and read timeouts of every request in seconds, or a single value for both. Default is (3.05, 10).
+			pool_size (int): The maximum number of connections kept open to the device. Default is 4.
+			batch_size (int): The maximum number of frames sent on a single request when rendering animations. If the device rejects them, frames are sent one by one, and batching is disabled if that keeps happening. Default is 8.
+		'''
+		super().__init__(address, pizzoo, debug, batch_size)
+		self.__url = f'http://{address}/post'
+		self.__timeout = timeout
+		self.__adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+		self.__session = Session()
+		self.__session.mount('http://', self.__adapter)
+		# Commands waiting to be sent while a batch is open, kept per thread so a render from another thread (Like the background render one) never sends or discards them
+		self.__batch = local()
+		self.__pic_id = self.__request('Draw/GetHttpGifId')['PicId']
+		if self.__pic_id > self._id_limit:
+			self.__reset_pic_id()
+
+	def __request(self, endpoint, data=None):
+		data = {'Command': endpoint, **(data if data else {})}
+		result = self.__session.post(self.__url, dumps(data), timeout=self.__timeout).json()
+		if result['error_code'] != 0:
+			raise Exception(f'Error on request {endpoint} with code \"{result["error_code"]}\"')
+		return result
 	
+	def _command(self, endpoint, data=None):
+		'''
+		Sends a command to the device, or queues it if a batch is open.
+		'''
+		queued = self.__queued()
+		if queued is not None:
+			queued.append({'Command': endpoint, **(data if data else {})})
+			return None
+		return self.__request(endpoint, data)
+
+	@contextmanager
+	def batch(self):
+		'''
+		A context manager that queues the device commands called inside it (switch, set_brightness, buzzer, set_scoreboard, the countdown, clear_remote_text and set_dial items) and sends them on a single command list request when it exits.
+		A render inside it sends the queued commands first, so the order is kept. Batches belong to the thread that opened them, so with background_render the commands are sent when the batch exits instead. Nested batches are sent with the outermost one, and if an error is raised inside the block the queued commands are discarded.
+
+		If the device rejects the command list, or its reply is not valid, the commands are sent one by one, so every failing command is reported on its own. Connection errors and timeouts are raised right away.
+
+		Raises:
+			CommandBatchError: If any of the commands failed, with the error of every failed command.
+
+		Example:
+			with pizzoo.batch():
+				pizzoo.set_brightness(50)
+				pizzoo.buzzer()
+		'''
+		if self.__queued() is not None:
+			yield
+			return
+		self.__batch.queued = []
+		try:
+			yield
+		except BaseException:
+			self.__batch.queued = None
+			raise
+		commands, self.__batch.queued = self.__batch.queued, None
+		self.__flush(commands)
+
+	def __queued(self):
+		'''Returns the commands queued by the batch open on the calling thread, or None if there is none.'''
+		return getattr(self.__batch, 'queued', None)
+
+	def __flush(self, commands):
+		if len(commands) > 1:
+			try:
+				self.__request('Draw/CommandList', {'CommandList': commands})
+				return
+			except (RequestConnectionError, Timeout):
+				# The same error would happen for every single command
+				raise
+			except Exception as e:
+				if self._debug: print(f'Batched commands failed, sending them one by one: {e}')
+		errors = []
+		for command in commands:
+			try:
+				self.__request(command['Command'], command)
+			except (RequestConnectionError, Timeout):
+				# The connection is lost, so the rest of the commands would fail too
+				raise
+			except Exception as e:
+				errors.append((command['Command'], e))
+		if errors:
+			raise CommandBatchError(errors)
+
+	def get_connection_stats(self):
+		'''
+		Returns how many connections were opened to the device and how many requests were sent through them.
+
+		Returns:
+			dict: A dict with the opened connections, the sent requests and the requests that reused an already open connection.
+		'''
+		pools = self.__adapter.poolmanager.pools
+		connections = sum(pools[key].num_connections for key in pools.keys())
+		requests = sum(pools[key].num_requests for key in pools.keys())
+		return {'connections': connections, 'requests': requests, 'reused': requests - connections}
+
+	def close(self):
+		'''
+		Closes every open connection to the device.
+		'''
+		self.__session.close()
+
+	def __reset_pic_id(self):
+		try:
+			self.__request('Draw/ResetHttpGifId')
+			self.__pic_id = 1
+		except Exception as e:
+			if self._debug: print(e)
+
+	def __send_frames(self, commands):
+		'''
+		Sends a batch of frames on a single request, as a command list. If the device fails to process it, the frames of the batch are sent one by one.
+		'''
+		batch_failed = False
+		if len(commands) > 1 and self._batch_size > 1:
+			try:
+				self.__request('Draw/CommandList', {'CommandList': commands})
+				self._batch_sent(False)
+				return
+			except (RequestConnectionError, Timeout):
+				# Connection errors would fail the same way for single frames, but invalid replies should not
+				raise
+			except Exception as e:
+				if self._debug: print(f'Batched frames failed, sending them one by one: {e}')
+				batch_failed = True
+		for command in commands:
+			self.__request(command['Command'], command)
+		if batch_failed:
+			self._batch_sent(True)
+
+	def get_settings(self):
+		'''
+		Gets the current settings of the device.
+
+		Returns:
+			dict: The settings of the device.
+		'''
+		return self.__request('Channel/GetAllConf')
+
+	def set_dial(self, items, background=None, clear=True):
+		'''
+		Sets the dial on the device with the given items. These are networking commands on the pixoo device that manage things like temperature, weather, time, etc.
+		Most of them just auto-update, so it's useful for creating custom dials (Like watchfaces, for example).
+		
+		Args:
+			items (list(dict)): A list of items to display on the dial. Each item should have at least a 'DisplayType' type.
+			background (str): The path to an image to use as the background of the dial. Default is None.
+			clear (bool): Whether to send a network clear for the current text on the device or not. Default is True.
+
+		Returns:
+			None
+
+		Note: This method is pretty raw and depends on knowing the exact parameters to send to the device. It's recommended to use the higher-level render_template method.
+		If needed additional documentation [can be found on the official API](https://doc.divoom-gz.com/web/#/12?page_id=234).
+		'''
+		if background is not None:
+			self._draw_dial_background(background)
+			self._pizzoo.render()
+			self._pizzoo.wait_render()
+		if clear:
+			self.clear_remote_text()
+		self._command('Draw/SendHttpItemList', {
+			'ItemList': self._dial_items(items)
+		})
+
+	def render(self, buffer, frame_speed):
+		if self.__queued():
+			# Commands queued before the render on this thread are sent first
+			commands, self.__batch.queued = self.__batch.queued, []
+			self.__flush(commands)
+		# Frames are sent in batches, packed on a single command list request: https://www.reddit.com/r/Divoom_Products/comments/11107e1/comment/j9z776i/?utm_source=share&utm_medium=web3x&utm_name=web3xcss&utm_term=1&utm_content=share_button
+		self.__pic_id += 1
+		if self.__pic_id >= self._id_limit:
+			self.__reset_pic_id()
+		commands = self._frame_commands(buffer, frame_speed, self.__pic_id)
+		# Batching may be disabled midway, so every slice keeps the size the render started with
+		batch_size = self._batch_size
+		for start in range(0, len(commands), batch_size):
+			self.__send_frames(commands[start:start + batch_size])
+
 	def render_template_items(self, items, use_cache=True):
 		# workaround for a desync error with the divoom device when sending dial items
 		sleep(0.2)
 		items = [{'type': item[0], **item[1], 'color': tuple_to_hex(item[1]['color'])} for item in items]
 		self.set_dial(items)
 
+class AsyncPixoo64Renderer(_BasePixoo64Renderer):
+	def __init__(self, address, pizzoo, debug, timeout=10, max_in_flight=4, batch_size=8):
+		'''
+		An asyncio version of the Pixoo64 renderer, so a single event loop can drive many devices without threads. Frames are rendered with await pizzoo.render_async(), templates with await pizzoo.render_template_async() and every control method (buzzer, set_dial, get_settings, etc.) is a coroutine.
+
+		Requests go through a small HTTP/1.1 client over asyncio streams that keeps connections to the device open, and the batches of an animation are uploaded concurrently.
+
+		Args:
+			timeout (float): The timeout of every request in seconds. Default is 10.
+			max_in_flight (int): The maximum number of requests sent to the device at the same time, which is also the maximum number of open connections. Default is 4.
+			batch_size (int): The maximum number of frames sent on a single request when rendering animations. If the device rejects them, frames are sent one by one, and batching is disabled if that keeps happening. Default is 8.
+		'''
+		super().__init__(address, pizzoo, debug, batch_size)
+		host, _, port = address.partition(':')
+		self.__host = host
+		self.__port = int(port) if port else 80
+		self.__timeout = timeout
+		self.__max_in_flight = max(max_in_flight, 1)
+		# The picture id is requested on the first render, as there is no running loop yet
+		self.__pic_id = None
+		# Connections and the semaphore belong to the loop they were created on
+		self.__loop = None
+		self.__semaphore = None
+		self.__connections = []
+		self.__stats = {'connections': 0, 'requests': 0}
+
+	def __bind_loop(self):
+		loop = get_running_loop()
+		if loop is not self.__loop:
+			self.__loop = loop
+			self.__semaphore = Semaphore(self.__max_in_flight)
+			self.__connections = []
+
+	async def __request(self, endpoint, data=None):
+		self.__bind_loop()
+		data = {'Command': endpoint, **(data if data else {})}
+		body = dumps(data).encode()
+		async with self.__semaphore:
+			result = loads(await wait_for(self.__post(body), self.__timeout))
+		if result['error_code'] != 0:
+			raise Exception(f'Error on request {endpoint} with code \"{result["error_code"]}\"')
+		return result
+
+	async def __post(self, body):
+		'''
+		Sends a POST request with the given body, reusing an idle connection if there is one, and returns the body of the response.
+		'''
+		while self.__connections:
+			reader, writer = self.__connections.pop()
+			try:
+				return await self.__exchange(reader, writer, body)
+			except (ConnectionError, IncompleteReadError):
+				# The device closed the idle connection, so try with the next one
+				continue
+		reader, writer = await open_connection(self.__host, self.__port)
+		self.__stats['connections'] += 1
+		return await self.__exchange(reader, writer, body)
+
+	async def __exchange(self, reader, writer, body):
+		try:
+			writer.write(f'POST /post HTTP/1.1\r\nHost: {self.__host}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n'.encode() + body)
+			await writer.drain()
+			status = await reader.readline()
+			if not status:
+				raise ConnectionResetError('Connection closed by the device')
+			headers = {}
+			while True:
+				line = await reader.readline()
+				if line in (b'\r\n', b'\n', b''):
+					break
+				name, _, value = line.decode('latin-1').partition(':')
+				headers[name.strip().lower()] = value.strip().lower()
+			keep_alive = headers.get('connection') != 'close'
+			if 'content-length' in headers:
+				content = await reader.readexactly(int(headers['content-length']))
+			elif headers.get('transfer-encoding') == 'chunked':
+				content = b''
+				while True:
+					size = int((await reader.readline()).split(b';')[0], 16)
+					if size == 0:
+						while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+							pass
+						break
+					content += await reader.readexactly(size)
+					await reader.readline()
+			else:
+				content = await reader.read()
+				keep_alive = False
+		except BaseException:
+			writer.close()
+			raise
+		self.__stats['requests'] += 1
+		if keep_alive:
+			self.__connections.append((reader, writer))
+		else:
+			writer.close()
+		code = int(status.split()[1])
+		if code != 200:
+			raise Exception(f'Unexpected HTTP status {code} from the device')
+		return content
+
+	def get_connection_stats(self):
+		'''
+		Returns how many connections were opened to the device and how many requests were sent through them.
+
+		Returns:
+			dict: A dict with the opened connections, the sent requests and the requests that reused an already open connection.
+		'''
+		return {**self.__stats, 'reused': self.__stats['requests'] - self.__stats['connections']}
+
+	async def close(self):
+		'''
+		Closes every open connection to the device.
+		'''
+		connections, self.__connections = self.__connections, []
+		for _, writer in connections:
+			writer.close()
+		for _, writer in connections:
+			try:
+				await writer.wait_closed()
+			except ConnectionError:
+				pass
+
+	def run(self, awaitable):
+		'''
+		Runs an awaitable that uses this renderer (Like Pizzoo.render_async or Pizzoo.render_template_async) to completion on a new event loop, closing the connections opened on it once it finishes, so it can be used from code without a running loop.
+
+		Args:
+			awaitable (Awaitable): The awaitable to run.
+
+		Raises:
+			RuntimeError: If it is called from a running event loop, where the awaitable has to be awaited instead.
+
+		Returns:
+			The result of the awaitable.
+		'''
+		try:
+			get_running_loop()
+		except RuntimeError:
+			return run(self.__run_and_close(awaitable))
+		if hasattr(awaitable, 'close'):
+			awaitable.close()
+		raise RuntimeError(f'{self.__class__.__name__} can not be used synchronously from a running event loop, use the async methods (Like await pizzoo.render_async()) instead')
+
+	async def __run_and_close(self, awaitable):
+		try:
+			return await awaitable
+		finally:
+			await self.close()
+
+	def _command(self, endpoint, data=None):
+		return self.__request(endpoint, data)
+
+	async def _then(self, result, value):
+		await result
+		return value
+
+	async def __next_pic_id(self):
+		if self.__pic_id is None:
+			self.__pic_id = (await self.__request('Draw/GetHttpGifId'))['PicId']
+		self.__pic_id += 1
+		if self.__pic_id >= self._id_limit:
+			try:
+				await self.__request('Draw/ResetHttpGifId')
+				self.__pic_id = 1
+			except Exception as e:
+				if self._debug: print(e)
+		return self.__pic_id
+
+	async def __send_frames(self, commands):
+		'''
+		Sends a batch of frames on a single request, as a command list. If the device fails to process it, the frames of the batch are sent one by one.
+		'''
+		batch_failed = False
+		if len(commands) > 1 and self._batch_size > 1:
+			try:
+				await self.__request('Draw/CommandList', {'CommandList': commands})
+				self._batch_sent(False)
+				return
+			except (OSError, TimeoutError, IncompleteReadError):
+				# Connection errors would fail the same way for single frames
+				raise
+			except Exception as e:
+				if self._debug: print(f'Batched frames failed, sending them one by one: {e}')
+				batch_failed = True
+		for command in commands:
+			await self.__request(command['Command'], command)
+		if batch_failed:
+			self._batch_sent(True)
+
+	async def render_async(self, buffer, frame_speed):
+		'''
+		Renders the buffer on the device. The first batch of frames is sent on its own, so the device starts the new animation, and the rest of them are uploaded concurrently.
+
+		Args:
+			buffer (list(bytearray)): A list of frames to render on the device, each one a flat bytearray with the RGB values of every pixel. Identical frames are the same bytearray object.
+			frame_speed (int): The speed at which the frames should be displayed.
+		'''
+		commands = self._frame_commands(buffer, frame_speed, await self.__next_pic_id())
+		batch_size = self._batch_size
+		await self.__send_frames(commands[:batch_size])
+		await gather(*(self.__send_frames(commands[start:start + batch_size]) for start in range(batch_size, len(commands), batch_size)))
+
+	def render(self, buffer, frame_speed):
+		'''
+		Renders the buffer on the device, blocking until it is sent. Use Pizzoo.render_async instead from a running event loop.
+		'''
+		self.run(self.render_async(buffer, frame_speed))
+
+	async def get_settings(self):
+		'''
+		Gets the current settings of the device.
+
+		Returns:
+			dict: The settings of the device.
+		'''
+		return await self.__request('Channel/GetAllConf')
+
+	async def set_dial(self, items, background=None, clear=True):
+		'''
+		Sets the dial on the device with the given items, the same as Pixoo64Renderer.set_dial.
+
+		Args:
+			items (list(dict)): A list of items to display on the dial. Each item should have at least a 'DisplayType' type.
+			background (str): The path to an image to use as the background of the dial. Default is None.
+			clear (bool): Whether to send a network clear for the current text on the device or not. Default is True.
+
+		Returns:
+			None
+		'''
+		if background is not None:
+			self._draw_dial_background(background)
+			await self._pizzoo.render_async()
+		if clear:
+			await self.clear_remote_text()
+		await self.__request('Draw/SendHttpItemList', {
+			'ItemList': self._dial_items(items)
+		})
+
+	async def render_template_items(self, items, use_cache=True):
+		# workaround for a desync error with the divoom device when sending dial items
+		await async_sleep(0.2)
+		items = [{'type': item[0], **item[1], 'color': tuple_to_hex(item[1]['color'])} for item in items]
+		await self.set_dial(items)
+
 class ImageRenderer(Renderer):
+	_keeps_frames = False
 	def __init__(self, address, pizzoo, debug, resize_factor=5, resample_method=Image.NEAREST):
 		'''
 		This renderer creates a static image or gif with the frames and saves it to the disk. It can be used for debugging or demo purposes.
@@ -408,18 +882,21 @@ class ImageRenderer(Renderer):
 		'''
 		buffer = buffer[-self._max_frames:]
 		if len(buffer) == 1:
-			image = Image.frombytes('RGB', (self._size, self._size), bytes(buffer[0]), 'raw')
+			image = Image.frombytes('RGB', (self._size, self._size), buffer[0], 'raw')
 			if self._resize_factor > 1:
 				image = image.resize((self._size * self._resize_factor, self._size * self._resize_factor), resample=self._resample_method)
 			image.save('temp.png')
 			image.show()
 		else:
-			# Create gif with all frames
-			images = []
+			# Create gif with all frames, decoding and resizing duplicated frames only once
+			decoded = {}
 			for frame in buffer:
-				images.append(Image.frombytes('RGB', (self._size, self._size), bytes(frame), 'raw'))
-			if self._resize_factor > 1:
-				images = [image.resize((self._size * self._resize_factor, self._size * self._resize_factor), resample=self._resample_method) for image in images]
+				if id(frame) not in decoded:
+					image = Image.frombytes('RGB', (self._size, self._size), frame, 'raw')
+					if self._resize_factor > 1:
+						image = image.resize((self._size * self._resize_factor, self._size * self._resize_factor), resample=self._resample_method)
+					decoded[id(frame)] = image
+			images = [decoded[id(frame)] for frame in buffer]
 			images[0].save('temp.gif', save_all=True, append_images=images[1:], loop=0, duration=frame_speed)
 
 	def __command_atributes(self, node):
@@ -456,6 +933,9 @@ class ImageRenderer(Renderer):
 		return result
 
 class WindowRenderer(Renderer):
+	# Tk can only be used from the thread that created the window
+	_thread_safe = False
+	_keeps_frames = False
 	def __init__(self, address, pizzoo, debug):
 		'''
 		This renderer creates a window with a canvas to render the frames on the screen. It can be used for debugging or testing purposes.
@@ -472,10 +952,11 @@ class WindowRenderer(Renderer):
 		self.__canvas = tk.Canvas(self._root, width=self._size * self._resize_factor, height=self._size * self._resize_factor, bg='black')
 		self.__canvas.pack()
 
-		image = Image.new('RGB', (self._size, self._size), color='black')
+		# Last rendered frame, only the dirty region of every new frame is pasted on it
+		self.__frame = Image.new('RGB', (self._size, self._size), color='black')
 
-		image = self._process_image(image)
-		self.__image = self.__canvas.create_image(self.__resize_size[0] / 2, self.__resize_size[0] / 2, image=image)
+		self.__photo = self._process_image(self.__frame)
+		self.__image = self.__canvas.create_image(self.__resize_size[0] / 2, self.__resize_size[0] / 2, image=self.__photo)
 		
 		self._root.update()
 
@@ -493,15 +974,20 @@ class WindowRenderer(Renderer):
 		buffer = buffer[-self._max_frames:]
 		wh = self._size * self._resize_factor
 		if len(buffer) == 1:
-			image = Image.frombytes('RGB', (self._size, self._size), bytes(buffer[0]), 'raw')
-			image = self._process_image(image)
-			self.__canvas.itemconfig(self.__image, image=image)
+			dirty_rect = self._pizzoo.get_dirty_rect(0)
+			if dirty_rect is not None:
+				x, y, width, height = dirty_rect
+				frame = buffer[0]
+				region = b''.join(frame[(row * self._size + x) * 3:(row * self._size + x + width) * 3] for row in range(y, y + height))
+				self.__frame.paste(Image.frombytes('RGB', (width, height), region, 'raw'), (x, y))
+				self.__photo = self._process_image(self.__frame)
+				self.__canvas.itemconfig(self.__image, image=self.__photo)
 		else:
 			# Create gif with all frames
 			images = []
 			for frame in buffer:
-				images.append(Image.frombytes('RGB', (self._size, self._size), bytes(frame), 'raw'))
+				images.append(Image.frombytes('RGB', (self._size, self._size), frame, 'raw'))
 			images = [image.resize((wh, wh), resample=Image.NEAREST) for image in images]
 		self._root.update()
 
-__all__ = (Renderer, Pixoo64Renderer, ImageRenderer, WindowRenderer)
\ No newline at end of file
+__all__ = (CommandBatchError, Renderer, Pixoo64Renderer, AsyncPixoo64Renderer, ImageRenderer, WindowRenderer)
\ No newline at end of file
@@ -1,23 +1,38 @@
+from functools import lru_cache
 from ._constants import PICO_PALETTE
 
+PICO_PALETTE_BYTES = tuple(bytes(color) for color in PICO_PALETTE)
+
 def clamp(n, minn, maxn):
 	return max(min(maxn, n), minn)
 
 def get_color_rgb(color):
 	if isinstance(color, tuple):
-		return color
+		# RGBA tuples are normalized here so the drawing methods only handle RGB
+		return color if len(color) == 3 else color[:3]
 	if isinstance(color, str):
-		if color.isdigit():
-			return PICO_PALETTE[int(color)]
-		if color[0] == '#' and len(color) == 7:
-			return tuple(int(color[i:i+2], 16) for i in (1, 3, 5))
-		if color[0] == '(' and color[-1] == ')':
-			return tuple(int(x) for x in color[1:-1].split(','))
+		return _parse_color_string(color)
 	if isinstance(color, int):
 		return PICO_PALETTE[color]
 	raise ValueError('Invalid color format')
 
+def get_color_bytes(color):
+	'''Returns the given color as the 3 RGB bytes of a single frame pixel.'''
+	if isinstance(color, int):
+		return PICO_PALETTE_BYTES[color]
+	return bytes(get_color_rgb(color))
+
+@lru_cache(maxsize=256)
+def _parse_color_string(color):
+	if color.isdigit():
+		return PICO_PALETTE[int(color)]
+	if color[0] == '#' and len(color) == 7:
+		return (int(color[1:3], 16), int(color[3:5], 16), int(color[5:7], 16))
+	if color[0] == '(' and color[-1] == ')':
+		return tuple(int(x) for x in color[1:-1].split(','))[:3]
+	raise ValueError('Invalid color format')
+
 def tuple_to_hex(color_tuple):
 	return '#%02x%02x%02x' % color_tuple
 
-__all__ = (clamp, get_color_rgb, tuple_to_hex)
\ No newline at end of file
+__all__ = (clamp, get_color_rgb, get_color_bytes, tuple_to_hex)
@@ -0,0 +1,155 @@
+from threading import Condition, Thread
+from time import perf_counter
+
+class RenderWorker:
+	def __init__(self, render, release=None, coalesce=None):
+		'''
+		Renders buffers on a background thread, so the caller does not wait for the devices. Only the latest submitted buffer is kept: if the devices are still busy when a new one arrives, it replaces the pending one, which is dropped.
+
+		Args:
+			render (callable): The function that renders a buffer, called as render(buffer, frame_speed, force, state) from the worker thread.
+			release (callable | None): A function called with every submitted buffer once it is no longer needed, because it was rendered, failed or dropped. Default is None.
+			coalesce (callable | None): A function called as coalesce(dropped_state, state) when a pending buffer is dropped, returning the state for the buffer replacing it. Default is None (The new state is kept).
+		'''
+		self.__render = render
+		self.__release = release
+		self.__coalesce = coalesce
+		self.__condition = Condition()
+		self.__pending = None
+		self.__busy = False
+		self.__closed = False
+		self.__error = None
+		self.__submitted = 0
+		self.__sent = 0
+		self.__dropped = 0
+		self.__failed = 0
+		self.__total_latency = 0.0
+		self.__max_latency = 0.0
+		self.__thread = Thread(target=self.__run, name='pizzoo-render-worker', daemon=True)
+		self.__thread.start()
+
+	def submit(self, buffer, frame_speed, force=False, state=None):
+		'''
+		Hands a buffer to the worker and returns immediately.
+
+		Args:
+			buffer (list(bytearray)): The frames to render. They must not be modified afterwards.
+			frame_speed (int): The speed in milliseconds per frame.
+			force (bool): Whether to render the buffer even if it is the same as the last rendered one.
+			state (any): Any data about the buffer that is passed to the render function with it. Default is None.
+
+		Raises:
+			RuntimeError: If the worker was closed.
+			Exception: The error of a previous render that failed on the worker, if any.
+		'''
+		dropped = None
+		with self.__condition:
+			if self.__closed:
+				raise RuntimeError('The render worker is closed')
+			self.__raise_error()
+			self.__submitted += 1
+			if self.__pending is not None:
+				dropped = self.__pending[0]
+				self.__dropped += 1
+				# A dropped forced render still has to force the one replacing it
+				force = force or self.__pending[2]
+				if self.__coalesce is not None:
+					state = self.__coalesce(self.__pending[3], state)
+			self.__pending = (buffer, frame_speed, force, state, perf_counter())
+			self.__condition.notify_all()
+		if dropped is not None and self.__release is not None:
+			self.__release(dropped)
+
+	def wait(self, timeout=None):
+		'''
+		Waits until the pending buffer, if any, is rendered.
+
+		Args:
+			timeout (float | None): The maximum time to wait in seconds. Default is None (No limit).
+
+		Raises:
+			Exception: The error of a render that failed on the worker, if any.
+
+		Returns:
+			bool: False if the timeout expired before the worker was idle.
+		'''
+		with self.__condition:
+			idle = self.__condition.wait_for(lambda: self.__pending is None and not self.__busy, timeout)
+			self.__raise_error()
+			return idle
+
+	def close(self, timeout=None):
+		'''
+		Stops the worker once the pending buffer, if any, is rendered. Closing it again does nothing.
+
+		Args:
+			timeout (float | None): The maximum time to wait for the worker thread in seconds. Default is None (No limit).
+
+		Raises:
+			Exception: The error of a render that failed on the worker, if any.
+
+		Returns:
+			bool: False if the timeout expired before the worker thread finished.
+		'''
+		with self.__condition:
+			self.__closed = True
+			self.__condition.notify_all()
+		self.__thread.join(timeout)
+		with self.__condition:
+			self.__raise_error()
+		return not self.__thread.is_alive()
+
+	def get_stats(self):
+		'''
+		Returns the counters of the worker.
+
+		Returns:
+			dict: A dict with the submitted, sent, dropped and failed buffers, whether a buffer is pending, and the average and max time (In seconds) buffers waited before being rendered.
+		'''
+		with self.__condition:
+			started = self.__sent + self.__failed
+			return {
+				'submitted': self.__submitted,
+				'sent': self.__sent,
+				'dropped': self.__dropped,
+				'failed': self.__failed,
+				'pending': self.__pending is not None,
+				'average_latency': self.__total_latency / started if started else 0.0,
+				'max_latency': self.__max_latency
+			}
+
+	def __raise_error(self):
+		if self.__error is not None:
+			error, self.__error = self.__error, None
+			raise error
+
+	def __run(self):
+		while True:
+			with self.__condition:
+				self.__condition.wait_for(lambda: self.__pending is not None or self.__closed)
+				if self.__pending is None:
+					# Closed, and every submitted buffer was rendered
+					return
+				buffer, frame_speed, force, state, submitted_at = self.__pending
+				self.__pending = None
+				self.__busy = True
+				latency = perf_counter() - submitted_at
+				self.__total_latency += latency
+				self.__max_latency = max(self.__max_latency, latency)
+			error = None
+			try:
+				self.__render(buffer, frame_speed, force, state)
+			except Exception as e:
+				error = e
+			if self.__release is not None:
+				self.__release(buffer)
+			with self.__condition:
+				if error is None:
+					self.__sent += 1
+				else:
+					self.__failed += 1
+					self.__error = error
+				self.__busy = False
+				self.__condition.notify_all()
+
+__all__ = (RenderWorker,)
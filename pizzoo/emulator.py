@@ -0,0 +1,323 @@
+from base64 import b64decode
+from binascii import Error as Base64Error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps, loads
+from random import Random
+from threading import Lock, Semaphore, Thread
+from time import sleep
+from PIL import Image
+
+PIC_WIDTHS = (16, 32, 64)
+MAX_FRAMES = 60
+
+class Pixoo64Emulator:
+	def __init__(self, host='127.0.0.1', port=0, latency=0, jitter=0, error_rate=0, seed=None, max_concurrency=1, command_list=True, debug=False):
+		'''
+		A local HTTP server that answers the requests of the Pixoo64Renderer like a Pixoo64 device would, useful for tests and benchmarks without a device.
+
+		Animations uploaded with Draw/SendHttpGif (Also inside a Draw/CommandList) are reassembled from their frames, checking the same limits as the device: up to 60 frames per animation, a width of 16, 32 or 64 pixels and frames with the RGB values of every pixel.
+
+		Args:
+			host (str): The address to listen on. Default is '127.0.0.1'.
+			port (int): The port to listen on. Default is 0 (Any free port).
+			latency (float): The time in seconds every request waits before being answered. Default is 0.
+			jitter (float): A random time, up to this value in seconds, added to the latency of every request. Default is 0.
+			error_rate (float): The probability, between 0 and 1, of answering a request with an error. Default is 0.
+			seed (int | None): The seed of the random generator for the jitter and errors, so runs can be reproduced. Default is None.
+			max_concurrency (int): The maximum number of requests processed at the same time, latency included, so concurrent requests wait for each other like on the device. Default is 1 (One at a time).
+			command_list (bool): Whether Draw/CommandList is supported. Disable it to emulate a firmware without it, where the renderers fall back to sending every command on its own. Default is True.
+			debug (bool): Whether to print every received command or not. Default is False.
+
+		Example:
+			with Pixoo64Emulator(latency=0.05) as emulator:
+				pizzoo = Pizzoo(emulator.address)
+		'''
+		self.latency = latency
+		self.jitter = jitter
+		self.error_rate = error_rate
+		self.command_list = command_list
+		self.debug = debug
+		self.__random = Random(seed)
+		self.__lock = Lock()
+		self.__slots = Semaphore(max(max_concurrency, 1))
+		self.__server = ThreadingHTTPServer((host, port), _EmulatorHandler)
+		self.__server.daemon_threads = True
+		self.__server.emulator = self
+		self.__thread = None
+		self.__pic_id = 1
+		self.__uploads = {}
+		self.__frames = []
+		self.__frame_speed = None
+		self.__frame_width = 64
+		self.__items = []
+		self.__settings = {'Brightness': 100, 'LightSwitch': 1}
+		self.__stats = {'requests': 0, 'commands': {}, 'errors': 0, 'frames': 0, 'animations': 0, 'bytes': 0}
+
+	@property
+	def address(self):
+		'''
+		The address of the server, as expected by the Pixoo64 renderers ("host:port").
+		'''
+		host, port = self.__server.server_address[:2]
+		return f'{host}:{port}'
+
+	def start(self):
+		'''
+		Starts answering requests on a background thread.
+
+		Returns:
+			str: The address of the server.
+		'''
+		if self.__thread is None:
+			self.__thread = Thread(target=self.__server.serve_forever, name='pizzoo-emulator', daemon=True)
+			self.__thread.start()
+		return self.address
+
+	def serve_forever(self):
+		'''
+		Answers requests on the calling thread until it is interrupted.
+		'''
+		try:
+			self.__server.serve_forever()
+		finally:
+			self.__server.server_close()
+
+	def stop(self):
+		'''
+		Stops the server and closes its socket.
+		'''
+		if self.__thread is not None:
+			self.__server.shutdown()
+			self.__thread.join()
+			self.__thread = None
+		self.__server.server_close()
+
+	def __enter__(self):
+		self.start()
+		return self
+
+	def __exit__(self, *args):
+		self.stop()
+
+	def get_frames(self):
+		'''
+		Returns the frames of the last animation that was completely uploaded.
+
+		Returns:
+			list(bytes): The frames, each one with the RGB values of every pixel.
+		'''
+		with self.__lock:
+			return list(self.__frames)
+
+	def get_image(self, index=0):
+		'''
+		Returns a frame of the last animation that was completely uploaded as an image.
+
+		Args:
+			index (int): The index of the frame. Default is 0.
+
+		Raises:
+			ValueError: If no animation was uploaded yet or the index is out of the animation.
+
+		Returns:
+			Image: An RGB image of the frame.
+		'''
+		with self.__lock:
+			if index < -len(self.__frames) or index >= len(self.__frames):
+				raise ValueError(f'Invalid frame index: {index} (animation has {len(self.__frames)} frames)')
+			return Image.frombytes('RGB', (self.__frame_width, self.__frame_width), self.__frames[index])
+
+	def get_frame_speed(self):
+		'''
+		Returns the speed in milliseconds per frame of the last animation that was completely uploaded, or None if there is none.
+		'''
+		return self.__frame_speed
+
+	def get_items(self):
+		'''
+		Returns the items sent with Draw/SendHttpItemList since the remote text was last cleared.
+
+		Returns:
+			list(dict): The items, as sent by the renderer.
+		'''
+		with self.__lock:
+			return list(self.__items)
+
+	def get_settings(self):
+		'''
+		Returns the settings of the emulated device, the same ones answered to Channel/GetAllConf.
+		'''
+		with self.__lock:
+			return dict(self.__settings)
+
+	def get_stats(self):
+		'''
+		Returns the counters of the server.
+
+		Returns:
+			dict: A dict with the received requests, the count of every command (Including the ones inside command lists), the answered errors, the received frames, the completed animations and the received bytes.
+		'''
+		with self.__lock:
+			return {**self.__stats, 'commands': dict(self.__stats['commands'])}
+
+	def _handle(self, body):
+		'''
+		Answers the body of a request, called from the server threads.
+		'''
+		with self.__slots:
+			with self.__lock:
+				delay = self.latency + (self.__random.uniform(0, self.jitter) if self.jitter > 0 else 0)
+			if delay > 0:
+				sleep(delay)
+			return self.__process(body)
+
+	def __process(self, body):
+		with self.__lock:
+			self.__stats['requests'] += 1
+			self.__stats['bytes'] += len(body)
+			try:
+				command = loads(body)
+			except ValueError:
+				return self.__error('Request data illegal json')
+			if not isinstance(command, dict):
+				return self.__error('Request data illegal json')
+			if self.error_rate > 0 and self.__random.random() < self.error_rate:
+				return self.__error('Injected error')
+			try:
+				result = self.__execute(command)
+			except (TypeError, ValueError, AttributeError):
+				return self.__error('Request data illegal json')
+			if result.get('error_code', 0) != 0:
+				self.__stats['errors'] += 1
+			return result
+
+	def __error(self, message):
+		self.__stats['errors'] += 1
+		return {'error_code': message}
+
+	def __execute(self, command):
+		name = command.get('Command')
+		if self.debug: print(f'Emulator received {name}')
+		self.__stats['commands'][name] = self.__stats['commands'].get(name, 0) + 1
+		if name == 'Draw/CommandList' and not self.command_list:
+			return {'error_code': f'Unknown command {name}'}
+		elif name == 'Draw/CommandList':
+			commands = command.get('CommandList')
+			if not isinstance(commands, list):
+				return {'error_code': 'Invalid CommandList'}
+			for item in commands:
+				result = self.__execute(item) if isinstance(item, dict) else {'error_code': 'Invalid command'}
+				if result.get('error_code', 0) != 0:
+					return result
+			return {'error_code': 0}
+		elif name == 'Draw/GetHttpGifId':
+			return {'error_code': 0, 'PicId': self.__pic_id}
+		elif name == 'Draw/ResetHttpGifId':
+			self.__pic_id = 1
+			self.__uploads = {}
+			return {'error_code': 0}
+		elif name == 'Draw/SendHttpGif':
+			return self.__receive_frame(command)
+		elif name == 'Draw/SendHttpItemList':
+			items = command.get('ItemList')
+			if not isinstance(items, list):
+				return {'error_code': 'Invalid ItemList'}
+			self.__items = [item for item in self.__items if item.get('TextId') not in {new.get('TextId') for new in items}] + items
+			return {'error_code': 0}
+		elif name == 'Draw/ClearHttpText':
+			self.__items = []
+			return {'error_code': 0}
+		elif name == 'Channel/GetAllConf':
+			return {'error_code': 0, **self.__settings}
+		elif name == 'Channel/SetBrightness':
+			self.__settings['Brightness'] = max(0, min(100, int(command.get('Brightness', 100))))
+			return {'error_code': 0}
+		elif name == 'Channel/OnOffScreen':
+			self.__settings['LightSwitch'] = 1 if command.get('OnOff') else 0
+			return {'error_code': 0}
+		elif isinstance(name, str) and name.startswith(('Channel/', 'Device/', 'Tools/')):
+			# Other commands only change settings that are not emulated
+			return {'error_code': 0}
+		return {'error_code': f'Unknown command {name}'}
+
+	def __receive_frame(self, command):
+		'''
+		Stores a frame of an animation, completing the animation once every frame of it was received.
+		'''
+		try:
+			pic_id = int(command['PicID'])
+			number = int(command['PicNum'])
+			offset = int(command['PicOffset'])
+			width = int(command['PicWidth'])
+			speed = int(command['PicSpeed'])
+			data = b64decode(command['PicData'], validate=True)
+		except (KeyError, TypeError, ValueError, Base64Error):
+			return {'error_code': 'Invalid frame'}
+		if width not in PIC_WIDTHS:
+			return {'error_code': f'Invalid PicWidth {width}'}
+		if number < 1 or number > MAX_FRAMES:
+			return {'error_code': f'Invalid PicNum {number} (max {MAX_FRAMES})'}
+		if offset < 0 or offset >= number:
+			return {'error_code': f'Invalid PicOffset {offset}'}
+		if len(data) != width * width * 3:
+			return {'error_code': f'Invalid PicData size {len(data)} (expected {width * width * 3})'}
+		upload = self.__uploads.get(pic_id)
+		if upload is None:
+			# A new animation replaces the ones that were not completely uploaded
+			upload = {'number': number, 'width': width, 'speed': speed, 'frames': {}}
+			self.__uploads = {pic_id: upload}
+		elif (upload['number'], upload['width']) != (number, width):
+			return {'error_code': 'PicNum and PicWidth do not match the rest of the animation'}
+		upload['frames'][offset] = data
+		self.__stats['frames'] += 1
+		self.__pic_id = max(self.__pic_id, pic_id)
+		if len(upload['frames']) == number:
+			self.__frames = [upload['frames'][index] for index in range(number)]
+			self.__frame_speed = upload['speed']
+			self.__frame_width = width
+			self.__stats['animations'] += 1
+			del self.__uploads[pic_id]
+		return {'error_code': 0}
+
+class _EmulatorHandler(BaseHTTPRequestHandler):
+	# Keep-alive connections, like the device
+	protocol_version = 'HTTP/1.1'
+
+	def do_POST(self):
+		length = int(self.headers.get('Content-Length', 0))
+		body = self.rfile.read(length)
+		if self.path.split('?')[0] != '/post':
+			self.__respond(404, {'error_code': 'Not found'})
+			return
+		self.__respond(200, self.server.emulator._handle(body))
+
+	def __respond(self, status, result):
+		content = dumps(result).encode()
+		self.send_response(status)
+		self.send_header('Content-Type', 'application/json')
+		self.send_header('Content-Length', str(len(content)))
+		self.end_headers()
+		self.wfile.write(content)
+
+	def log_message(self, format, *args):
+		pass
+
+if __name__ == '__main__':
+	from argparse import ArgumentParser
+	parser = ArgumentParser(description='Runs a local Pixoo64 emulator that answers the requests of the Pixoo64 renderers.')
+	parser.add_argument('--host', default='127.0.0.1', help='The address to listen on.')
+	parser.add_argument('--port', type=int, default=8080, help='The port to listen on.')
+	parser.add_argument('--latency', type=float, default=0, help='The time in seconds every request waits before being answered.')
+	parser.add_argument('--jitter', type=float, default=0, help='A random time, up to this value in seconds, added to the latency.')
+	parser.add_argument('--error-rate', type=float, default=0, help='The probability of answering a request with an error.')
+	parser.add_argument('--seed', type=int, default=None, help='The seed of the random generator.')
+	parser.add_argument('--max-concurrency', type=int, default=1, help='The maximum number of requests processed at the same time.')
+	parser.add_argument('--no-command-list', action='store_true', help='Reject Draw/CommandList requests, like firmwares without it.')
+	parser.add_argument('--debug', action='store_true', help='Print every received command.')
+	args = parser.parse_args()
+	emulator = Pixoo64Emulator(args.host, args.port, args.latency, args.jitter, args.error_rate, args.seed, args.max_concurrency, not args.no_command_list, args.debug)
+	print(f'Pixoo64 emulator listening on {emulator.address}')
+	try:
+		emulator.serve_forever()
+	except KeyboardInterrupt:
+		pass
@@ -0,0 +1,79 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps, loads
+from threading import Thread
+from time import sleep
+from pizzoo import Pizzoo, Renderer
+
+class MemoryRenderer(Renderer):
+	# Rendered frames are copied, so their storage can be reused
+	_keeps_frames = False
+	def __init__(self, address, pizzoo, debug):
+		'''
+		A renderer that keeps a copy of every rendered buffer, so tests can check what would be sent to a device.
+		'''
+		super().__init__(address, pizzoo, debug)
+		self._size = 64
+		self._max_frames = 60
+		self.renders = []
+
+	def render(self, buffer, frame_speed):
+		self.renders.append(([bytes(frame) for frame in buffer], frame_speed))
+
+def create_pizzoo(**params):
+	return Pizzoo('memory', renderer=MemoryRenderer, **params)
+
+def get_pixel(frame, xy, size=64):
+	index = (xy[0] + xy[1] * size) * 3
+	return tuple(frame[index:index + 3])
+
+class FakePixoo64:
+	def __init__(self):
+		'''
+		A local HTTP server that answers like a Pixoo64 device, keeping every command it receives. Replies can be replaced per command with a dict, or raw bytes for invalid replies.
+		'''
+		self.commands = []
+		self.replies = {}
+		self.delay = 0
+		device = self
+
+		class Handler(BaseHTTPRequestHandler):
+			protocol_version = 'HTTP/1.1'
+
+			def do_POST(self):
+				body = device.reply(loads(self.rfile.read(int(self.headers['Content-Length']))))
+				try:
+					self.send_response(200)
+					self.send_header('Content-Type', 'application/json')
+					self.send_header('Content-Length', str(len(body)))
+					self.end_headers()
+					self.wfile.write(body)
+				except OSError:
+					# The client gave up waiting, as in timeout tests
+					pass
+
+			def log_message(self, format, *args):
+				pass
+
+		self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+		self.address = f'127.0.0.1:{self.server.server_address[1]}'
+		Thread(target=self.server.serve_forever, daemon=True).start()
+
+	def reply(self, data):
+		self.commands.append(data)
+		if self.delay > 0:
+			sleep(self.delay)
+		reply = self.replies.get(data['Command'], {'error_code': 0, 'PicId': 1})
+		return reply if isinstance(reply, bytes) else dumps(reply).encode()
+
+	def get_commands(self, name):
+		'''
+		Returns the received commands with the given name, including the ones sent inside command lists.
+		'''
+		commands = []
+		for command in self.commands:
+			commands.extend(command.get('CommandList', [command]) if command['Command'] == 'Draw/CommandList' and name != 'Draw/CommandList' else [command])
+		return [command for command in commands if command['Command'] == name]
+
+	def close(self):
+		self.server.shutdown()
+		self.server.server_close()
@@ -0,0 +1,59 @@
+from os import utime
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+from PIL import Image
+from pizzoo._cache import LRUCache
+from tests.helpers import create_pizzoo, get_pixel
+
+class LRUCacheTest(TestCase):
+	def test_least_recently_used_item_is_evicted(self):
+		cache = LRUCache(maxsize=2)
+		cache.put('a', 1)
+		cache.put('b', 2)
+		cache.get('a')
+		cache.put('c', 3)
+		self.assertIsNone(cache.get('b'))
+		self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+		self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+	def test_invalidate(self):
+		cache = LRUCache()
+		for key in ('a', 'b', 'ab'):
+			cache.put(key, key)
+		self.assertEqual(cache.invalidate(lambda key: key.startswith('a')), 2)
+		self.assertEqual(cache.invalidate(), 1)
+
+class ImageCacheTest(TestCase):
+	def setUp(self):
+		self.pizzoo = create_pizzoo()
+		self.pizzoo.clear_image_cache()
+		self.directory = TemporaryDirectory()
+		self.path = join(self.directory.name, 'image.png')
+		Image.new('RGB', (2, 2), (1, 2, 3)).save(self.path)
+
+	def tearDown(self):
+		self.pizzoo.clear_image_cache()
+		self.directory.cleanup()
+
+	def test_images_from_a_path_are_decoded_once(self):
+		hits = self.pizzoo.get_image_cache_info()['hits']
+		self.pizzoo.draw_image(self.path)
+		self.pizzoo.draw_image(self.path, (4, 4))
+		self.assertEqual(self.pizzoo.get_image_cache_info()['hits'], hits + 1)
+		self.assertEqual(get_pixel(self.pizzoo.get_current_frame(), (5, 5)), (1, 2, 3))
+
+	def test_changed_files_are_decoded_again(self):
+		self.pizzoo.draw_image(self.path)
+		Image.new('RGB', (2, 2), (7, 8, 9)).save(self.path)
+		utime(self.path, ns=(0, 10 ** 9))
+		self.pizzoo.draw_image(self.path)
+		self.assertEqual(get_pixel(self.pizzoo.get_current_frame(), (0, 0)), (7, 8, 9))
+
+	def test_clear_a_single_path(self):
+		self.pizzoo.draw_image(self.path)
+		self.assertEqual(self.pizzoo.clear_image_cache(self.path), 1)
+		self.assertEqual(self.pizzoo.clear_image_cache(self.path), 0)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,264 @@
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main, skipUnless
+from unittest.mock import patch
+from PIL import Image
+from pizzoo import Pizzoo
+from tests.helpers import create_pizzoo, get_pixel
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+def drawn_pixels(frame, size=64):
+	'''Returns the coordinates of every pixel of the frame that is not black.'''
+	return {(index // 3 % size, index // 3 // size) for index in range(0, len(frame), 3) if frame[index:index + 3] != b'\x00\x00\x00'}
+
+class RectangleTest(TestCase):
+	def setUp(self):
+		self.pizzoo = create_pizzoo()
+
+	def test_filled_rectangle(self):
+		self.pizzoo.draw_rectangle((2, 3), 4, 2, '#ff0000')
+		self.assertEqual(drawn_pixels(self.pizzoo.get_current_frame()), {(x, y) for x in range(2, 6) for y in range(3, 5)})
+		self.assertEqual(get_pixel(self.pizzoo.get_current_frame(), (2, 3)), (255, 0, 0))
+
+	def test_outlined_rectangle_only_draws_its_edges(self):
+		self.pizzoo.draw_rectangle((0, 0), 4, 4, '#ffffff', filled=False)
+		inside = {(1, 1), (1, 2), (2, 1), (2, 2)}
+		self.assertEqual(drawn_pixels(self.pizzoo.get_current_frame()), {(x, y) for x in range(4) for y in range(4)} - inside)
+
+	def test_rectangle_is_clipped_to_the_screen(self):
+		self.pizzoo.draw_rectangle((-2, 62), 4, 10, '#ffffff')
+		self.assertEqual(drawn_pixels(self.pizzoo.get_current_frame()), {(x, y) for x in range(2) for y in range(62, 64)})
+
+	def test_full_width_and_single_column_rectangles(self):
+		self.pizzoo.draw_rectangle((0, 10), 64, 2, '#ffffff')
+		self.pizzoo.draw_rectangle((5, 20), 1, 3, '#ffffff')
+		expected = {(x, y) for x in range(64) for y in range(10, 12)} | {(5, y) for y in range(20, 23)}
+		self.assertEqual(drawn_pixels(self.pizzoo.get_current_frame()), expected)
+
+class ShapeTest(TestCase):
+	def setUp(self):
+		self.pizzoo = create_pizzoo()
+
+	def test_line_includes_both_ends(self):
+		self.pizzoo.draw_line((1, 1), (6, 3), '#ffffff')
+		pixels = drawn_pixels(self.pizzoo.get_current_frame())
+		self.assertIn((1, 1), pixels)
+		self.assertIn((6, 3), pixels)
+		# A Bresenham line has a single pixel per column on its major axis
+		self.assertEqual(len(pixels), 6)
+
+	def test_line_is_clipped_to_the_screen(self):
+		self.pizzoo.draw_line((-10, 5), (100, 5), '#ffffff')
+		self.assertEqual(drawn_pixels(self.pizzoo.get_current_frame()), {(x, 5) for x in range(64)})
+
+	def test_filled_circle_is_symmetric(self):
+		self.pizzoo.draw_circle((32, 32), 5, '#ffffff')
+		pixels = drawn_pixels(self.pizzoo.get_current_frame())
+		self.assertIn((32, 32), pixels)
+		self.assertEqual({(x, y) for x, y in pixels if x == 32 or y == 32}, {(32, y) for y in range(27, 38)} | {(x, 32) for x in range(27, 38)})
+		self.assertEqual(pixels, {(64 - x, y) for x, y in pixels})
+		self.assertEqual(pixels, {(x, 64 - y) for x, y in pixels})
+
+	def test_outlined_circle_leaves_its_center_empty(self):
+		self.pizzoo.draw_circle((32, 32), 5, '#ffffff', filled=False)
+		pixels = drawn_pixels(self.pizzoo.get_current_frame())
+		self.assertNotIn((32, 32), pixels)
+		self.assertIn((37, 32), pixels)
+
+	def test_ellipse_extents(self):
+		self.pizzoo.draw_ellipse((20, 20), 6, 3, '#ffffff')
+		pixels = drawn_pixels(self.pizzoo.get_current_frame())
+		self.assertEqual((min(x for x, _ in pixels), max(x for x, _ in pixels)), (14, 26))
+		self.assertEqual((min(y for _, y in pixels), max(y for _, y in pixels)), (17, 23))
+
+	def test_filled_polygon(self):
+		self.pizzoo.draw_polygon([(0, 0), (10, 0), (10, 10), (0, 10)], '#ffffff')
+		pixels = drawn_pixels(self.pizzoo.get_current_frame())
+		self.assertIn((5, 5), pixels)
+		self.assertNotIn((11, 5), pixels)
+
+	def test_outlined_polygon_leaves_its_inside_empty(self):
+		self.pizzoo.draw_polygon([(0, 0), (10, 0), (10, 10)], '#ffffff', filled=False)
+		pixels = drawn_pixels(self.pizzoo.get_current_frame())
+		self.assertIn((10, 5), pixels)
+		self.assertNotIn((8, 3), pixels)
+
+class PixelBatchTest(TestCase):
+	def setUp(self):
+		self.pizzoo = create_pizzoo()
+
+	def test_single_color_for_every_pixel(self):
+		self.pizzoo.draw_pixels([(0, 0), (5, 6), (70, 3), (-1, 2)], '#00ff00')
+		self.assertEqual(drawn_pixels(self.pizzoo.get_current_frame()), {(0, 0), (5, 6)})
+		self.assertEqual(get_pixel(self.pizzoo.get_current_frame(), (5, 6)), (0, 255, 0))
+
+	def test_one_color_per_pixel(self):
+		self.pizzoo.draw_pixels([(1, 1), (2, 2)], ['#ff0000', [0, 0, 255]])
+		self.assertEqual(get_pixel(self.pizzoo.get_current_frame(), (1, 1)), (255, 0, 0))
+		self.assertEqual(get_pixel(self.pizzoo.get_current_frame(), (2, 2)), (0, 0, 255))
+
+	def test_mismatched_colors_raise(self):
+		with self.assertRaises(ValueError):
+			self.pizzoo.draw_pixels([(1, 1), (2, 2)], ['#ff0000'])
+
+	def test_iterators_are_checked_too(self):
+		with self.assertRaises(ValueError):
+			self.pizzoo.draw_pixels(((x, 0) for x in range(3)), ['#ff0000', '#00ff00'])
+		self.pizzoo.draw_pixels(((x, 0) for x in range(3)), iter(['#ff0000'] * 3))
+		self.assertEqual(drawn_pixels(self.pizzoo.get_current_frame()), {(0, 0), (1, 0), (2, 0)})
+
+	@skipUnless(np, 'NumPy is not installed')
+	def test_numpy_arrays(self):
+		coords = np.array([(0, 0), (1, 0), (64, 0)])
+		self.pizzoo.draw_pixels(coords, np.array([(255, 0, 0), (0, 255, 0), (0, 0, 255)]))
+		self.assertEqual(get_pixel(self.pizzoo.get_current_frame(), (1, 0)), (0, 255, 0))
+		self.assertEqual(drawn_pixels(self.pizzoo.get_current_frame()), {(0, 0), (1, 0)})
+		# A single row is used for every pixel
+		self.pizzoo.draw_pixels(coords, np.array([(9, 9, 9)]))
+		self.assertEqual(get_pixel(self.pizzoo.get_current_frame(), (0, 0)), (9, 9, 9))
+		with self.assertRaises(ValueError):
+			self.pizzoo.draw_pixels(coords, np.array([(1, 1, 1), (2, 2, 2)]))
+
+	@skipUnless(np, 'NumPy is not installed')
+	def test_numpy_arrays_on_palette_frames(self):
+		pizzoo = create_pizzoo(palette=['#000000', '#ff0000', '#00ff00'])
+		coords = np.array([(0, 0), (1, 0), (64, 0)])
+		pizzoo.draw_pixels(coords, np.array([(250, 0, 0), (0, 250, 0), (0, 0, 250)]))
+		self.assertEqual(bytes(pizzoo.get_current_frame()[:3]), bytes((1, 2, 0)))
+		pizzoo.draw_pixels(coords, np.array([(0, 250, 0)]))
+		self.assertEqual(bytes(pizzoo.get_current_frame()[:3]), bytes((2, 2, 0)))
+		with self.assertRaises(ValueError):
+			pizzoo.draw_pixels(coords, np.array([(1, 1, 1), (2, 2, 2)]))
+
+class ClipTest(TestCase):
+	def setUp(self):
+		self.pizzoo = create_pizzoo()
+
+	def test_drawing_is_restricted_to_the_clip(self):
+		self.pizzoo.push_clip((10, 10), 5, 5)
+		self.pizzoo.draw_rectangle((0, 0), 64, 64, '#ffffff')
+		self.pizzoo.draw_pixel((2, 2), '#ffffff')
+		self.pizzoo.pop_clip()
+		self.assertEqual(drawn_pixels(self.pizzoo.get_current_frame()), {(x, y) for x in range(10, 15) for y in range(10, 15)})
+
+	def test_off_screen_and_out_of_clip_pixels_are_both_skipped(self):
+		self.pizzoo.push_clip((10, 10), 5, 5)
+		for xy in ((9, 12), (12, 15), (-1, 12), (64, 64)):
+			self.pizzoo.draw_pixel(xy, '#ffffff')
+		self.pizzoo.pop_clip()
+		self.assertEqual(drawn_pixels(self.pizzoo.get_current_frame()), set())
+
+	def test_nested_clips_intersect(self):
+		self.pizzoo.push_clip((0, 0), 10, 10)
+		self.pizzoo.push_clip((5, 5), 10, 10)
+		self.assertEqual(self.pizzoo.get_clip(), ((5, 5, 5, 5), (0, 0)))
+		self.pizzoo.pop_clip()
+		self.assertEqual(self.pizzoo.get_clip(), ((0, 0, 10, 10), (0, 0)))
+		self.pizzoo.pop_clip()
+		with self.assertRaises(ValueError):
+			self.pizzoo.pop_clip()
+
+	def test_translated_origin(self):
+		self.pizzoo.push_clip((20, 30), 10, 10, translate=True)
+		self.pizzoo.draw_pixel((1, 2), '#ffffff')
+		self.pizzoo.draw_rectangle((-5, 8), 20, 5, '#ffffff')
+		self.pizzoo.pop_clip()
+		expected = {(21, 32)} | {(x, y) for x in range(20, 30) for y in (38, 39)}
+		self.assertEqual(drawn_pixels(self.pizzoo.get_current_frame()), expected)
+
+	def test_clipped_line_keeps_the_same_pixels(self):
+		self.pizzoo.draw_line((0, 0), (63, 20), '#ffffff')
+		full = {(x, y) for x, y in drawn_pixels(self.pizzoo.get_current_frame()) if 10 <= x < 40}
+		self.pizzoo.cls()
+		self.pizzoo.push_clip((10, 0), 30, 64)
+		self.pizzoo.draw_line((0, 0), (63, 20), '#ffffff')
+		self.pizzoo.pop_clip()
+		self.assertEqual(drawn_pixels(self.pizzoo.get_current_frame()), full)
+
+	def test_clipped_shapes(self):
+		self.pizzoo.push_clip((32, 0), 32, 64)
+		self.pizzoo.draw_circle((32, 32), 5, '#ffffff')
+		self.pizzoo.draw_polygon([(20, 50), (40, 50), (30, 60)], '#ffffff')
+		self.pizzoo.pop_clip()
+		pixels = drawn_pixels(self.pizzoo.get_current_frame())
+		self.assertEqual(min(x for x, _ in pixels), 32)
+		self.assertIn((37, 32), pixels)
+
+	def test_template_sections_clip_their_children(self):
+		self.pizzoo.render_template('<pizzoo><section x="4" y="4" width="4" height="4"><rectangle x="0" y="0" width="20" height="20" color="#ffffff" /></section></pizzoo>')
+		frame = self.pizzoo.renderer.renders[-1][0][0]
+		self.assertEqual(drawn_pixels(frame), {(x, y) for x in range(4, 8) for y in range(4, 8)})
+
+class ImageTest(TestCase):
+	def setUp(self):
+		self.pizzoo = create_pizzoo()
+
+	def test_opaque_image_is_clipped(self):
+		self.pizzoo.draw_image(Image.new('RGB', (4, 4), (10, 20, 30)), (62, -2))
+		self.assertEqual(drawn_pixels(self.pizzoo.get_current_frame()), {(x, y) for x in (62, 63) for y in (0, 1)})
+		self.assertEqual(get_pixel(self.pizzoo.get_current_frame(), (63, 1)), (10, 20, 30))
+
+	def test_transparent_pixels_are_skipped(self):
+		image = Image.new('RGBA', (2, 1), (0, 0, 0, 0))
+		image.putpixel((1, 0), (200, 0, 0, 10))
+		self.pizzoo.cls('#0000ff')
+		self.pizzoo.draw_image(image, (0, 0))
+		self.assertEqual(get_pixel(self.pizzoo.get_current_frame(), (0, 0)), (0, 0, 255))
+		# Without blending any visible pixel is drawn opaque
+		self.assertEqual(get_pixel(self.pizzoo.get_current_frame(), (1, 0)), (200, 0, 0))
+
+	def test_blend_uses_the_alpha_channel(self):
+		self.pizzoo.cls('#000000')
+		self.pizzoo.draw_image(Image.new('RGBA', (1, 1), (200, 100, 0, 128)), (0, 0), blend=True)
+		red, green, _ = get_pixel(self.pizzoo.get_current_frame(), (0, 0))
+		self.assertTrue(95 <= red <= 105 and 45 <= green <= 55)
+
+class GifTest(TestCase):
+	colors = [(255, 0, 0), (0, 255, 0), (0, 0, 255)]
+
+	def setUp(self):
+		self.pizzoo = create_pizzoo()
+		self.directory = TemporaryDirectory()
+		self.path = join(self.directory.name, 'animation.gif')
+		frames = [Image.new('RGB', (4, 4), color) for color in self.colors]
+		frames[0].save(self.path, save_all=True, append_images=frames[1:], duration=100)
+
+	def tearDown(self):
+		self.pizzoo.clear_image_cache(self.path)
+		self.directory.cleanup()
+
+	def rendered_colors(self):
+		self.pizzoo.render()
+		return [get_pixel(frame, (0, 0)) for frame in self.pizzoo.renderer.renders[-1][0]]
+
+	def test_gif_starts_on_its_second_frame(self):
+		self.pizzoo.draw_gif(self.path)
+		self.assertEqual(self.rendered_colors(), self.colors[1:] + self.colors[:1])
+
+	def test_looped_gif_fills_the_buffer_from_the_cache(self):
+		self.pizzoo.draw_gif(self.path)
+		misses = self.pizzoo.get_image_cache_info()['misses']
+		self.pizzoo.reset_buffer()
+		self.pizzoo.draw_gif(self.path, loop=True)
+		self.assertEqual(self.pizzoo.get_image_cache_info()['misses'], misses)
+		self.assertEqual(self.rendered_colors(), (self.colors[1:] + self.colors[:1]) * 20)
+
+	def test_current_frame_is_restored_when_drawing_fails(self):
+		frame = self.pizzoo.get_current_frame()
+		blit = Pizzoo._Pizzoo__blit_image
+		calls = []
+		def failing_blit(pizzoo, *args):
+			calls.append(args)
+			if len(calls) == 2:
+				raise RuntimeError('blit failed')
+			blit(pizzoo, *args)
+		with patch.object(Pizzoo, '_Pizzoo__blit_image', failing_blit), self.assertRaises(RuntimeError):
+			self.pizzoo.draw_gif(self.path)
+		self.assertIs(self.pizzoo.get_current_frame(), frame)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,101 @@
+from time import perf_counter
+from unittest import IsolatedAsyncioTestCase, TestCase, main
+from pizzoo import Pizzoo, AsyncPixoo64Renderer
+from pizzoo.emulator import Pixoo64Emulator
+
+def draw_animation(pizzoo, frames):
+	for index in range(frames):
+		if index > 0:
+			pizzoo.add_frame()
+		pizzoo.draw_pixel((index, index), '#ffffff')
+
+class BatchingTest(TestCase):
+	def setUp(self):
+		self.emulator = Pixoo64Emulator()
+		self.emulator.start()
+
+	def tearDown(self):
+		self.emulator.stop()
+
+	def test_frames_are_sent_in_batches(self):
+		pizzoo = Pizzoo(self.emulator.address, renderer_params={'batch_size': 8})
+		draw_animation(pizzoo, 20)
+		pizzoo.render(frame_speed=100)
+		stats = self.emulator.get_stats()
+		self.assertEqual(stats['commands']['Draw/CommandList'], 3)
+		self.assertEqual(stats['commands']['Draw/SendHttpGif'], 20)
+		self.assertEqual(len(self.emulator.get_frames()), 20)
+		self.assertEqual(self.emulator.get_frame_speed(), 100)
+		self.assertEqual(self.emulator.get_image(19).getpixel((19, 19)), (255, 255, 255))
+
+	def test_commands_are_sent_in_batches(self):
+		pizzoo = Pizzoo(self.emulator.address)
+		with pizzoo.batch():
+			pizzoo.set_brightness(30)
+			pizzoo.switch(False)
+		self.assertEqual(self.emulator.get_stats()['commands']['Draw/CommandList'], 1)
+		self.assertEqual(self.emulator.get_settings(), {'Brightness': 30, 'LightSwitch': 0})
+
+class FallbackTest(TestCase):
+	def setUp(self):
+		self.emulator = Pixoo64Emulator(command_list=False)
+		self.emulator.start()
+
+	def tearDown(self):
+		self.emulator.stop()
+
+	def test_frames_fall_back_to_single_requests(self):
+		pizzoo = Pizzoo(self.emulator.address, renderer_params={'batch_size': 8})
+		draw_animation(pizzoo, 10)
+		pizzoo.render()
+		self.assertEqual(len(self.emulator.get_frames()), 10)
+		self.assertEqual(self.emulator.get_image(9).getpixel((9, 9)), (255, 255, 255))
+
+	def test_batching_is_disabled_after_repeated_failures(self):
+		pizzoo = Pizzoo(self.emulator.address, renderer_params={'batch_size': 8})
+		for _ in range(4):
+			draw_animation(pizzoo, 10)
+			pizzoo.render()
+		# Both batches of the first render and the first one of the second render are rejected, which disables batching
+		self.assertEqual(self.emulator.get_stats()['commands']['Draw/CommandList'], 3)
+		self.assertEqual(len(self.emulator.get_frames()), 10)
+
+	def test_commands_fall_back_to_single_requests(self):
+		pizzoo = Pizzoo(self.emulator.address)
+		with pizzoo.batch():
+			pizzoo.set_brightness(30)
+			pizzoo.switch(False)
+		self.assertEqual(self.emulator.get_settings(), {'Brightness': 30, 'LightSwitch': 0})
+
+class AsyncUploadTest(IsolatedAsyncioTestCase):
+	def setUp(self):
+		self.emulator = Pixoo64Emulator(latency=0.02)
+		self.emulator.start()
+
+	def tearDown(self):
+		self.emulator.stop()
+
+	async def test_animation_is_uploaded(self):
+		pizzoo = Pizzoo(self.emulator.address, renderer=AsyncPixoo64Renderer, renderer_params={'batch_size': 8})
+		draw_animation(pizzoo, 60)
+		start = perf_counter()
+		await pizzoo.render_async()
+		elapsed = perf_counter() - start
+		await pizzoo.renderer.close()
+		stats = self.emulator.get_stats()
+		self.assertEqual(len(self.emulator.get_frames()), 60)
+		self.assertEqual(self.emulator.get_image(59).getpixel((59, 59)), (255, 255, 255))
+		self.assertEqual(stats['commands']['Draw/CommandList'], 8)
+		# The emulator answers one request at a time, so concurrent batches still wait for each other
+		self.assertGreaterEqual(elapsed, stats['requests'] * 0.02)
+
+	async def test_template_is_rendered(self):
+		pizzoo = Pizzoo(self.emulator.address, renderer=AsyncPixoo64Renderer)
+		await pizzoo.render_template_async('<pizzoo brightness="40"><rectangle x="0" y="0" width="4" height="4" color="#ff0000"/><message x="0" y="10">hi</message></pizzoo>')
+		await pizzoo.renderer.close()
+		self.assertEqual(self.emulator.get_settings()['Brightness'], 40)
+		self.assertEqual(self.emulator.get_image(0).getpixel((1, 1)), (255, 0, 0))
+		self.assertEqual(len(self.emulator.get_items()), 1)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,323 @@
+import sys
+from unittest import TestCase, main
+from pizzoo import Pizzoo
+from tests.helpers import MemoryRenderer, create_pizzoo, get_pixel
+
+class FrameStorageTest(TestCase):
+	def setUp(self):
+		self.pizzoo = create_pizzoo()
+
+	def test_frames_are_flat_rgb_bytearrays(self):
+		frame = self.pizzoo.get_current_frame()
+		self.assertIsInstance(frame, bytearray)
+		self.assertEqual(len(frame), 64 * 64 * 3)
+
+	def test_cls_and_add_frame_fill_every_pixel(self):
+		self.pizzoo.cls('#102030')
+		self.pizzoo.add_frame((1, 2, 3))
+		self.pizzoo.render()
+		frames, _ = self.pizzoo.renderer.renders[-1]
+		self.assertEqual(frames[0], bytes((16, 32, 48)) * 64 * 64)
+		self.assertEqual(frames[1], bytes((1, 2, 3)) * 64 * 64)
+
+	def test_draw_pixel_writes_rgb_values(self):
+		self.pizzoo.draw_pixel((3, 5), '#ff8000')
+		self.assertEqual(get_pixel(self.pizzoo.get_current_frame(), (3, 5)), (255, 128, 0))
+		self.assertEqual(get_pixel(self.pizzoo.get_current_frame(), (4, 5)), (0, 0, 0))
+
+	def test_draw_pixel_does_not_call_other_python_functions(self):
+		# Drawing single pixels is the hottest path, so a cached color must not add any nested Python call
+		self.pizzoo.draw_pixel((0, 0), '#ff8000')
+		calls = []
+		sys.setprofile(lambda frame, event, arg: calls.append(frame.f_code.co_name) if event == 'call' else None)
+		try:
+			for x in range(10):
+				self.pizzoo.draw_pixel((x, 1), '#ff8000')
+		finally:
+			sys.setprofile(None)
+		self.assertEqual([name for name in calls if name != 'draw_pixel'], [])
+		self.assertEqual(len(calls), 10)
+
+	def test_draw_pixel_out_of_the_screen_is_skipped(self):
+		frame = bytes(self.pizzoo.get_current_frame())
+		for xy in ((0, 64), (64, 0), (-1, 5), (5, -1)):
+			self.pizzoo.draw_pixel(xy, '#ffffff')
+		self.assertEqual(bytes(self.pizzoo.get_current_frame()), frame)
+
+	def test_set_current_frame_checks_its_size(self):
+		self.pizzoo.set_current_frame(bytes(64 * 64 * 3))
+		with self.assertRaises(ValueError):
+			self.pizzoo.set_current_frame(bytes(64 * 64))
+
+	def test_render_resets_the_buffer(self):
+		self.pizzoo.add_frame()
+		self.pizzoo.render(frame_speed=100)
+		frames, frame_speed = self.pizzoo.renderer.renders[-1]
+		self.assertEqual((len(frames), frame_speed), (2, 100))
+		self.pizzoo.render()
+		self.assertEqual(len(self.pizzoo.renderer.renders[-1][0]), 1)
+
+class DirtyRectTest(TestCase):
+	def setUp(self):
+		self.pizzoo = create_pizzoo()
+		self.pizzoo.render()
+
+	def test_rendered_frame_is_clean(self):
+		self.assertFalse(self.pizzoo.is_dirty())
+		self.assertIsNone(self.pizzoo.get_dirty_rect())
+
+	def test_drawing_grows_the_dirty_rect(self):
+		self.pizzoo.draw_pixel((3, 4), '#ffffff')
+		self.assertEqual(self.pizzoo.get_dirty_rect(), (3, 4, 1, 1))
+		self.pizzoo.draw_pixel((1, 2), '#ffffff')
+		self.pizzoo.draw_pixel((2, 3), '#ffffff')
+		self.assertEqual(self.pizzoo.get_dirty_rect(), (1, 2, 3, 3))
+		self.pizzoo.draw_rectangle((60, 60), 10, 10, '#ffffff')
+		self.assertEqual(self.pizzoo.get_dirty_rect(), (1, 2, 63, 62))
+
+	def test_clipped_drawing_only_marks_the_screen(self):
+		self.pizzoo.draw_rectangle((-5, -5), 8, 8, '#ffffff')
+		self.assertEqual(self.pizzoo.get_dirty_rect(), (0, 0, 3, 3))
+		self.pizzoo.draw_rectangle((100, 100), 8, 8, '#ffffff')
+		self.assertEqual(self.pizzoo.get_dirty_rect(), (0, 0, 3, 3))
+
+	def test_black_clear_only_marks_what_was_rendered(self):
+		self.pizzoo.draw_rectangle((10, 12), 4, 2, '#ffffff')
+		self.pizzoo.render()
+		self.pizzoo.cls()
+		self.assertEqual(self.pizzoo.get_dirty_rect(), (10, 12, 4, 2))
+		self.pizzoo.cls('#ff0000')
+		self.assertEqual(self.pizzoo.get_dirty_rect(), (0, 0, 64, 64))
+
+	def test_new_frames_are_fully_dirty(self):
+		self.pizzoo.add_frame()
+		self.assertEqual(self.pizzoo.get_dirty_rect(1), (0, 0, 64, 64))
+		self.assertIsNone(self.pizzoo.get_dirty_rect(0))
+
+	def test_direct_frame_access_marks_the_whole_frame(self):
+		self.pizzoo.get_current_frame()
+		self.assertEqual(self.pizzoo.get_dirty_rect(), (0, 0, 64, 64))
+
+class FrameCopyTest(TestCase):
+	def setUp(self):
+		self.pizzoo = create_pizzoo()
+
+	def test_copy_frame_appends_a_copy(self):
+		self.pizzoo.draw_pixel((1, 1), '#ff0000')
+		self.pizzoo.render()
+		self.pizzoo.draw_pixel((1, 1), '#ff0000')
+		self.pizzoo.copy_frame(0)
+		self.pizzoo.draw_pixel((2, 2), '#00ff00')
+		self.pizzoo.render()
+		frames = self.pizzoo.renderer.renders[-1][0]
+		self.assertEqual(get_pixel(frames[1], (1, 1)), (255, 0, 0))
+		self.assertEqual(get_pixel(frames[0], (2, 2)), (0, 0, 0))
+
+	def test_copy_of_the_previous_frame_is_clean(self):
+		self.pizzoo.copy_frame(0)
+		self.assertIsNone(self.pizzoo.get_dirty_rect(1))
+
+	def test_overwritten_frame_marks_the_next_one(self):
+		self.pizzoo.cls('#ff0000')
+		self.pizzoo.add_frame('#00ff00')
+		self.pizzoo.add_frame('#0000ff')
+		self.pizzoo.copy_frame(1, 2)
+		self.pizzoo.copy_frame(0, 1)
+		rects = [self.pizzoo.get_dirty_rect(index) for index in range(3)]
+		# Frame 2 was compared with the old frame 1, so it has to be fully dirty again
+		self.assertEqual(rects, [(0, 0, 64, 64), None, (0, 0, 64, 64)])
+		self.pizzoo.copy_frame(2, 0)
+		self.assertEqual(self.pizzoo.get_dirty_rect(1), (0, 0, 64, 64))
+
+	def test_invalid_frame_indexes_raise(self):
+		with self.assertRaises(ValueError):
+			self.pizzoo.copy_frame(1)
+		with self.assertRaises(ValueError):
+			self.pizzoo.copy_frame(0, 3)
+
+	def test_blit_a_region(self):
+		self.pizzoo.draw_rectangle((0, 0), 2, 2, '#ff0000')
+		self.pizzoo.add_frame()
+		self.pizzoo.blit(0, (0, 0, 4, 4), (10, 10))
+		self.assertEqual(get_pixel(self.pizzoo.get_current_frame(), (11, 11)), (255, 0, 0))
+		self.assertEqual(get_pixel(self.pizzoo.get_current_frame(), (12, 12)), (0, 0, 0))
+
+	def test_overlapping_blit_on_the_same_frame(self):
+		for x in range(64):
+			self.pizzoo.draw_pixel((x, 0), (x, 0, 0))
+		# Scroll the first row one pixel to the right
+		self.pizzoo.blit(0, (0, 0, 63, 1), (1, 0))
+		frame = self.pizzoo.get_current_frame()
+		self.assertEqual([get_pixel(frame, (x, 0))[0] for x in range(64)], [0] + list(range(63)))
+
+	def test_blit_from_a_hidden_layer_skips_transparent_pixels(self):
+		self.pizzoo.add_layer('sprite', visible=False)
+		self.pizzoo.select_layer('sprite')
+		self.pizzoo.draw_pixel((0, 0), '#00ff00')
+		self.pizzoo.select_layer()
+		self.pizzoo.cls('#0000ff')
+		self.pizzoo.blit('sprite', (0, 0, 2, 1), (5, 5))
+		frame = self.pizzoo.get_current_frame()
+		self.assertEqual((get_pixel(frame, (5, 5)), get_pixel(frame, (6, 5))), ((0, 255, 0), (0, 0, 255)))
+
+	def test_blit_is_clipped(self):
+		self.pizzoo.draw_rectangle((0, 0), 8, 8, '#ffffff')
+		self.pizzoo.add_frame()
+		self.pizzoo.push_clip((60, 60))
+		self.pizzoo.blit(0, None, (58, 58))
+		self.pizzoo.pop_clip()
+		frame = self.pizzoo.get_current_frame()
+		self.assertEqual(get_pixel(frame, (59, 59)), (0, 0, 0))
+		self.assertEqual(get_pixel(frame, (63, 63)), (255, 255, 255))
+
+class SharedFramesTest(TestCase):
+	def setUp(self):
+		self.pizzoo = create_pizzoo()
+
+	def test_identical_frames_share_storage(self):
+		self.pizzoo.draw_pixel((1, 1), '#ff0000')
+		self.pizzoo.add_frame()
+		self.pizzoo.draw_pixel((1, 1), '#ff0000')
+		self.pizzoo.add_frame('#00ff00')
+		self.assertEqual(self.pizzoo.get_duplicate_frames(), [0, 0, 2])
+
+	def test_renderers_get_the_same_object(self):
+		buffers = []
+		self.pizzoo.renderer.render = lambda buffer, frame_speed: buffers.append(list(buffer))
+		self.pizzoo.copy_frame(0)
+		self.pizzoo.render()
+		self.assertIs(buffers[0][0], buffers[0][1])
+
+	def test_writes_copy_shared_frames(self):
+		self.pizzoo.copy_frame(0)
+		self.pizzoo.draw_pixel((1, 1), '#ff0000')
+		self.pizzoo.draw_rectangle((5, 5), 2, 2, '#ff0000')
+		self.pizzoo.render()
+		first, second = self.pizzoo.renderer.renders[-1][0]
+		self.assertEqual(first, bytes(64 * 64 * 3))
+		self.assertEqual(get_pixel(second, (1, 1)), (255, 0, 0))
+		self.assertEqual(get_pixel(second, (5, 5)), (255, 0, 0))
+
+	def test_direct_frame_access_unshares_the_frame(self):
+		self.pizzoo.copy_frame(0)
+		self.pizzoo.get_current_frame()[0] = 255
+		self.assertEqual(self.pizzoo.get_duplicate_frames(), [0, 1])
+
+	def test_shared_frames_stay_tracked_after_a_failed_render(self):
+		self.pizzoo.add_layer('top')
+		self.pizzoo.select_layer('top')
+		self.pizzoo.draw_pixel((0, 0), '#ffffff')
+		self.pizzoo.select_layer()
+		self.pizzoo.copy_frame(0)
+		self.pizzoo.renderer.render = lambda buffer, frame_speed: 1 / 0
+		with self.assertRaises(ZeroDivisionError):
+			self.pizzoo.render()
+		del self.pizzoo.renderer.render
+		self.pizzoo.draw_pixel((5, 5), '#ff0000')
+		self.pizzoo.render()
+		first, second = self.pizzoo.renderer.renders[-1][0]
+		self.assertEqual(get_pixel(first, (5, 5)), (0, 0, 0))
+		self.assertEqual(get_pixel(second, (5, 5)), (255, 0, 0))
+
+class PaletteTest(TestCase):
+	palette = ['#000000', '#ff0000', '#00ff00', '#0000ff']
+
+	def setUp(self):
+		self.pizzoo = create_pizzoo(palette=self.palette)
+
+	def rendered_frame(self):
+		self.pizzoo.render()
+		return self.pizzoo.renderer.renders[-1][0][0]
+
+	def test_frames_store_palette_indexes(self):
+		self.pizzoo.draw_pixel((0, 0), 2)
+		self.pizzoo.draw_rectangle((1, 0), 2, 1, '#fe0101')
+		self.assertEqual(len(self.pizzoo.get_current_frame()), 64 * 64)
+		self.assertEqual(bytes(self.pizzoo.get_current_frame()[:4]), bytes((2, 1, 1, 0)))
+		frame = self.rendered_frame()
+		self.assertEqual(len(frame), 64 * 64 * 3)
+		self.assertEqual([get_pixel(frame, (x, 0)) for x in range(3)], [(0, 255, 0), (255, 0, 0), (255, 0, 0)])
+
+	def test_set_palette_recolors_the_buffer(self):
+		self.pizzoo.draw_pixel((0, 0), 1)
+		self.pizzoo.set_palette_color(1, '#ffffff')
+		self.assertEqual(get_pixel(self.rendered_frame(), (0, 0)), (255, 255, 255))
+
+	def test_colors_are_mapped_with_the_new_palette(self):
+		self.pizzoo.draw_pixel((0, 0), '#ffffff')
+		self.pizzoo.set_palette(['#000000', '#ffffff'])
+		self.pizzoo.draw_pixel((1, 0), '#ffffff')
+		self.assertEqual(bytes(self.pizzoo.get_current_frame()[:2]), bytes((1, 1)))
+
+	def test_integer_text_and_layer_colors_are_palette_indexes(self):
+		self.pizzoo.draw_text('I', (0, 0), color=3)
+		self.pizzoo.add_layer('top')
+		self.pizzoo.select_layer('top')
+		self.pizzoo.draw_pixel((20, 20), 2)
+		self.pizzoo.select_layer()
+		frame = self.rendered_frame()
+		self.assertIn((0, 0, 255), {get_pixel(frame, (x, y)) for x in range(8) for y in range(8)})
+		self.assertEqual(get_pixel(frame, (20, 20)), (0, 255, 0))
+
+	def test_layers_are_quantized_to_the_palette(self):
+		self.pizzoo.add_layer('top', opacity=0.9)
+		self.pizzoo.select_layer('top')
+		self.pizzoo.draw_pixel((0, 0), '#0000ff')
+		self.pizzoo.select_layer()
+		self.assertEqual(get_pixel(self.rendered_frame(), (0, 0)), (0, 0, 255))
+
+	def test_invalid_palettes_and_indexes_raise(self):
+		with self.assertRaises(ValueError):
+			self.pizzoo.draw_pixel((0, 0), 4)
+		with self.assertRaises(ValueError):
+			self.pizzoo.set_palette([])
+		with self.assertRaises(ValueError):
+			create_pizzoo().set_palette(self.palette)
+
+class KeepingRenderer(MemoryRenderer):
+	_keeps_frames = True
+
+class FrameRecyclingTest(TestCase):
+	def setUp(self):
+		self.pizzoo = create_pizzoo()
+
+	def render_frames(self, pizzoo):
+		pizzoo.cls('#ff0000')
+		first = pizzoo.get_current_frame()
+		pizzoo.add_frame('#00ff00')
+		frames = [first, pizzoo.get_current_frame()]
+		pizzoo.render()
+		return frames
+
+	def test_rendered_frames_are_reused(self):
+		frames = self.render_frames(self.pizzoo)
+		self.pizzoo.add_frame()
+		self.assertTrue(any(self.pizzoo.get_current_frame() is frame for frame in frames))
+
+	def test_reused_frames_are_filled(self):
+		self.render_frames(self.pizzoo)
+		self.pizzoo.cls('#0000ff')
+		self.pizzoo.add_frame('#ffffff')
+		self.pizzoo.render()
+		frames, _ = self.pizzoo.renderer.renders[-1]
+		self.assertEqual(frames, [bytes((0, 0, 255)) * 64 * 64, bytes((255, 255, 255)) * 64 * 64])
+		# What was rendered before is not changed, as renderers copy it
+		self.assertEqual(self.pizzoo.renderer.renders[0][0][0], bytes((255, 0, 0)) * 64 * 64)
+
+	def test_frames_are_not_reused_if_a_renderer_keeps_them(self):
+		pizzoo = Pizzoo('memory', renderer=KeepingRenderer)
+		frames = self.render_frames(pizzoo)
+		pizzoo.add_frame()
+		self.assertFalse(any(pizzoo.get_current_frame() is frame for frame in frames))
+		self.assertEqual(pizzoo.renderer.renders[0][0][1], bytes((0, 255, 0)) * 64 * 64)
+
+	def test_failed_renders_keep_the_buffer(self):
+		pizzoo = create_pizzoo()
+		pizzoo.cls('#ff0000')
+		pizzoo.renderer.render = lambda buffer, frame_speed: 1 / 0
+		with self.assertRaises(ZeroDivisionError):
+			pizzoo.render()
+		self.assertEqual(get_pixel(pizzoo.get_current_frame(), (0, 0)), (255, 0, 0))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,84 @@
+from unittest import TestCase, main
+from tests.helpers import create_pizzoo, get_pixel
+
+class LayerTest(TestCase):
+	def setUp(self):
+		self.pizzoo = create_pizzoo()
+		self.pizzoo.cls((200, 100, 50))
+
+	def rendered_pixel(self, xy=(0, 0)):
+		self.pizzoo.render()
+		return get_pixel(self.pizzoo.renderer.renders[-1][0][0], xy)
+
+	def draw_on_layer(self, name, color, **params):
+		self.pizzoo.add_layer(name, **params)
+		self.pizzoo.select_layer(name)
+		self.pizzoo.draw_rectangle((0, 0), 2, 2, color)
+		self.pizzoo.select_layer()
+
+	def test_normal_layer_covers_the_frame(self):
+		self.draw_on_layer('top', '#00ff00')
+		self.assertEqual(self.rendered_pixel(), (0, 255, 0))
+		self.assertEqual(self.rendered_pixel((5, 5)), (0, 0, 0))
+
+	def test_multiply_and_add_blend_with_the_frame(self):
+		self.draw_on_layer('shade', (128, 128, 128), blend='multiply')
+		red, green, blue = self.rendered_pixel()
+		self.assertTrue(abs(red - 100) <= 1 and abs(green - 50) <= 1 and abs(blue - 25) <= 1)
+		self.pizzoo.update_layer('shade', blend='add')
+		self.pizzoo.cls((200, 100, 50))
+		self.assertEqual(self.rendered_pixel(), (255, 228, 178))
+
+	def test_opacity_visibility_and_offset(self):
+		self.draw_on_layer('top', '#ffffff', opacity=0.5)
+		self.pizzoo.cls('#000000')
+		self.assertTrue(120 <= self.rendered_pixel()[0] <= 135)
+		self.pizzoo.update_layer('top', visible=False)
+		self.assertEqual(self.rendered_pixel(), (0, 0, 0))
+		self.pizzoo.update_layer('top', visible=True, opacity=1, xy=(10, 10))
+		self.assertEqual(self.rendered_pixel(), (0, 0, 0))
+		self.assertEqual(self.rendered_pixel((11, 11)), (255, 255, 255))
+
+	def test_higher_layers_are_drawn_on_top(self):
+		self.draw_on_layer('top', '#0000ff', z=2)
+		self.draw_on_layer('bottom', '#ff0000', z=1)
+		self.assertEqual(self.rendered_pixel(), (0, 0, 255))
+
+	def test_buffer_is_left_untouched(self):
+		self.draw_on_layer('top', '#00ff00', opacity=0.5)
+		frame = bytes(self.pizzoo.get_current_frame())
+		renders = self.pizzoo.renderer.renders
+		self.pizzoo.renderer.render = lambda buffer, frame_speed: renders.append(([bytes(frame) for frame in buffer], frame_speed)) or 1 / 0
+		with self.assertRaises(ZeroDivisionError):
+			self.pizzoo.render()
+		self.assertEqual(bytes(self.pizzoo.get_current_frame()), frame)
+		# Retrying after a failed render gives the same result instead of blending the layer twice
+		del self.pizzoo.renderer.render
+		self.pizzoo.render()
+		self.assertEqual(renders[-1], renders[-2])
+
+	def test_draw_pixel_on_a_layer(self):
+		self.pizzoo.add_layer('top')
+		self.pizzoo.select_layer('top')
+		self.pizzoo.draw_pixel((3, 3), '#ffffff')
+		self.assertEqual(self.pizzoo.get_layer('top').data[(3 + 3 * 64) * 4:(4 + 3 * 64) * 4], b'\xff\xff\xff\xff')
+		self.assertEqual(get_pixel(self.pizzoo.get_current_frame(), (3, 3)), (200, 100, 50))
+
+	def test_layers_are_kept_between_renders(self):
+		self.draw_on_layer('top', '#00ff00')
+		self.pizzoo.render()
+		self.assertEqual(self.rendered_pixel(), (0, 255, 0))
+		self.pizzoo.clear_layer('top')
+		self.assertEqual(self.rendered_pixel(), (0, 0, 0))
+
+	def test_layer_errors(self):
+		self.pizzoo.add_layer('top')
+		with self.assertRaises(ValueError):
+			self.pizzoo.add_layer('top')
+		with self.assertRaises(ValueError):
+			self.pizzoo.select_layer('missing')
+		with self.assertRaises(ValueError):
+			self.pizzoo.add_layer('other', blend='screen')
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,266 @@
+from asyncio import run
+from base64 import b64decode
+from unittest import TestCase, main
+from requests.exceptions import Timeout
+from pizzoo import Pizzoo, AsyncPixoo64Renderer, CommandBatchError
+from tests.helpers import FakePixoo64
+
+class Pixoo64RendererTest(TestCase):
+	def setUp(self):
+		self.device = FakePixoo64()
+		self.pizzoo = Pizzoo(self.device.address)
+
+	def tearDown(self):
+		self.pizzoo.renderer.close()
+		self.device.close()
+
+	def test_frames_are_sent_to_the_device(self):
+		self.pizzoo.draw_pixel((0, 0), '#ff0000')
+		self.pizzoo.add_frame('#00ff00')
+		self.pizzoo.render(frame_speed=100)
+		frames = self.device.get_commands('Draw/SendHttpGif')
+		self.assertEqual([(frame['PicNum'], frame['PicOffset'], frame['PicSpeed']) for frame in frames], [(2, 0, 100), (2, 1, 100)])
+		self.assertEqual(b64decode(frames[0]['PicData'])[:6], bytes((255, 0, 0, 0, 0, 0)))
+		self.assertEqual(b64decode(frames[1]['PicData']), bytes((0, 255, 0)) * 64 * 64)
+
+	def test_requests_reuse_the_connection(self):
+		for _ in range(3):
+			self.pizzoo.render()
+		self.pizzoo.set_brightness(50)
+		stats = self.pizzoo.renderer.get_connection_stats()
+		self.assertEqual(stats['connections'], 1)
+		self.assertEqual(stats['requests'], len(self.device.commands))
+		self.assertEqual(stats['reused'], stats['requests'] - 1)
+
+	def test_device_errors_raise(self):
+		self.device.replies['Channel/SetBrightness'] = {'error_code': 1}
+		with self.assertRaises(Exception):
+			self.pizzoo.set_brightness(50)
+
+	def test_requests_time_out(self):
+		pizzoo = Pizzoo(self.device.address, renderer_params={'timeout': 0.2})
+		self.device.delay = 0.5
+		try:
+			with self.assertRaises(Timeout):
+				pizzoo.set_brightness(50)
+		finally:
+			self.device.delay = 0
+			pizzoo.renderer.close()
+
+class FrameBatchTest(TestCase):
+	def setUp(self):
+		self.device = FakePixoo64()
+
+	def tearDown(self):
+		self.device.close()
+
+	def render(self, frames, **renderer_params):
+		pizzoo = Pizzoo(self.device.address, renderer_params=renderer_params)
+		try:
+			for _ in range(frames - 1):
+				pizzoo.add_frame()
+			pizzoo.render()
+		finally:
+			pizzoo.renderer.close()
+		return pizzoo
+
+	def test_frames_are_sent_in_batches(self):
+		self.render(20)
+		batches = self.device.get_commands('Draw/CommandList')
+		self.assertEqual([len(batch['CommandList']) for batch in batches], [8, 8, 4])
+		self.assertEqual([frame['PicOffset'] for frame in self.device.get_commands('Draw/SendHttpGif')], list(range(20)))
+
+	def test_batch_size_of_one_sends_single_frames(self):
+		self.render(3, batch_size=1)
+		self.assertEqual(self.device.get_commands('Draw/CommandList'), [])
+		self.assertEqual(len(self.device.get_commands('Draw/SendHttpGif')), 3)
+
+	def test_rejected_batch_is_sent_frame_by_frame(self):
+		self.device.replies['Draw/CommandList'] = {'error_code': 1}
+		self.render(3)
+		single = [command for command in self.device.commands if command['Command'] == 'Draw/SendHttpGif']
+		self.assertEqual([frame['PicOffset'] for frame in single], [0, 1, 2])
+
+	def test_invalid_reply_is_sent_frame_by_frame(self):
+		self.device.replies['Draw/CommandList'] = b'not json'
+		self.render(3)
+		single = [command for command in self.device.commands if command['Command'] == 'Draw/SendHttpGif']
+		self.assertEqual(len(single), 3)
+
+	def test_batching_is_disabled_after_repeated_failures(self):
+		self.device.replies['Draw/CommandList'] = {'error_code': 1}
+		# Every batch of 2 frames fails, so the third one disables batching for the last
+		self.render(8, batch_size=2)
+		self.assertEqual(len(self.device.get_commands('Draw/CommandList')), 3)
+		self.assertEqual(len([command for command in self.device.commands if command['Command'] == 'Draw/SendHttpGif']), 8)
+
+	def test_successful_batch_resets_the_failures(self):
+		pizzoo = Pizzoo(self.device.address, renderer_params={'batch_size': 2})
+		pizzoo.add_frame()
+		try:
+			for reply in ({'error_code': 1}, {'error_code': 1}, None, {'error_code': 1}, {'error_code': 1}, None):
+				if reply is None:
+					self.device.replies.pop('Draw/CommandList', None)
+				else:
+					self.device.replies['Draw/CommandList'] = reply
+				pizzoo.render(force=True)
+				pizzoo.add_frame()
+		finally:
+			pizzoo.renderer.close()
+		self.assertEqual(len(self.device.get_commands('Draw/CommandList')), 6)
+
+	def test_connection_errors_are_not_retried(self):
+		pizzoo = Pizzoo(self.device.address, renderer_params={'timeout': 0.2})
+		pizzoo.add_frame()
+		self.device.delay = 0.5
+		try:
+			with self.assertRaises(Timeout):
+				pizzoo.render()
+		finally:
+			self.device.delay = 0
+			pizzoo.renderer.close()
+		self.assertEqual([command['Command'] for command in self.device.commands], ['Draw/GetHttpGifId', 'Draw/CommandList'])
+
+class AsyncPixoo64RendererTest(TestCase):
+	def setUp(self):
+		self.device = FakePixoo64()
+		self.pizzoo = Pizzoo(self.device.address, renderer=AsyncPixoo64Renderer)
+
+	def tearDown(self):
+		self.device.close()
+
+	def test_frames_are_sent_from_the_loop(self):
+		async def render():
+			for _ in range(9):
+				self.pizzoo.add_frame('#ff0000')
+			await self.pizzoo.render_async(frame_speed=100)
+			await self.pizzoo.renderer.close()
+		run(render())
+		frames = self.device.get_commands('Draw/SendHttpGif')
+		self.assertEqual(sorted(frame['PicOffset'] for frame in frames), list(range(10)))
+		self.assertEqual([len(batch['CommandList']) for batch in self.device.get_commands('Draw/CommandList')], [8, 2])
+		# The first batch is sent before the rest, so the device starts the new animation
+		self.assertEqual(self.device.commands[1]['CommandList'][0]['PicOffset'], 0)
+
+	def test_templates_await_the_device_commands(self):
+		async def render():
+			await self.pizzoo.render_template_async('<pizzoo brightness="50"><time x="0" y="0" /></pizzoo>')
+			await self.pizzoo.renderer.close()
+		run(render())
+		names = [command['Command'] for command in self.device.commands]
+		self.assertLess(names.index('Channel/SetBrightness'), names.index('Draw/SendHttpGif'))
+		self.assertLess(names.index('Draw/SendHttpGif'), names.index('Draw/SendHttpItemList'))
+
+	def test_sync_render_closes_its_connections(self):
+		self.pizzoo.render()
+		self.pizzoo.render()
+		# Every render runs on its own loop, whose connections can not be reused by the next one
+		self.assertEqual(self.pizzoo.renderer.get_connection_stats()['connections'], 2)
+		self.assertEqual(len(self.device.get_commands('Draw/SendHttpGif')), 2)
+
+	def test_sync_render_fails_inside_a_running_loop(self):
+		async def render():
+			self.pizzoo.render()
+		with self.assertRaises(RuntimeError):
+			run(render())
+		self.assertEqual(self.device.get_commands('Draw/SendHttpGif'), [])
+
+class CommandBatchTest(TestCase):
+	def setUp(self):
+		self.device = FakePixoo64()
+		self.pizzoo = Pizzoo(self.device.address)
+
+	def tearDown(self):
+		self.pizzoo.close()
+		self.device.close()
+
+	def names(self):
+		# The picture id request of the renderer is left out
+		return [command['Command'] for command in self.device.commands[1:]]
+
+	def test_commands_are_sent_together(self):
+		with self.pizzoo.batch():
+			self.pizzoo.set_brightness(50)
+			self.pizzoo.buzzer()
+			self.assertEqual(self.names(), [])
+		self.assertEqual(self.names(), ['Draw/CommandList'])
+		self.assertEqual([command['Command'] for command in self.device.commands[1]['CommandList']], ['Channel/SetBrightness', 'Device/PlayBuzzer'])
+
+	def test_single_command_is_sent_on_its_own(self):
+		with self.pizzoo.batch():
+			self.pizzoo.set_brightness(50)
+		self.assertEqual(self.names(), ['Channel/SetBrightness'])
+
+	def test_nested_batches_are_sent_with_the_outermost(self):
+		with self.pizzoo.batch():
+			self.pizzoo.set_brightness(50)
+			with self.pizzoo.batch():
+				self.pizzoo.buzzer()
+			self.assertEqual(self.names(), [])
+		self.assertEqual(self.names(), ['Draw/CommandList'])
+
+	def test_errors_inside_the_block_discard_the_commands(self):
+		with self.assertRaises(ZeroDivisionError):
+			with self.pizzoo.batch():
+				self.pizzoo.set_brightness(50)
+				1 / 0
+		self.assertEqual(self.names(), [])
+
+	def test_render_sends_the_queued_commands_first(self):
+		with self.pizzoo.batch():
+			self.pizzoo.set_brightness(50)
+			self.pizzoo.switch(True)
+			self.pizzoo.render()
+			self.pizzoo.buzzer()
+		self.assertEqual(self.names(), ['Draw/CommandList', 'Draw/SendHttpGif', 'Device/PlayBuzzer'])
+
+	def test_rejected_batch_reports_every_failed_command(self):
+		self.device.replies['Draw/CommandList'] = {'error_code': 1}
+		self.device.replies['Device/PlayBuzzer'] = {'error_code': 2}
+		with self.assertRaises(CommandBatchError) as context:
+			with self.pizzoo.batch():
+				self.pizzoo.buzzer()
+				self.pizzoo.set_brightness(50)
+		self.assertEqual([command for command, _ in context.exception.errors], ['Device/PlayBuzzer'])
+		self.assertEqual(self.names(), ['Draw/CommandList', 'Device/PlayBuzzer', 'Channel/SetBrightness'])
+
+	def test_invalid_reply_sends_the_commands_one_by_one(self):
+		self.device.replies['Draw/CommandList'] = b'not json'
+		with self.pizzoo.batch():
+			self.pizzoo.set_brightness(50)
+			self.pizzoo.buzzer()
+		self.assertEqual(self.names(), ['Draw/CommandList', 'Channel/SetBrightness', 'Device/PlayBuzzer'])
+
+	def test_connection_errors_are_raised(self):
+		pizzoo = Pizzoo(self.device.address, renderer_params={'timeout': 0.2})
+		self.device.delay = 0.5
+		try:
+			with self.assertRaises(Timeout):
+				with pizzoo.batch():
+					pizzoo.set_brightness(50)
+					pizzoo.buzzer()
+		finally:
+			self.device.delay = 0
+			pizzoo.close()
+		self.assertEqual(self.names()[-1], 'Draw/CommandList')
+		self.assertEqual(self.device.get_commands('Channel/SetBrightness'), self.device.commands[-1]['CommandList'][:1])
+
+	def test_template_root_options_are_sent_together(self):
+		self.pizzoo.render_template('<pizzoo brightness="50" turnOn="true"></pizzoo>')
+		self.assertEqual(self.names(), ['Draw/CommandList', 'Draw/SendHttpGif'])
+
+	def test_background_renders_do_not_send_the_batch(self):
+		pizzoo = Pizzoo(self.device.address, background_render=True)
+		try:
+			with pizzoo.batch():
+				pizzoo.set_brightness(50)
+				pizzoo.buzzer()
+				pizzoo.render()
+				pizzoo.wait_render(5)
+				self.assertEqual(self.device.get_commands('Draw/CommandList'), [])
+		finally:
+			pizzoo.close()
+		self.assertEqual(len(self.device.get_commands('Draw/CommandList')), 1)
+
+if __name__ == '__main__':
+	main()
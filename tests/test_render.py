@@ -0,0 +1,229 @@
+from unittest import TestCase, main
+from threading import Event, Timer, current_thread, main_thread
+from pizzoo import Pizzoo, WindowRenderer
+from tests.helpers import MemoryRenderer, create_pizzoo
+
+class SkipUnchangedTest(TestCase):
+	def setUp(self):
+		self.pizzoo = create_pizzoo(skip_unchanged=True)
+
+	def draw(self, color='#ff0000'):
+		self.pizzoo.draw_rectangle((0, 0), 4, 4, color)
+
+	def test_same_buffer_is_rendered_once(self):
+		self.draw()
+		self.pizzoo.render()
+		self.draw()
+		self.pizzoo.render()
+		self.assertEqual(len(self.pizzoo.renderer.renders), 1)
+		self.assertEqual(self.pizzoo.renderer.get_skipped_renders(), 1)
+
+	def test_changed_buffer_or_frame_speed_is_rendered(self):
+		self.draw()
+		self.pizzoo.render()
+		self.draw('#00ff00')
+		self.pizzoo.render()
+		self.draw('#00ff00')
+		self.pizzoo.render(frame_speed=100)
+		self.assertEqual(len(self.pizzoo.renderer.renders), 3)
+
+	def test_force(self):
+		self.pizzoo.render()
+		self.pizzoo.render(force=True)
+		self.assertEqual(len(self.pizzoo.renderer.renders), 2)
+
+	def test_disabled_by_default(self):
+		pizzoo = create_pizzoo()
+		pizzoo.render()
+		pizzoo.render()
+		self.assertEqual(len(pizzoo.renderer.renders), 2)
+
+class FailingRenderer(MemoryRenderer):
+	def render(self, buffer, frame_speed):
+		raise ConnectionError('device unreachable')
+
+class SmallRenderer(MemoryRenderer):
+	def __init__(self, address, pizzoo, debug):
+		super().__init__(address, pizzoo, debug)
+		self._size = 16
+
+class ThreadRecordingRenderer(MemoryRenderer):
+	def render(self, buffer, frame_speed):
+		self.thread = current_thread()
+		super().render(buffer, frame_speed)
+
+class MultipleRenderersTest(TestCase):
+	def setUp(self):
+		self.pizzoo = create_pizzoo()
+
+	def test_instances_have_their_own_buffer(self):
+		other = create_pizzoo()
+		self.pizzoo.draw_pixel((0, 0), '#ffffff')
+		self.assertEqual(other.get_current_frame()[:3], b'\x00\x00\x00')
+
+	def test_every_renderer_gets_the_buffer(self):
+		extra = self.pizzoo.add_renderer('other', MemoryRenderer)
+		self.pizzoo.draw_pixel((0, 0), '#ffffff')
+		self.pizzoo.render()
+		self.assertEqual(extra.renders, self.pizzoo.renderer.renders)
+		self.assertEqual(self.pizzoo.get_renderers(), [self.pizzoo.renderer, extra])
+
+	def test_main_renderer_runs_on_the_calling_thread(self):
+		pizzoo = Pizzoo('main', renderer=ThreadRecordingRenderer)
+		extra = pizzoo.add_renderer('other', ThreadRecordingRenderer)
+		pizzoo.render()
+		self.assertIs(pizzoo.renderer.thread, main_thread())
+		self.assertIsNot(extra.thread, main_thread())
+
+	def test_errors_are_raised_once_every_renderer_finished(self):
+		self.pizzoo.add_renderer('failing', FailingRenderer)
+		extra = self.pizzoo.add_renderer('other', MemoryRenderer)
+		with self.assertRaises(ConnectionError):
+			self.pizzoo.render()
+		self.assertEqual(len(extra.renders), 1)
+		self.assertEqual(len(self.pizzoo.renderer.renders), 1)
+
+	def test_removed_renderers_are_not_rendered(self):
+		extra = self.pizzoo.add_renderer('other', MemoryRenderer)
+		self.pizzoo.remove_renderer(extra)
+		self.pizzoo.render()
+		self.assertEqual(extra.renders, [])
+
+	def test_renderers_must_have_the_same_size(self):
+		with self.assertRaises(ValueError):
+			self.pizzoo.add_renderer('small', SmallRenderer)
+
+class BlockingRenderer(MemoryRenderer):
+	def __init__(self, address, pizzoo, debug):
+		'''
+		A renderer that waits for the test to release it before every render, keeping the dirty rectangle it saw and the order of renders and template items.
+		'''
+		super().__init__(address, pizzoo, debug)
+		self.release = Event()
+		self.release.set()
+		self.started = Event()
+		self.dirty_rects = []
+		self.events = []
+
+	def render(self, buffer, frame_speed):
+		self.started.set()
+		self.release.wait(5)
+		self.dirty_rects.append(self._pizzoo.get_dirty_rect(0))
+		self.events.append('render')
+		super().render(buffer, frame_speed)
+
+	def compile_node(self, node, parent, inherited_props, node_props):
+		return ('item', {}) if node.tag == 'item' else None
+
+	def render_template_items(self, items, use_cache=True):
+		self.events.append('items')
+
+class NotThreadSafeRenderer(MemoryRenderer):
+	_thread_safe = False
+
+class BackgroundRenderTest(TestCase):
+	def setUp(self):
+		self.pizzoo = Pizzoo('memory', renderer=BlockingRenderer, background_render=True)
+		self.renderer = self.pizzoo.renderer
+
+	def tearDown(self):
+		self.renderer.release.set()
+		self.pizzoo.close()
+
+	def block(self):
+		self.renderer.release.clear()
+		self.renderer.started.clear()
+
+	def test_render_does_not_wait_for_the_device(self):
+		self.block()
+		self.pizzoo.render()
+		self.assertTrue(self.renderer.started.wait(5))
+		self.assertEqual(self.renderer.renders, [])
+		self.renderer.release.set()
+		self.assertTrue(self.pizzoo.wait_render(5))
+		self.assertEqual(len(self.renderer.renders), 1)
+
+	def test_only_the_latest_pending_buffer_is_rendered(self):
+		self.block()
+		self.pizzoo.render()
+		self.renderer.started.wait(5)
+		self.pizzoo.cls('#ff0000')
+		self.pizzoo.render()
+		self.pizzoo.cls('#00ff00')
+		self.pizzoo.render()
+		self.renderer.release.set()
+		self.pizzoo.wait_render(5)
+		self.assertEqual(len(self.renderer.renders), 2)
+		self.assertEqual(self.renderer.renders[1][0][0][:3], bytes((0, 255, 0)))
+		stats = self.pizzoo.get_render_stats()
+		self.assertEqual((stats['submitted'], stats['sent'], stats['dropped']), (3, 2, 1))
+
+	def test_renderers_get_the_state_of_the_rendered_buffer(self):
+		self.pizzoo.render()
+		self.pizzoo.wait_render(5)
+		self.block()
+		self.pizzoo.draw_pixel((1, 1), '#ffffff')
+		expected = self.pizzoo.get_dirty_rect()
+		self.pizzoo.render()
+		self.renderer.started.wait(5)
+		# Drawing on the next buffer does not change what the renderer sees
+		self.pizzoo.draw_rectangle((10, 10), 20, 20, '#ffffff')
+		self.renderer.release.set()
+		self.pizzoo.wait_render(5)
+		self.assertEqual(self.renderer.dirty_rects[-1], expected)
+
+	def test_errors_are_raised_on_the_calling_thread(self):
+		pizzoo = Pizzoo('failing', renderer=FailingRenderer, background_render=True)
+		pizzoo.render()
+		with self.assertRaises(ConnectionError):
+			pizzoo.wait_render(5)
+		pizzoo.close()
+
+	def test_close_renders_the_pending_buffer(self):
+		self.block()
+		self.pizzoo.render()
+		self.renderer.started.wait(5)
+		self.pizzoo.render(force=True)
+		self.renderer.release.set()
+		self.pizzoo.close()
+		self.assertEqual(len(self.renderer.renders), 2)
+		with self.assertRaises(RuntimeError):
+			self.pizzoo.render()
+
+	def test_context_manager_closes(self):
+		with Pizzoo('memory', renderer=BlockingRenderer, background_render=True) as pizzoo:
+			pizzoo.render()
+		self.assertEqual(len(pizzoo.renderer.renders), 1)
+		with self.assertRaises(RuntimeError):
+			pizzoo.render()
+
+	def test_template_items_are_sent_after_the_frame(self):
+		self.block()
+		# The frame is still being sent when the template items are ready
+		Timer(0.2, self.renderer.release.set).start()
+		self.pizzoo.render_template('<pizzoo><item x="0" y="0" /></pizzoo>')
+		self.assertEqual(self.renderer.events, ['render', 'items'])
+
+	def test_frames_being_sent_are_not_reused(self):
+		self.block()
+		self.pizzoo.cls('#ff0000')
+		sent = self.pizzoo.get_current_frame()
+		self.pizzoo.render()
+		self.renderer.started.wait(5)
+		for _ in range(3):
+			self.pizzoo.add_frame('#00ff00')
+			self.assertIsNot(self.pizzoo.get_current_frame(), sent)
+		self.renderer.release.set()
+		self.pizzoo.wait_render(5)
+		self.assertEqual(self.renderer.renders[0][0][0], bytes((255, 0, 0)) * 64 * 64)
+		self.pizzoo.add_frame()
+		self.assertIs(self.pizzoo.get_current_frame(), sent)
+
+	def test_renderers_that_are_not_thread_safe_are_rejected(self):
+		with self.assertRaises(ValueError):
+			Pizzoo('window', renderer=WindowRenderer, background_render=True)
+		with self.assertRaises(ValueError):
+			self.pizzoo.add_renderer('other', NotThreadSafeRenderer)
+
+if __name__ == '__main__':
+	main()
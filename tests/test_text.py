@@ -0,0 +1,94 @@
+from os.path import dirname, join
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+from unittest.mock import patch
+from bdfparser import Font
+from pizzoo._fonts import BitmapFont
+from tests.helpers import create_pizzoo, get_pixel
+
+FONT_PATH = join(dirname(dirname(__file__)), 'pizzoo', 'default.bdf')
+
+class BitmapFontTest(TestCase):
+	@classmethod
+	def setUpClass(cls):
+		cls.bdf = Font(FONT_PATH)
+		cls.font = BitmapFont.from_bdf(FONT_PATH)
+
+	def assertMatchesBdfparser(self, text, line_width, shadow=None):
+		bitmap = self.bdf.draw(text, missing='?', linelimit=line_width)
+		if shadow is not None:
+			bitmap.shadow(*shadow)
+		mask = self.font.draw(text, line_width, shadow)
+		expected = [[int(bit) for bit in row] for row in bitmap.todata(2)]
+		self.assertEqual(mask.size, (bitmap.width(), bitmap.height()))
+		self.assertEqual([list(mask.tobytes()[y * mask.width:(y + 1) * mask.width]) for y in range(mask.height)], expected)
+
+	def test_text_matches_bdfparser(self):
+		self.assertMatchesBdfparser('Hello, world!', 64)
+
+	def test_wrapped_text_matches_bdfparser(self):
+		self.assertMatchesBdfparser('A longer text that wraps in several lines', 30)
+
+	def test_shadow_matches_bdfparser(self):
+		self.assertMatchesBdfparser('Shadow', 64, (1, -1))
+
+	def test_missing_glyphs_fall_back_to_a_question_mark(self):
+		self.assertEqual(self.font.draw('☃', 64).tobytes(), self.font.draw('?', 64).tobytes())
+
+	def test_empty_text(self):
+		self.assertIsNone(self.font.draw('', 64))
+
+class CompiledFontTest(TestCase):
+	def setUp(self):
+		self.directory = TemporaryDirectory()
+		self.cache_dir = join(self.directory.name, 'cache')
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_compiled_font_round_trip(self):
+		font = BitmapFont.from_bdf(FONT_PATH)
+		path = join(self.directory.name, 'default.pzf')
+		font.save(path)
+		loaded = BitmapFont.load(path)
+		self.assertEqual(loaded.to_bytes(), font.to_bytes())
+		self.assertEqual(loaded.draw('Round trip', 64).tobytes(), font.draw('Round trip', 64).tobytes())
+
+	def test_bdf_fonts_are_compiled_once(self):
+		font = BitmapFont.load(FONT_PATH, self.cache_dir)
+		with patch.object(BitmapFont, 'from_bdf', side_effect=AssertionError('font compiled again')):
+			cached = BitmapFont.load(FONT_PATH, self.cache_dir)
+		self.assertEqual(cached.to_bytes(), font.to_bytes())
+
+	def test_read_only_cache_compiles_the_font(self):
+		# A file where the cache directory should be makes it unwritable
+		blocked = join(self.directory.name, 'blocked')
+		open(blocked, 'w').close()
+		font = BitmapFont.load(FONT_PATH, join(blocked, 'cache'))
+		self.assertIsNotNone(font.draw('A', 64))
+
+	def test_invalid_compiled_fonts_raise(self):
+		with self.assertRaises(ValueError):
+			BitmapFont.from_bytes(b'not a font')
+
+class DrawTextTest(TestCase):
+	def setUp(self):
+		self.pizzoo = create_pizzoo()
+
+	def test_colors_reuse_the_cached_mask(self):
+		self.pizzoo.draw_text('cache test', (0, 0), color='#ff0000')
+		hits = self.pizzoo.get_text_cache_info()['hits']
+		self.pizzoo.draw_text('cache test', (0, 10), color='#00ff00')
+		self.assertEqual(self.pizzoo.get_text_cache_info()['hits'], hits + 1)
+		frame = self.pizzoo.get_current_frame()
+		colors = {get_pixel(frame, (x, y)) for x in range(64) for y in range(20)}
+		self.assertEqual(colors, {(0, 0, 0), (255, 0, 0), (0, 255, 0)})
+
+	def test_shadow_color(self):
+		self.pizzoo.draw_text('I', (0, 0), shadow='horizontal', shadow_rgb=(0, 0, 255))
+		frame = self.pizzoo.get_current_frame()
+		colors = {get_pixel(frame, (x, y)) for x in range(10) for y in range(10)}
+		self.assertEqual(colors, {(0, 0, 0), (255, 255, 255), (0, 0, 255)})
+
+if __name__ == '__main__':
+	main()
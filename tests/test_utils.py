@@ -0,0 +1,27 @@
+from unittest import TestCase, main
+from pizzoo._constants import PICO_PALETTE
+from pizzoo._utils import get_color_bytes, get_color_rgb
+
+class ColorTest(TestCase):
+	def test_color_formats(self):
+		self.assertEqual(get_color_rgb('#ff8000'), (255, 128, 0))
+		self.assertEqual(get_color_rgb('(1, 2, 3)'), (1, 2, 3))
+		self.assertEqual(get_color_rgb('3'), PICO_PALETTE[3])
+		self.assertEqual(get_color_rgb(3), PICO_PALETTE[3])
+		self.assertEqual(get_color_rgb((4, 5, 6)), (4, 5, 6))
+
+	def test_alpha_is_dropped(self):
+		self.assertEqual(get_color_rgb((4, 5, 6, 7)), (4, 5, 6))
+		self.assertEqual(get_color_rgb('(4, 5, 6, 7)'), (4, 5, 6))
+
+	def test_invalid_colors_raise(self):
+		for color in ('#fff', 'red', 1.5):
+			with self.assertRaises(ValueError):
+				get_color_rgb(color)
+
+	def test_color_bytes(self):
+		self.assertEqual(get_color_bytes('#010203'), b'\x01\x02\x03')
+		self.assertEqual(get_color_bytes(0), bytes(PICO_PALETTE[0]))
+
+if __name__ == '__main__':
+	main()